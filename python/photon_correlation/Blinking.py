@@ -3,6 +3,100 @@ import numpy
 
 from .util import *
 
+BLOCK_SIZE = 2**22
+
+def threshold_crossings(counts, thresholds, block_size=BLOCK_SIZE):
+    """
+    Return, for each threshold, the indices i of the bins at which counts
+    crosses it, where counts[i] > threshold differs from
+    counts[i-1] > threshold.
+
+    All thresholds are handled in one pass over the trace: neighboring bins
+    cross exactly the thresholds t with min(c[i-1], c[i]) <= t <
+    max(c[i-1], c[i]), which are found by searching the sorted thresholds.
+    The trace is processed in blocks of block_size bins.
+    """
+    counts = numpy.asarray(counts)
+    thresholds = numpy.asarray(thresholds)
+    order = numpy.argsort(thresholds)
+    ordered = thresholds[order]
+
+    crossings = [[numpy.empty(0, dtype=numpy.int64)]
+                 for threshold in thresholds]
+
+    for start in range(1, len(counts), block_size):
+        stop = min(start + block_size, len(counts))
+        previous = counts[start-1:stop-1]
+        current = counts[start:stop]
+
+        first = numpy.searchsorted(ordered, numpy.minimum(previous, current))
+        last = numpy.searchsorted(ordered, numpy.maximum(previous, current))
+        lengths = last - first
+
+        # One entry for each (bin, threshold) crossing, grouped by threshold.
+        index = numpy.repeat(numpy.arange(start, stop), lengths)
+        which = numpy.arange(len(index)) - \
+                numpy.repeat(numpy.cumsum(lengths) - lengths, lengths) + \
+                numpy.repeat(first, lengths)
+
+        grouped = numpy.argsort(which, kind="stable")
+        bounds = numpy.cumsum(numpy.bincount(which, minlength=len(ordered)))
+
+        for position, found in enumerate(numpy.split(index[grouped],
+                                                     bounds[:-1])):
+            crossings[order[position]].append(found)
+
+    return([numpy.concatenate(found) for found in crossings])
+
+def dwell_times(times, counts, thresholds, block_size=BLOCK_SIZE):
+    """
+    Return the (on, off) dwell times of the trace for each threshold, as
+    arrays. A bin is on if its counts exceed the threshold. The first and
+    last dwells, which are cut off by the ends of the trace, are dropped.
+    """
+    times = numpy.asarray(times)
+    counts = numpy.asarray(counts)
+    starts = times[:, 0] if times.ndim == 2 else times
+
+    result = list()
+
+    for threshold, crossings in zip(
+            thresholds, threshold_crossings(counts, thresholds, block_size)):
+        durations = numpy.diff(starts[crossings])
+        on = counts[crossings[:-1]] > threshold
+
+        result.append((durations[on], durations[~on]))
+
+    return(result)
+
+def dwell_histograms(dwells, bins):
+    """
+    Return the histograms of the on and off dwell times (as from
+    dwell_times) in the bins, as two arrays of shape (n_thresholds,
+    n_bins).
+    """
+    bins = numpy.asarray(bins)
+    histograms = list()
+
+    for state in range(2):
+        durations = [dwell[state] for dwell in dwells]
+        which = numpy.repeat(numpy.arange(len(durations)),
+                             list(map(len, durations)))
+        durations = numpy.concatenate(
+            [numpy.empty(0)] + [numpy.asarray(times, dtype=numpy.float64)
+                                for times in durations])
+
+        index = numpy.searchsorted(bins, durations, side="right") - 1
+        index[durations == bins[-1]] = len(bins) - 2
+        keep = (index >= 0) & (index < len(bins) - 1)
+
+        histograms.append(numpy.bincount(
+            which[keep]*(len(bins) - 1) + index[keep],
+            minlength=len(dwells)*(len(bins) - 1)).reshape(
+                len(dwells), len(bins) - 1))
+
+    return(tuple(histograms))
+
 class Blinking(object):
     def __init__(self, intensity):
         self.intensity = intensity
@@ -12,40 +106,51 @@ class Blinking(object):
     def dt(self):
         return(self.intensity.dt())
 
-    def on_off_times(self, threshold):
-        if threshold not in self._on_off_times.keys():
-            times = self.intensity.times
-            counts = self.intensity[0]
+    def scan(self, thresholds):
+        """
+        Calculate the on and off times for all of the thresholds in one
+        pass over the trace. Return a dict of threshold to (on, off).
+        """
+        missing = [threshold for threshold in thresholds
+                   if threshold not in self._on_off_times]
 
-            on_times = list()
-            off_times = list()
+        if missing:
+            self._on_off_times.update(zip(
+                missing,
+                dwell_times(self.intensity.times, self.intensity[0],
+                            missing)))
 
-            thresheld = list(map(lambda x: x > threshold, counts))
-            
-            last_switch = None
-            last_status = thresheld[0]
-
-            for time_bin, status in zip(times,
-                                        map(lambda x: x > threshold, counts)):
-                if status != last_status:
-                    # Switched
-                    if last_switch is None:
-                        # Discard the first and last ones
-                        pass
-                    else:
-                        dt = time_bin[0] - last_switch[0]
-                       
-                        if status:
-                            on_times.append(dt)
-                        else:
-                            off_times.append(dt)
-
-                    last_switch = time_bin
-                    last_status = status
-
-                self._on_off_times[threshold] = (on_times, off_times)
-
-        return(self._on_off_times[threshold])
+        return(dict((threshold, self._on_off_times[threshold])
+                    for threshold in thresholds))
+
+    def on_off_times(self, threshold):
+        """
+        Return the durations of the on and off periods, as arrays. A bin is
+        on if its intensity exceeds the threshold.
+        """
+        return(self.scan([threshold])[threshold])
+
+    def log_bins(self, max_time, n_bins=50):
+        return(numpy.logspace(numpy.log10(self.dt()), numpy.log10(max_time),
+                              n_bins))
+
+    def histograms(self, thresholds, n_bins=50, max_time=None):
+        """
+        Return the log-spaced bins of the dwell times (from the bin width to
+        max_time, by default the longest dwell) and the histograms of the on
+        and off times for each threshold, as arrays of shape
+        (n_thresholds, n_bins-1).
+        """
+        dwells = [self.scan(thresholds)[threshold]
+                  for threshold in thresholds]
+
+        if max_time is None:
+            max_time = max([times.max() for dwell in dwells
+                            for times in dwell if len(times)] or [self.dt()])
+
+        bins = self.log_bins(max_time, n_bins)
+
+        return((bins,) + dwell_histograms(dwells, bins))
 
     def make_figure(self, threshold, n_bins=50):
         on_times, off_times = self.on_off_times(threshold)
@@ -75,10 +180,9 @@ class Blinking(object):
 
         ax = fig.add_subplot(1, 1, 1)
 
-        if on_times and off_times:
-            max_time = max((max(on_times), max(off_times)))
-            bins = numpy.logspace(numpy.log10(self.dt()), numpy.log10(max_time),
-                                  n_bins)
+        if len(on_times) and len(off_times):
+            max_time = max((on_times.max(), off_times.max()))
+            bins = self.log_bins(max_time, n_bins)
 
             for name, times in [("on", on_times),
                                 ("off", off_times)]:
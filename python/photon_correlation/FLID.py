@@ -1,12 +1,12 @@
 #!/usr/bin/env python
 
 import sys
-import csv
-import bz2
 
 import matplotlib.pyplot as plt
 import numpy
 
+from .table import open_table, read_header, read_table
+
 def force_aspect(ax,aspect=1):
     im = ax.get_images()
     extent =  im[0].get_extent()
@@ -24,31 +24,20 @@ class FLID(object):
             self.from_filename(filename)
 
     def from_filename(self, filename):
-        if not os.path.exists(filename):
-            bz2_name = "{}.bz2".format(filename)
-            if os.path.exists(bz2_name):
-                filename = bz2_name
-                
-        if filename.endswith("bz2"):
-            open_f = lambda x: bz2.open(x, "rt")
-        else: 
-            open_f = open
-            
-        with open_f(filename) as stream_in:
+        with open_table(filename) as stream_in:
             return(self.from_stream(stream_in))
 
     def from_stream(self, stream_in):
-        reader = csv.reader(stream_in)
-
-        time_bins = (next(reader), next(reader))
+        time_bins, pending = read_header(stream_in, n_lines=2)
 
         for left, right in zip(time_bins[0][3:], time_bins[1][3:]):
             self.arrival_time.append((float(left), float(right)))
 
-        for line in reader:
-            self.intensity.append((float(line[0]), float(line[1])))
-            self.events.append(int(line[2]))
-            self.counts.append(list(map(int, line[3:])))
+        rows = read_table(stream_in, pending=pending)
+
+        self.intensity.extend(map(tuple, rows[:, :2].tolist()))
+        self.events.extend(rows[:, 2].astype(numpy.int64).tolist())
+        self.counts.extend(rows[:, 3:].astype(numpy.int64).tolist())
 
         return(self)
 
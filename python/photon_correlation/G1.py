@@ -3,9 +3,11 @@ import os
 import itertools
 
 import matplotlib.pyplot as plt
+import numpy
 
 from .Lifetime import Lifetime
 from .GN import GN
+from .table import read_table
 from .util import *
 
 class G1(GN):
@@ -24,30 +26,30 @@ class G1(GN):
             dst[channel] = self[channel].to_resolution(resolution)
 
         return(dst)
+
+    def rebin_to(self, times):
+        """
+        Redistribute the counts of each channel into the given time bins.
+        """
+        dst = G1()
+
+        for channel in self:
+            dst[channel] = self[channel].rebin_to(times)
+
+        return(dst)
     
     def from_stream(self, stream_in):
         """
         Given a stream which returns lines in curve, bin_left, bin_right, counts
         format, produce the G1 object.
         """
-        curves = dict()
-        
-        for line in csv.reader(stream_in):
-            curve = int(line[0])
-            time_left = float(line[1])
-            time_right = float(line[2])
-            counts = float(line[3])
-
-            if not curve in curves:
-                curves[curve] = list()
-
-            curves[curve].append(((time_left, time_right), counts))
+        rows = read_table(stream_in, 4)
 
-        for curve, g1 in curves.items():
-            times = list(map(lambda x: x[0], g1))
-            counts = list(map(lambda x: x[1], g1))
+        for curve in numpy.unique(rows[:, 0]):
+            g1 = rows[rows[:, 0] == curve]
+            times = list(map(tuple, g1[:, 1:3].tolist()))
             
-            self[curve] = Lifetime(counts, times=times)
+            self[int(curve)] = Lifetime(g1[:, 3].tolist(), times=times)
 
         return(self) 
 
@@ -4,125 +4,74 @@ import statistics
 
 import matplotlib.pyplot as plt
 
-from .GN import GN
+from .GN import DenseGN
+from .table import write_table
 from .util import *
 
 t3_center = (-0.5, 0.5)
 t3_side = (0.5, 1.5)
 
-class G2_T3(GN):
+class G2_T3(DenseGN):
+    """
+    t3 g2, stored as a counts array of shape (n_correlations, n_pulse_bins,
+    n_time_bins), with the edges of the bins in pulse_bins and time_bins.
+    g2[correlation][pulse_bin][time_bin] gives the counts in one bin.
+    """
+    layout = (("channel", 0), ("channel", 1), ("bins", 0), ("bins", 1))
+
     @property
-    def time_resolution(self):
-        corr = next(iter(self._counts.keys()))
-        return(numpy.diff(next(iter(self[corr][t3_center].keys())))[0])
-               
-    def from_stream(self, stream_in):
-        self._counts = dict()
+    def pulse_bins(self):
+        return(self.edges[0])
 
-        for c0, c1, pulse_left, pulse_right, \
-            time_left, time_right, counts in csv.reader(stream_in):
-            correlation = (int(c0), int(c1))
+    @property
+    def time_bins(self):
+        return(self.edges[1])
+
+    @property
+    def time_resolution(self):
+        return(self.time_bins[0, 1] - self.time_bins[0, 0])
 
-            pulse_bin = (float(pulse_left), float(pulse_right))
-            time_bin = (float(time_left), float(time_right))
+    def _pulse_position(self, pulse_bin):
+        return(self.bin_position(0, pulse_bin))
 
-            if int(counts) == float(counts):
-                counts = int(counts)
-            else:
-                counts = float(counts)
-
-            if not correlation in self._counts:
-                self._counts[correlation] = dict()
-                
-            if not pulse_bin in self._counts[correlation]:
-                self._counts[correlation][pulse_bin] = dict()
-
-            self._counts[correlation][pulse_bin][time_bin] = counts
-
-        return(self)
-
-    def to_stream(self):
-        for correlation in sorted(self):
-            for pulse_bin in sorted(self[correlation]):
-                for time_bin in sorted(self[correlation][pulse_bin]):
-                    line = itertools.chain(
-                        correlation,
-                        pulse_bin,
-                        time_bin,
-                        [self[correlation][pulse_bin][time_bin]])
-                    
-                    yield(line)
+    def pulse_counts(self):
+        """
+        Return the total counts for each correlation and pulse bin, as an
+        array of shape (n_correlations, n_pulse_bins).
+        """
+        return(self.counts.sum(axis=2))
 
     def pulse_bin_counts(self, correlation, pulse_bin):
-        return(sum(self._counts[correlation][pulse_bin].values()))
+        return(self.counts[self._row(correlation),
+                           self._pulse_position(pulse_bin)].sum().item())
     
     def center_side_ratios(self, center=t3_center, side=t3_side):
-        try:
-            self._center_side_ratios
-        except:
-            self._center_side_ratios = dict()
-                
-            for correlation in self:
-                center_counts = self.pulse_bin_counts(correlation, center)
-                side_counts = self.pulse_bin_counts(correlation, side)
-
-                self._center_side_ratios[correlation] = \
-                                        (center_counts, side_counts)
-                
-        return(self._center_side_ratios)
+        """
+        Return the (center, side) counts of each correlation.
+        """
+        counts = self.pulse_counts()[:, [self._pulse_position(center),
+                                         self._pulse_position(side)]]
+
+        return(dict(zip(self.correlations, map(tuple, counts.tolist()))))
 
     def center_side_ratio(self, center=t3_center, side=t3_side):
         """
         Return the center/side ratio formed by summing over
         all cross-correlations in the g2.
         """
-        try:
-            self._center_side_ratio
-        except:
-            self._center_side_ratio = None
-
-        if self._center_side_ratio is None:
-            center_total = 0
-            side_total = 0
-            
-            for correlation, ratio in self.center_side_ratios().items():
-                if is_cross_correlation(correlation):
-                    center, side = ratio
-                
-                    center_total += center
-                    side_total += side
-
-            self._center_side_ratio = float(center_total)/side_total
-
-        return(self._center_side_ratio)
+        center_total, side_total = self.counts[
+            self.cross_correlation_mask()][
+                :, [self._pulse_position(center),
+                    self._pulse_position(side)]].sum(axis=(0, 2))
+
+        return(float(center_total)/side_total)
 
     def autocorrelation(self):
         """
         Add together all of the counts from the cross-correlations to get the
         resulting approximate autocorrelation.
         """
-        try:
-            self._autocorrelation
-        except:
-            self._autocorrelation = None
-            
-        if self._autocorrelation is None:
-            self._autocorrelation = dict()
-            
-            for correlation in self.cross_correlations():
-                g2 = self[correlation]
-
-                for pulse_bin in g2.keys():
-                    if not pulse_bin in self._autocorrelation.keys():
-                        self._autocorrelation[pulse_bin] = dict()
-
-                    for time_bin, counts in g2[pulse_bin].items():
-                        if time_bin in self._autocorrelation[pulse_bin].keys():
-                            self._autocorrelation[pulse_bin][time_bin] += counts
-                        else:
-                            self._autocorrelation[pulse_bin][time_bin] = counts
-
-        return(self._autocorrelation)            
+        return(self.view(self.cross_correlation_counts()))
 
     def make_figure(self):
         fig = plt.figure()
@@ -131,22 +80,17 @@ class G2_T3(GN):
         return(fig)
 
     def add_to_axes(self, ax):
-        g2 = self.autocorrelation()
+        counts = self.cross_correlation_counts()
+        times = self.time_bins.mean(axis=1)*1e-3
 
-        max_time = round(max(map(lambda x: x[0], g2[(-0.5, 0.5)]))*1e-3)
+        max_time = round(self.time_bins[:, 0].max()*1e-3)
 
         for pulse_bin, color in [((-1.5, -0.5), "black"),
                                  ((0.5, 1.5), "black"),
                                  ((-0.5, 0.5), "red")]:
-            my_g2 = g2[pulse_bin]
-
-            times = list(map(lambda x: statistics.mean(x[0])*1e-3
-                             +statistics.mean(pulse_bin)*max_time,
-                             sorted(my_g2.items())))
-            counts = list(map(lambda x: x[1],
-                              sorted(my_g2.items())))
-            
-            ax.plot(times, counts, color=color)
+            ax.plot(times + statistics.mean(pulse_bin)*max_time,
+                    counts[self._pulse_position(pulse_bin)],
+                    color=color)
 
         ax.set_xlim((-max_time*1.5, max_time*1.5))
         ax.set_xticks((-max_time, 0, max_time))
@@ -158,32 +102,13 @@ class G2_T3(GN):
         Return all counts associated with all cross-correlations and the given
         pulse bin.
         """
-        result = None
-        
-        for correlation, g2 in self:
-            if not is_cross_correlation(correlation):
-                continue
-
-            if result is None:
-                result = g2[pulse_bin]
-            else:
-                for time_bin, counts in g2[pulse_bin].items():
-                    result[time_bin] += counts
-
-        return(result)
+        return(self.autocorrelation()[pulse_bin])
 
     def unique_peaks(self):
-        peaks = {"center": 0,
-                 "side": 0}
-
-        for correlation in self.cross_correlations():
-            gn = self[correlation]
+        counts = self.pulse_counts()[self.cross_correlation_mask()].sum(axis=0)
 
-            for pulse_bin, peak in [((-0.5, 0.5), "center"),
-                                    ((0.5, 1.5), "side")]:
-                peaks[peak] += sum(gn[pulse_bin].values())
-                    
-        return(peaks)
+        return({"center": counts[self._pulse_position(t3_center)].item(),
+                "side": counts[self._pulse_position(t3_side)].item()})
 
     def to_time_resolution(self, resolution=None):
         if not resolution:
@@ -196,118 +121,64 @@ class G2_T3(GN):
             return(self.rebin_time(n=binning))
 
     def rebin_time(self, n=2):
-        result = G2_T3()
-        
-        for correlation in self:
-            g2 = self[correlation]
-            result[correlation] = dict()
-
-            for pulse_bin in g2:
-                time_bins, counts = zip(*sorted(g2[pulse_bin].items()))
-                start, stop = zip(*time_bins)
-                time_bins = zip(pc.util.smooth(start, n=n),
-                                pc.util.smooth(stop, n=n))
-                counts = pc.util.rebin(counts, n=n)
-                
-                result[correlation][pulse_bin] = {
-                    time_bin: count for time_bin, count in \
-                    zip(time_bins, counts)}
-
-        return(result)
+        return(self.rebin(1, n=n))
                                   
-class G2_T2(GN):       
-    def from_file(self, filename, int_counts=True):
-        with open(filename) as stream_in:
-            return(self.from_stream(stream_in, int_counts=int_counts))
-
-    def from_stream(self, stream_in, int_counts=True):
-        for c0, c1, time_left, time_right, counts in csv.reader(stream_in):
-            correlation = (int(c0), int(c1))
-            time_bin = (float(time_left), float(time_right))
-
-            if int_counts:
-                counts = int(counts)
-            else:
-                counts = float(counts)
-
-            if not correlation in self._counts.keys():
-                self._counts[correlation] = dict()
+class G2_T2(DenseGN):
+    """
+    t2 g2, stored as a counts array of shape (n_correlations, n_bins), with
+    the (left, right) edges of the time bins in bins. g2[correlation]
+    returns a mapping view of the counts for one correlation, keyed by time
+    bin.
+    """
+    layout = (("channel", 0), ("channel", 1), ("bins", 0))
 
-            self._counts[correlation][time_bin] = counts
-
-        return(self)
+    @property
+    def bins(self):
+        return(self.edges[0])
 
     def autocorrelation(self):
-        try:
-            self._autocorrelation
-        except:
-            self._autocorrelation = None
-            
-        if self._autocorrelation is None:
-            result = dict()
-            
-            for correlation in self:
-                if not is_cross_correlation(correlation):
-                    continue
-
-                for time_bin, counts in self[correlation].items():
-                    if time_bin not in result.keys():
-                        result[time_bin] = 0
-
-                    result[time_bin] += counts
-
-            self._autocorrelation = result
-            
-        return(self._autocorrelation)
+        """
+        Sum the cross-correlations to form the autocorrelation, as a mapping
+        of time bin to counts (with the arrays available as .bins and
+        .counts).
+        """
+        return(self.view(self.cross_correlation_counts()))
+
+    def time_resolution(self):
+        return(self.bins[0, 1] - self.bins[0, 0])
 
     def to_resolution(self, resolution):
-        result = G2_T2()
+        """
+        Combine neighboring time bins to reach the given resolution. Bins
+        left over at the end are dropped.
+        """
+        return(self.rebin(0, n=int(round(resolution/self.time_resolution()))))
 
-        for correlation, g2 in self:
-            times = list(map(lambda x: x[0], sorted(g2.items())))
-            counts = list(map(lambda x: x[1], sorted(g2.items())))
+    def times(self):
+        """
+        Return the centers of the time bins, in ns.
+        """
+        return(self.bins.mean(axis=1)*1e-3)
 
-            current_resolution = int(times[0][1] - times[0][0])
-            binning = resolution / current_resolution
+    def export_g2(self, filename):
+        counts = self.cross_correlation_counts()
 
-            if binning != 1:
-                times = list(zip(smooth(map(lambda x: x[0], times), n=binning),
-                                 smooth(map(lambda x: x[1], times), n=binning)))
-                             
-                counts = rebin(counts, n=binning)
+        with open(filename, 'w') as csvfile:
+            csvfile.write("Time,g2\nns,\n")
 
-                my_g2 = dict()
-                
-                for time_bin, count in zip(times, counts):
-                    my_g2[time_bin] = count
+            if numpy.issubdtype(counts.dtype, numpy.integer):
+                line_format = "%.12g,%d"
             else:
-                my_g2 = g2
-                
-            result[correlation] = my_g2
+                line_format = "%.12g,%.17g"
 
-        return(result)
-
-    def export_g2(self, filename):
-        g2 = sorted(self.autocorrelation().items())
-
-        times = list(map(lambda x: statistics.mean(x[0])*1e-3, g2))
-        counts = list(map(lambda x: x[1], g2))
-
-        with open(filename, 'w') as csvfile:
-            csvline = csv.writer(csvfile)
-            csvline.writerow(['Time', 'g2'])
-            csvline.writerow(['ns', ''])
-            for i in range(len(times)):
-                csvline.writerow([times[i], counts[i]])
+            write_table(csvfile, (self.times(), counts), line_format)
 
     def make_figure(self):
         fig = plt.figure()
         ax = fig.add_subplot(1, 1, 1)
 
-        g2 = sorted(self.autocorrelation().items())
-
-        times = list(map(lambda x: statistics.mean(x[0])*1e-3, g2))
-        counts = list(map(lambda x: x[1], g2))
+        times = self.times()
+        counts = self.cross_correlation_counts()
 
         ax.plot(times, counts)
         ax.set_ylabel("$g^{(2)}$")
@@ -1,9 +1,282 @@
+import collections.abc
 import csv
-import bz2
-import os
+import itertools
+import operator
 
+import numpy
+
+from . import binning
+from . import indexed
+from .indexed import is_indexed
+from .table import open_table, read_chunks, write_lines
 from .util import is_cross_correlation
 
+def unique_rows(rows):
+    """
+    Equivalent to numpy.unique(rows, axis=0, return_inverse=True), but much
+    faster for arrays with few columns: each column is reduced to indices
+    of its unique values, and those are combined into a single integer key.
+    """
+    columns = list()
+    indices = list()
+
+    for column in rows.T:
+        values, inverse = numpy.unique(column, return_inverse=True)
+        columns.append(values)
+        indices.append(inverse.ravel())
+
+    sizes = [max(len(values), 1) for values in columns]
+    if numpy.prod(sizes, dtype=numpy.float64) >= 2**62:
+        unique, inverse = numpy.unique(rows, axis=0, return_inverse=True)
+        return(unique, inverse.ravel())
+
+    key = numpy.zeros(len(rows), dtype=numpy.int64)
+    for size, index in zip(sizes, indices):
+        key = key*size + index
+
+    keys, inverse = numpy.unique(key, return_inverse=True)
+
+    unique = numpy.empty((len(keys), rows.shape[1]), dtype=rows.dtype)
+    for index in reversed(range(len(columns))):
+        unique[:, index] = columns[index][keys % sizes[index]]
+        keys = keys // sizes[index]
+
+    return(unique, inverse.ravel())
+
+def counts_dtype(int_counts, integral):
+    """
+    Return the type for counts: integers if int_counts is set, or if it is
+    None and all counts are integral.
+    """
+    if int_counts is None:
+        int_counts = integral
+
+    if int_counts:
+        return(numpy.int64)
+    else:
+        return(numpy.float64)
+
+def distinct_rows(rows):
+    """
+    Return the unique rows, sorted. Runs of repeated rows (such as the
+    channels of a histogram, which change only between correlations) are
+    collapsed first, which avoids sorting most of the rows.
+    """
+    if len(rows) > 1:
+        changed = numpy.any(rows[1:] != rows[:-1], axis=1)
+        rows = rows[numpy.concatenate(([True], changed))]
+
+    return(unique_rows(rows)[0])
+
+def positions(unique, rows):
+    """
+    Return the position in unique (as returned by unique_rows) of each of
+    the rows, all of which must be present in unique.
+    """
+    key = numpy.zeros(len(rows), dtype=numpy.int64)
+    unique_key = numpy.zeros(len(unique), dtype=numpy.int64)
+
+    for column, unique_column in zip(rows.T, unique.T):
+        values = numpy.unique(unique_column)
+        key = key*len(values) + numpy.searchsorted(values, column)
+        unique_key = unique_key*len(values) + \
+                     numpy.searchsorted(values, unique_column)
+
+    return(numpy.searchsorted(unique_key, key))
+
+class SparseCounts(object):
+    """
+    Array of counts in coordinate (COO) format: coords holds the index of
+    each nonzero entry along every axis, with shape (nnz, ndim), and data
+    the corresponding counts. This supports the operations needed by the
+    histograms: indexing with integers or boolean masks along the leading
+    axes, sums over axes, rebinning and conversion to a dense array.
+    """
+    def __init__(self, coords, data, shape):
+        self.coords = numpy.asarray(coords, dtype=numpy.int64).reshape(
+            -1, len(shape))
+        self.data = numpy.asarray(data)
+        self.shape = tuple(shape)
+
+    @classmethod
+    def from_dense(cls, array):
+        array = numpy.asarray(array)
+        coords = numpy.argwhere(array)
+
+        return(cls(coords, array[tuple(coords.T)], array.shape))
+
+    @property
+    def ndim(self):
+        return(len(self.shape))
+
+    @property
+    def dtype(self):
+        return(self.data.dtype)
+
+    @property
+    def nnz(self):
+        return(len(self.data))
+
+    @property
+    def nbytes(self):
+        return(self.coords.nbytes + self.data.nbytes)
+
+    def __len__(self):
+        return(self.shape[0])
+
+    def astype(self, dtype):
+        return(SparseCounts(self.coords, self.data.astype(dtype), self.shape))
+
+    def toarray(self):
+        array = numpy.zeros(self.shape, dtype=self.dtype)
+        array[tuple(self.coords.T)] = self.data
+        return(array)
+
+    def tolist(self):
+        return(self.toarray().tolist())
+
+    def _combine(self, coords, data, shape):
+        """
+        Return the counts with the duplicate coordinates added together.
+        """
+        if not len(shape):
+            return(data.sum(dtype=self.dtype))
+
+        unique, inverse = unique_rows(coords)
+        summed = numpy.zeros(len(unique), dtype=self.dtype)
+        numpy.add.at(summed, inverse, data)
+
+        return(SparseCounts(unique, summed, shape))
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+
+        coords = self.coords
+        data = self.data
+        shape = list(self.shape)
+        axis = 0
+
+        for item in index:
+            if isinstance(item, slice) and item == slice(None):
+                axis += 1
+            elif isinstance(item, (int, numpy.integer)):
+                if item < 0:
+                    item += shape[axis]
+
+                keep = coords[:, axis] == item
+                coords = numpy.delete(coords[keep], axis, axis=1)
+                data = data[keep]
+                del(shape[axis])
+            else:
+                item = numpy.asarray(item)
+
+                if item.dtype == bool:
+                    item = numpy.flatnonzero(item)
+
+                # Select the indices in the given order.
+                mapping = numpy.full(shape[axis], -1, dtype=numpy.int64)
+                mapping[item] = numpy.arange(len(item))
+                new_index = mapping[coords[:, axis]]
+                keep = new_index >= 0
+
+                coords = coords[keep].copy()
+                coords[:, axis] = new_index[keep]
+                data = data[keep]
+                shape[axis] = len(item)
+                axis += 1
+
+        if not shape:
+            return(data.sum(dtype=self.dtype))
+        else:
+            return(SparseCounts(coords, data, shape))
+
+    def sum(self, axis=None):
+        if axis is None:
+            axis = tuple(range(self.ndim))
+        elif not isinstance(axis, tuple):
+            axis = (axis,)
+
+        axis = tuple(item % self.ndim for item in axis)
+        keep = [item for item in range(self.ndim) if item not in axis]
+
+        return(self._combine(self.coords[:, keep], self.data,
+                             [self.shape[item] for item in keep]))
+
+    def rebin(self, axis, n):
+        """
+        Combine every n neighboring entries along the axis, dropping those
+        left over at the end.
+        """
+        n_bins = self.shape[axis] // n
+        keep = self.coords[:, axis] < n_bins*n
+
+        coords = self.coords[keep].copy()
+        coords[:, axis] //= n
+        shape = list(self.shape)
+        shape[axis] = n_bins
+
+        return(self._combine(coords, self.data[keep], shape))
+
+def bin_index(bins):
+    """
+    Map the (left, right) edges of each bin to its position.
+    """
+    return(dict((bin, position) for position, bin
+                in enumerate(map(tuple, bins.tolist()))))
+
+class BinnedCounts(collections.abc.MutableMapping):
+    """
+    Mapping view of an array of counts, keyed by the (left, right) edges of
+    the bins along its first axis. If the array has more axes, the values
+    are views of the remaining axes, whose bins and indices are given by
+    inner. The arrays are shared with the owner, so writing through the
+    view changes the underlying histogram.
+    """
+    def __init__(self, bins, counts, index=None, inner=()):
+        self.bins = bins
+        self.counts = counts
+        self._index = index
+        self._inner = inner
+
+    def index(self):
+        if self._index is None:
+            self._index = bin_index(self.bins)
+
+        return(self._index)
+
+    def _value(self, position):
+        if self._inner:
+            bins, index = self._inner[0]
+            return(BinnedCounts(bins, self.counts[position], index,
+                                self._inner[1:]))
+        else:
+            return(self.counts[position].item())
+
+    def __getitem__(self, bin):
+        return(self._value(self.index()[tuple(bin)]))
+
+    def __setitem__(self, bin, counts):
+        self.counts[self.index()[tuple(bin)]] = counts
+
+    def __delitem__(self, bin):
+        raise(TypeError("Bins cannot be removed from a histogram."))
+
+    def __iter__(self):
+        return(iter(map(tuple, self.bins.tolist())))
+
+    def __len__(self):
+        return(len(self.bins))
+
+    def items(self):
+        return(list(zip(self, self.values())))
+
+    def values(self):
+        if self._inner:
+            return(list(map(self._value, range(len(self.bins)))))
+        else:
+            return(self.counts.tolist())
+
 class GN(object):
     def __init__(self, stream=None, filename=None,
                  bins=None, counts=None):
@@ -35,19 +308,13 @@ class GN(object):
     def __iter__(self):
         return(iter(sorted(self._counts)))
 
-    def from_file(self, filename):
-        if not os.path.exists(filename):
-            bz2_name = "{}.bz2".format(filename)
-            if os.path.exists(bz2_name):
-                filename = bz2_name
-                
-        if filename.endswith("bz2"):
-            open_f = lambda x: bz2.open(x, "rt")
-        else: 
-            open_f = open
-            
-        with open_f(filename) as stream_in:
-            return(self.from_stream(stream_in))
+    def from_file(self, filename, **kwargs):
+        """
+        Read the histogram from the file, or from its bz2-compressed version
+        if only that exists.
+        """
+        with open_table(filename) as stream_in:
+            return(self.from_stream(stream_in, **kwargs))
 
     def to_file(self, filename):
         with open(filename, "w") as stream_out:
@@ -70,3 +337,600 @@ class GN(object):
         of peaks found in the given correlation.
         """
         return(None)
+
+class DenseGN(GN):
+    """
+    Base class for histograms stored as arrays:
+
+    correlations: the tuples of channels, in the order of the rows.
+    edges: for each binned dimension, the (left, right) edges of the bins,
+        as an (n_bins, 2) array.
+    counts: array of shape (n_correlations, n_bins_0, n_bins_1, ...). If
+        sparse is set, this is a SparseCounts holding only the nonzero
+        bins, which is much smaller for high orders and fine bins.
+
+    gn[correlation] is a mapping view of the counts for the correlation,
+    nested like the dicts of the other GN classes.
+
+    exposure: the amount of data the counts were collected from (such as
+        the number of windows, pulses or photons), or None if unknown. This
+        is summed along with the counts when histograms are added.
+
+    Subclasses set layout to describe the columns of the text format, as
+    ("channel", index) and ("bins", dimension) entries; the counts follow.
+    """
+    layout = ()
+
+    def __init__(self, *args, sparse=False, **kwargs):
+        self.sparse = sparse
+        self.exposure = None
+        self.correlations = list()
+        self.edges = [numpy.empty((0, 2))
+                      for dimension in range(self.dimensions())]
+        self.counts = numpy.zeros((0,)*(self.dimensions() + 1),
+                                  dtype=numpy.int64)
+        if sparse:
+            self.counts = SparseCounts.from_dense(self.counts)
+        self._invalidate()
+
+        super(DenseGN, self).__init__(*args, **kwargs)
+
+    @classmethod
+    def dimensions(cls):
+        return(sum(1 for kind, item in cls.layout if kind == "bins"))
+
+    def __getitem__(self, correlation):
+        return(self.view(self.counts[self._row(correlation)]))
+
+    def __setitem__(self, correlation, gn):
+        """
+        Set the counts for the correlation from a (nested) mapping of bins to
+        counts. The first correlation determines the bins.
+        """
+        if self.sparse:
+            raise(TypeError("Sparse histograms cannot be modified."))
+
+        edges, counts = self._from_mapping(gn)
+        correlation = tuple(correlation)
+
+        if not self.correlations:
+            self.edges = edges
+            self.counts = counts[numpy.newaxis]
+            self.correlations.append(correlation)
+        elif not all(map(numpy.array_equal, edges, self.edges)):
+            raise(ValueError("Bins do not match those of the histogram."))
+        elif correlation in self.correlations:
+            self.counts[self._row(correlation)] = counts
+        else:
+            self.correlations.append(correlation)
+            self.counts = numpy.concatenate(
+                (self.counts,
+                 counts[numpy.newaxis].astype(self.counts.dtype)))
+
+        self._invalidate()
+
+    def _from_mapping(self, gn, dimension=0):
+        bins = sorted(gn.keys())
+        edges = [numpy.array(bins, dtype=numpy.float64).reshape(-1, 2)]
+
+        if dimension == self.dimensions() - 1:
+            return(edges, numpy.array([gn[bin] for bin in bins]))
+
+        inner = [self._from_mapping(gn[bin], dimension + 1) for bin in bins]
+
+        return(edges + inner[0][0],
+               numpy.array([counts for inner_edges, counts in inner]))
+
+    def __delitem__(self, correlation):
+        keep = numpy.ones(len(self.correlations), dtype=bool)
+        keep[self._row(correlation)] = False
+
+        del(self.correlations[self._row(correlation)])
+        self.counts = self.counts[keep]
+        self._invalidate()
+
+    def __len__(self):
+        return(len(self.correlations))
+
+    def __iter__(self):
+        return(iter(sorted(self.correlations)))
+
+    def _row(self, correlation):
+        try:
+            return(self.correlations.index(tuple(correlation)))
+        except ValueError:
+            raise(KeyError(correlation))
+
+    def _invalidate(self):
+        self._indices = None
+        self._cross_correlation_counts = None
+
+    def _bin_indices(self):
+        if self._indices is None:
+            self._indices = list(map(bin_index, self.edges))
+
+        return(self._indices)
+
+    def bin_position(self, dimension, bin):
+        """
+        Return the position of the bin (given by its edges) along the
+        dimension.
+        """
+        return(self._bin_indices()[dimension][tuple(bin)])
+
+    def view(self, counts):
+        """
+        Return a mapping view of counts, with the bins of the histogram.
+        """
+        indices = self._bin_indices()
+
+        return(BinnedCounts(self.edges[0], counts, indices[0],
+                            tuple(zip(self.edges[1:], indices[1:]))))
+
+    def cross_correlation_mask(self):
+        return(numpy.array([is_cross_correlation(correlation)
+                            for correlation in self.correlations],
+                           dtype=bool))
+
+    def cross_correlation_counts(self):
+        """
+        Return the sum of the counts of all cross-correlations.
+        """
+        if self._cross_correlation_counts is None:
+            self._cross_correlation_counts = self.counts[
+                self.cross_correlation_mask()].sum(axis=0)
+
+        return(self._cross_correlation_counts)
+
+    def marginal(self, dimensions):
+        """
+        Return the counts summed over the given dimensions, as a dense array
+        with the correlations along the first axis.
+        """
+        counts = self.counts.sum(axis=tuple(dimension + 1
+                                            for dimension in dimensions))
+
+        if self.sparse:
+            return(counts.toarray())
+        else:
+            return(counts)
+
+    def _columns(self):
+        """
+        Return the columns of the channels, and of the left edges of the
+        bins for each dimension.
+        """
+        channels = dict()
+        bins = dict()
+        column = 0
+
+        for kind, item in self.layout:
+            if kind == "channel":
+                channels[item] = column
+                column += 1
+            else:
+                bins[item] = column
+                column += 2
+
+        return([channels[item] for item in sorted(channels)],
+               [bins[item] for item in sorted(bins)],
+               column)
+
+    def _collect(self, chunks, keep=None):
+        """
+        Return the sorted correlations and the edges of the bins in each
+        dimension found in the chunks of rows (as from read_chunks), and
+        whether all of the counts are integers. Each chunk is passed on to
+        keep, if given.
+        """
+        channel_columns, bin_columns, n_columns = self._columns()
+
+        correlations = [numpy.empty((0, len(channel_columns)))]
+        edges = [[numpy.empty((0, 2))] for column in bin_columns]
+        integral = True
+
+        for rows in chunks:
+            correlations.append(distinct_rows(rows[:, channel_columns]))
+            for bins, column in zip(edges, bin_columns):
+                bins.append(distinct_rows(rows[:, column:column+2]))
+
+            values = rows[:, n_columns]
+            integral = integral and \
+                       numpy.array_equal(values, numpy.round(values))
+
+            if keep is not None:
+                keep(rows)
+
+        return(unique_rows(numpy.concatenate(correlations))[0],
+               [unique_rows(numpy.concatenate(bins))[0] for bins in edges],
+               integral)
+
+    def _positions(self, rows, correlations, edges):
+        """
+        Return the index of each of the rows in the counts array.
+        """
+        channel_columns, bin_columns, n_columns = self._columns()
+
+        index = [positions(correlations, rows[:, channel_columns])]
+        for bins, column in zip(edges, bin_columns):
+            index.append(positions(bins, rows[:, column:column+2]))
+
+        return(tuple(index))
+
+    def from_stream(self, stream_in, int_counts=None):
+        """
+        Read the histogram from the text format. Counts are stored as
+        integers if int_counts is set, or if it is None and all counts are
+        integers. The text is parsed in chunks, and for sparse histograms
+        only the rows with nonzero counts are kept.
+        """
+        n_columns = self._columns()[2]
+        kept = [numpy.empty((0, n_columns + 1))]
+
+        def keep(rows):
+            if self.sparse:
+                rows = rows[rows[:, n_columns] != 0]
+
+            kept.append(rows)
+
+        correlations, edges, integral = self._collect(
+            read_chunks(stream_in, n_columns + 1), keep)
+
+        rows = numpy.concatenate(kept)
+        values = rows[:, n_columns]
+        index = self._positions(rows, correlations, edges)
+        dtype = counts_dtype(int_counts, integral)
+        shape = (len(correlations),) + tuple(map(len, edges))
+
+        self.correlations = list(map(tuple,
+                                     correlations.astype(numpy.int64).tolist()))
+        self.edges = edges
+
+        if self.sparse:
+            self.counts = SparseCounts(numpy.column_stack(index),
+                                       values.astype(dtype), shape)
+        else:
+            self.counts = numpy.zeros(shape, dtype=dtype)
+            self.counts[index] = values
+
+        self._invalidate()
+
+        return(self)
+
+    def from_file(self, filename, **kwargs):
+        """
+        Read the histogram from the text format or, without loading it,
+        from an indexed file (see to_indexed).
+        """
+        if is_indexed(filename):
+            return(self.from_indexed(filename))
+        else:
+            return(super(DenseGN, self).from_file(filename, **kwargs))
+
+    def from_indexed(self, filename):
+        """
+        Open an indexed histogram file. The counts are memory-mapped, so
+        only the bins which are looked at, such as with
+        g3[(0, 1, 2)][p1][t1], are read from disk.
+        """
+        header, counts = indexed.load(filename)
+
+        if [tuple(item) for item in header["layout"]] != list(self.layout):
+            raise(ValueError("{} does not hold a {}.".format(
+                filename, type(self).__name__)))
+
+        self.sparse = False
+        self.exposure = header.get("exposure")
+        self.correlations = list(map(tuple, header["correlations"]))
+        self.edges = [numpy.array(bins, dtype=numpy.float64).reshape(-1, 2)
+                      for bins in header["edges"]]
+        self.counts = counts
+        self._invalidate()
+
+        return(self)
+
+    def to_indexed(self, filename):
+        """
+        Write the histogram as an indexed file, which can be opened without
+        loading it. The counts are stored densely.
+        """
+        counts = indexed.create(filename, self.layout, self.correlations,
+                                self.edges, self.counts.dtype,
+                                exposure=self.exposure)
+
+        if self.sparse:
+            counts[tuple(self.counts.coords.T)] = self.counts.data
+        else:
+            counts[...] = self.counts
+
+        if isinstance(counts, numpy.memmap):
+            counts.flush()
+
+    @classmethod
+    def index(cls, filename, indexed_filename, int_counts=None):
+        """
+        Convert a histogram in the text format to an indexed file, and open
+        it. The text is read twice, once to find the bins and once to fill
+        in the counts, so the histogram is never held in memory.
+        """
+        gn = cls()
+        n_columns = gn._columns()[2]
+
+        with open_table(filename) as stream_in:
+            correlations, edges, integral = gn._collect(
+                read_chunks(stream_in, n_columns + 1))
+
+        counts = indexed.create(
+            indexed_filename, cls.layout,
+            correlations.astype(numpy.int64).tolist(), edges,
+            counts_dtype(int_counts, integral))
+
+        with open_table(filename) as stream_in:
+            for rows in read_chunks(stream_in, n_columns + 1):
+                counts[gn._positions(rows, correlations, edges)] = \
+                    rows[:, n_columns]
+
+        if isinstance(counts, numpy.memmap):
+            counts.flush()
+
+        del(counts)
+
+        return(cls(filename=indexed_filename))
+
+    def _lines(self, channel_field, bin_fields):
+        """
+        Yield the lines of each correlation in the order of the text format,
+        as the fields of all columns but the counts, and the counts. The
+        fields are formed lazily from channel_field(channel) and the fields
+        of the bins of each dimension.
+        """
+        if self.sparse:
+            # Group the nonzero bins by correlation.
+            order = numpy.argsort(self.counts.coords[:, 0], kind="stable")
+            coords = self.counts.coords[order]
+            data = self.counts.data[order]
+            bounds = numpy.searchsorted(coords[:, 0],
+                                        numpy.arange(len(self) + 1))
+
+        for correlation in sorted(self.correlations):
+            fields = list()
+
+            for kind, item in self.layout:
+                if kind == "channel":
+                    fields.append([channel_field(correlation[item])])
+                else:
+                    fields.append(bin_fields[item])
+
+                # Combine neighboring single values, for a shorter product.
+                if len(fields) > 1 and len(fields[-1]) == len(fields[-2]) == 1:
+                    fields[-2:] = [[fields[-2][0] + fields[-1][0]]]
+
+            row = self._row(correlation)
+
+            if self.sparse:
+                start, stop = bounds[row:row+2]
+                counts = numpy.zeros(self.counts.shape[1:], dtype=data.dtype)
+                counts[tuple(coords[start:stop, 1:].T)] = data[start:stop]
+            else:
+                counts = self.counts[row]
+
+            yield(itertools.product(*fields), counts.ravel().tolist())
+
+    def to_stream(self):
+        bin_fields = [edges.tolist() for edges in self.edges]
+
+        for fields, counts in self._lines(lambda channel: [channel],
+                                          bin_fields):
+            for line, count in zip(fields, counts):
+                yield(list(itertools.chain.from_iterable(line)) + [count])
+
+    def to_file(self, filename):
+        """
+        Write the histogram in the format produced by the photon programs.
+        Each bin is formatted once, and the lines are assembled from these
+        and the counts in bulk.
+        """
+        bin_fields = [["{:.2f},{:.2f},".format(*bin) for bin in edges.tolist()]
+                      for edges in self.edges]
+
+        def lines():
+            for fields, counts in self._lines("{},".format, bin_fields):
+                for line in map(operator.add, map("".join, fields),
+                                map(str, counts)):
+                    yield(line)
+
+        with open(filename, "w") as stream_out:
+            write_lines(stream_out, lines())
+
+    def _rebinned(self):
+        result = type(self)(sparse=self.sparse)
+        result.exposure = self.exposure
+        result.correlations = list(self.correlations)
+        result.edges = list(self.edges)
+
+        return(result)
+
+    def copy(self):
+        result = self._rebinned()
+
+        if self.sparse:
+            result.counts = SparseCounts(self.counts.coords.copy(),
+                                         self.counts.data.copy(),
+                                         self.counts.shape)
+        else:
+            result.counts = numpy.array(self.counts)
+
+        return(result)
+
+    def __add__(self, other):
+        result = self.copy()
+        result += other
+        return(result)
+
+    def __iadd__(self, other):
+        """
+        Add the counts and exposure of another histogram of the same type
+        and with the same bins. Correlations found in only one of the
+        histograms are kept.
+        """
+        if type(other) is not type(self):
+            raise(TypeError("Cannot add {} to {}.".format(
+                type(other).__name__, type(self).__name__)))
+
+        if not self.correlations:
+            self.edges = list(other.edges)
+            self.counts = numpy.zeros((0,) + other.counts.shape[1:],
+                                      dtype=self.counts.dtype)
+            if self.sparse:
+                self.counts = SparseCounts.from_dense(self.counts)
+        elif not all(map(numpy.array_equal, other.edges, self.edges)):
+            raise(ValueError("Bins do not match those of the histogram."))
+
+        if isinstance(self.counts, numpy.memmap):
+            self.counts = numpy.array(self.counts)
+
+        rows = dict((correlation, row)
+                    for row, correlation in enumerate(self.correlations))
+        added = [correlation for correlation in other.correlations
+                 if correlation not in rows]
+
+        for correlation in added:
+            rows[correlation] = len(self.correlations)
+            self.correlations.append(correlation)
+
+        shape = (len(self.correlations),) + tuple(map(len, self.edges))
+        dtype = numpy.result_type(self.counts.dtype, other.counts.dtype)
+        other_rows = numpy.array([rows[correlation]
+                                  for correlation in other.correlations],
+                                 dtype=numpy.int64)
+
+        if self.sparse or other.sparse:
+            if other.sparse:
+                coords = other.counts.coords.copy()
+                data = other.counts.data
+            else:
+                coords = numpy.argwhere(other.counts)
+                data = other.counts[tuple(coords.T)]
+
+            coords[:, 0] = other_rows[coords[:, 0]]
+
+        if self.sparse:
+            self.counts = self.counts.astype(dtype)._combine(
+                numpy.concatenate((self.counts.coords, coords)),
+                numpy.concatenate((self.counts.data, data)),
+                shape)
+        else:
+            if self.counts.shape != shape or self.counts.dtype != dtype:
+                counts = numpy.zeros(shape, dtype=dtype)
+                counts[:len(self.counts)] = self.counts
+                self.counts = counts
+
+            if other.sparse:
+                numpy.add.at(self.counts, tuple(coords.T), data)
+            else:
+                self.counts[other_rows] += other.counts
+
+        if other.exposure is not None:
+            self.exposure = (self.exposure or 0) + other.exposure
+
+        self._invalidate()
+
+        return(self)
+
+    def rebin(self, dimension, n=2):
+        """
+        Combine every n neighboring bins along the dimension, returning a
+        new histogram. Bins left over at the end are dropped.
+        """
+        result = self._rebinned()
+
+        if n <= 1:
+            result.counts = self.counts[numpy.ones(len(self.correlations),
+                                                   dtype=bool)]
+            return(result)
+
+        result.edges[dimension] = binning.combine_edges(
+            self.edges[dimension], n)
+
+        if self.sparse:
+            result.counts = self.counts.rebin(dimension + 1, n)
+        else:
+            result.counts = binning.combine(self.counts, n,
+                                            axis=dimension + 1)
+
+        return(result)
+
+    def rebin_to(self, dimension, edges):
+        """
+        Redistribute the counts along the dimension into the bins given by
+        edges (such as from binning.log_edges), returning a new histogram.
+        Counts in bins which straddle an edge are split in proportion to the
+        overlap, so the counts become floats.
+        """
+        result = self._rebinned()
+        result.edges[dimension] = numpy.asarray(
+            edges, dtype=numpy.float64).reshape(-1, 2)
+
+        if self.sparse:
+            counts = self.counts.toarray()
+        else:
+            counts = self.counts
+
+        counts = binning.redistribute(counts, self.edges[dimension],
+                                      result.edges[dimension],
+                                      axis=dimension + 1)
+
+        if self.sparse:
+            result.counts = SparseCounts.from_dense(counts)
+        else:
+            result.counts = counts
+
+        return(result)
+
+class PulseGN(DenseGN):
+    """
+    Base class for t3 histograms of order 3 and above, whose dimensions
+    alternate between pulse and time bins (p1, t1, p2, t2, ...). Most
+    quantities depend only on the pulse bins, so they are calculated from
+    the counts summed over the time bins.
+    """
+    def pulse_counts(self):
+        """
+        Return the counts summed over the time bins, as an array of shape
+        (n_correlations, n_pulse_bins, n_pulse_bins, ...).
+        """
+        if self._pulse_counts is None:
+            self._pulse_counts = self.marginal(
+                range(1, self.dimensions(), 2))
+
+        return(self._pulse_counts)
+
+    def _invalidate(self):
+        super(PulseGN, self)._invalidate()
+        self._pulse_counts = None
+
+    def pulses(self):
+        """
+        Return the centers of the pulse bins.
+        """
+        return(self.edges[0].mean(axis=1).tolist())
+
+    def combine(self):
+        """
+        Return the pulse bin centers and the counts for each combination of
+        pulse bins, summed over all cross-correlations.
+        """
+        return(self.pulses(),
+               self.pulse_counts()[self.cross_correlation_mask()].sum(axis=0))
+
+    def peak_counts(self, *pulse_bins):
+        """
+        Return the counts in the peak given by one pulse bin per pulse
+        dimension, summed over all cross-correlations.
+        """
+        index = tuple(self.bin_position(dimension, pulse_bin)
+                      for dimension, pulse_bin
+                      in zip(range(0, self.dimensions(), 2), pulse_bins))
+
+        return(self.pulse_counts()[(self.cross_correlation_mask(),) + index]\
+               .sum().item())
@@ -1,11 +1,10 @@
-import bz2
 import copy
-import csv
 import math
-import os
 
 import numpy
 
+from .table import open_table, read_header, read_table
+
 class Counts(object):
     def __init__(self, events, counts):
         self.events = events
@@ -36,41 +35,23 @@ class IDGN(object):
         return(iter(self.counts))
 
     def from_file(self, filename):
-        if not os.path.exists(filename):
-            bz2_name = "{}.bz2".format(filename)
-            if os.path.exists(bz2_name):
-                filename = bz2_name
-     
-        if filename.endswith("bz2"):
-            open_f = lambda x: bz2.open(x, "rt")
-        else: 
-            open_f = open
-                
-        with open_f(filename) as stream_in:
+        with open_table(filename) as stream_in:
             self.from_stream(stream_in)
 
     def from_stream(self, stream_in):
-        reader = csv.reader(stream_in)
-
-        read_bins = False
-        
-        for line in reader:
-            if not read_bins:
-                if not line[0]:
-                    self.bins.append(line[4:])
-                else:
-                    read_bins = True
+        header, pending = read_header(stream_in, lambda line: not line[0])
 
-            if read_bins:
-                intensity_bin = tuple(map(int, line[:2]))
+        for line in header:
+            self.bins.append(line[4:])
 
-                if self.window_width is None:
-                    self.window_width = int(line[2])
+        rows = read_table(stream_in, pending=pending).astype(numpy.int64)
 
-                events = int(line[3])
-                counts = numpy.array(list(map(int, line[4:])))
+        if len(rows) and self.window_width is None:
+            self.window_width = int(rows[0, 2])
 
-                self[intensity_bin] = Counts(events, counts)
+        for line in rows:
+            intensity_bin = tuple(line[:2].tolist())
+            self[intensity_bin] = Counts(int(line[3]), line[4:])
 
     def max_intensity(self, threshold=0.7, cast_to_gn=None):
         """
@@ -1,7 +1,7 @@
 from .Picoquant import Picoquant
-from .Intensity import Intensity
 from .Limits import Limits
-from . import calculate
+
+CENSUS_PHOTONS = 2**20
 
 class Info(object):
 
@@ -43,23 +43,27 @@ class Info(object):
     def get_integration_time(self):
         return(self._pq.integration_time())
 
-    def get_channels(self):
+    def get_channels(self, number=CENSUS_PHOTONS):
+        """
+        Return the number of channels with photons (plus the sync channel
+        for t3), found from the first number of photons in the file (see
+        Picoquant.census).
+        """
         try:
             self._channels
         except:
             if self._pq.channels() == 2:
                 self._channels = 2
             else:
-                intensity = Intensity(calculate.intensity(self.filename,
-                                      channels = 10, count_all=True))
-                if self._mode == "t2":
+                census = self._pq.census(number)
+
+                if self.get_mode() == "t2":
                     self._channels = 0
-                elif self._mode == "t3":
+                elif self.get_mode() == "t3":
                     self._channels = 1
 
-                for channel, counts in intensity:
-                    if sum(counts):
-                        self._channels += 1
+                self._channels += sum(1 for counts in census["counts"]
+                                      if counts)
 
         return(self._channels)
 
@@ -1,8 +1,4 @@
-import os
-import bz2
 import csv
-import collections
-import bisect
 import statistics
 
 import numpy
@@ -10,18 +6,29 @@ import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
 
 from .Blinking import *
+from . import binning
+from .table import open_table, read_chunks, rechunk, write_table
 from .util import *
 
+CHUNK_BINS = 2**20
+
 def mode_error(mode):
     raise(KeyError("Unknown mode: {}".format(mode)))
 
 class Intensity(object):
     """
     Implements the tools necessary for analyzing intensity data.
+
+    times: the (start, stop) of each time bin, as an (n_bins, 2) array.
+    counts: the counts of each channel, as an (n_channels, n_bins) array.
+        intensity[channel] is a row of this array.
+
+    Operations which select time bins, such as range, return views of the
+    arrays rather than copies.
     """
     def __init__(self, stream_in=None, filename=None, mode=None):
-        self.times = list()
-        self.counts = dict()
+        self.times = numpy.empty((0, 2), dtype=numpy.int64)
+        self.counts = numpy.empty((0, 0), dtype=numpy.int64)
 
         if stream_in is not None:
             self.from_stream(stream_in)
@@ -31,61 +38,91 @@ class Intensity(object):
         if mode is not None:
             self.mode = mode
         else:
-            if sum(self[0]):
+            if len(self) and self[0].any():
                 self.mode = "t2"
             else:
                 self.mode = "t3"
 
+    def _derived(self, times, counts, mode=None):
+        """
+        Return an intensity with the given times and counts.
+        """
+        intensity = Intensity(mode=mode or self.mode)
+        intensity.times = times
+        intensity.counts = counts
+
+        return(intensity)
+
     def __getitem__(self, channel):
         return(self.counts[channel])
 
     def __setitem__(self, channel, value):
-        self.counts[channel] = value
+        """
+        Set the counts of a channel, or add the next channel.
+        """
+        value = numpy.asarray(value)
+
+        if channel == len(self):
+            if not len(self):
+                self.counts = value[numpy.newaxis].copy()
+            else:
+                self.counts = numpy.concatenate(
+                    (self.counts, value[numpy.newaxis]))
+        else:
+            dtype = numpy.result_type(self.counts, value)
+
+            if dtype != self.counts.dtype:
+                self.counts = self.counts.astype(dtype)
+
+            self.counts[channel] = value
 
     def __delitem__(self, channel):
-        del(self.counts[channel])
+        """
+        Remove a channel. The later channels move down by one.
+        """
+        self.counts = numpy.delete(self.counts, channel, axis=0)
 
     def __iter__(self):
-        for channel in sorted(self.counts.keys()):
-            yield(channel, self[channel])
+        return(iter(enumerate(self.counts)))
 
     def __len__(self):
-        return(len(self.counts.keys()))
+        return(len(self.counts))
 
     @property
     def time_bins(self):
-        return(list(map(statistics.mean, self.times)))
+        return(self.times.mean(axis=1))
 
     def max(self):
-        my_max = 0
-        
-        for curve, counts in self:
-            if max(counts) > my_max:
-                my_max = max(counts)
-
-        return(my_max)
+        if self.counts.size:
+            return(self.counts.max())
+        else:
+            return(0)
 
     def dt(self):
-        return(self.times[1][1] - self.times[1][0])
+        return(self.times[1, 1] - self.times[1, 0])
 
     def channels(self):
-        return(len(self.counts.keys()))
+        return(len(self))
 
     def from_stream(self, stream_in):
-        raw_counts = list()
-
-        for line in csv.reader(stream_in):
-            bin_left = int(line[0])
-            bin_right = int(line[1])
-
-            counts = tuple(map(int, line[2:]))
+        """
+        Read the trace from the stream. Each chunk of the table is converted
+        to integers as it is read, so only the final arrays and one chunk of
+        the table are held at once.
+        """
+        times = [numpy.empty((0, 2), dtype=numpy.int64)]
+        counts = list()
 
-            self.times.append((bin_left, bin_right))
+        for rows in read_chunks(stream_in):
+            times.append(rows[:, :2].astype(numpy.int64))
+            counts.append(rows[:, 2:].T.astype(numpy.int64))
 
-            raw_counts.append(counts)
+        self.times = numpy.concatenate(times)
 
-        for channel, counts in enumerate(numpy.transpose(raw_counts)):
-            self[channel] = counts
+        if counts:
+            self.counts = numpy.concatenate(counts, axis=1)
+        else:
+            self.counts = numpy.empty((0, 0), dtype=numpy.int64)
     
         return(self)
 
@@ -94,26 +131,11 @@ class Intensity(object):
         Read data from the file and return an intensity object wtih
         that data.
         """
-        if not os.path.exists(filename):
-            bz2_name = "{}.bz2".format(filename)
-            if os.path.exists(bz2_name):
-                filename = bz2_name
-                
-        if filename.endswith("bz2"): 
-            open_f = lambda x: bz2.open(x, "rt")
-        else:
-            open_f = open
-        with open_f(filename) as stream_in:
+        with open_table(filename) as stream_in:
             return(self.from_stream(stream_in))
 
-        return(self)
-
     def stream(self):
-        channels = list(sorted(self.counts.keys()))
-
-        for index, time_bin in enumerate(self.times):
-            yield(index, tuple(map(lambda x: x[index],
-                                   map(lambda x: self[x], channels))))
+        return(enumerate(map(tuple, self.counts.T.tolist())))
 
     def time_unit(self):
         if self.mode == "t2":
@@ -125,28 +147,18 @@ class Intensity(object):
         """
         Return the counts, normalized to pulse or time as necessary.
         """
-        intensity = Intensity(mode=self.mode)
-        
         if self.mode == "t2":
-            time_factor = 1e-12
-            # for index, time in enumerate(numpy.array(self.times)*1e-12):
-                # intensity.times.append(tuple(time))
-
-            intensity.times = list(map(lambda x: (x[0] * time_factor,
-                                       x[1] * time_factor), self.times))
-
+            times = self.times*1e-12
         elif self.mode == "t3":
-            intensity.times = self.times
-
-        norm = lambda t, c: float(c)/(t[1]-t[0])
-
-        for channel, counts in self:
-            intensity[channel] = list(map(norm, intensity.times, counts))
+            times = self.times
+        else:
+            mode_error(self.mode)
 
-        return(intensity)
+        return(self._derived(times,
+                             self.counts/(times[:, 1] - times[:, 0])))
 
     def export_Intensity(self, filename):
-        times = list(map(lambda x: x[0], self.times))
+        times = self.times[:, 0]
 
         with open(filename, 'w') as csvfile:
             csvline = csv.writer(csvfile)
@@ -164,25 +176,21 @@ class Intensity(object):
                 line.append('channel {}'.format(channel))
             csvline.writerow(line)
 
-            for i in range(len(times)):
-                line = [times[i]]
-                for channel, counts in self:
-                    line.append(counts[i])
-                
-                csvline.writerow(line)
+            write_table(csvfile, [times] + list(self.counts),
+                        newline=csvline.dialect.lineterminator)
 
     def add_intensity_axes(self, ax):
         """
         Add the lifetime information to the specified set of axes.
         """
-        times = list(map(lambda x: x[0], self.times))
+        times = self.times[:, 0]
         
         if len(self) == 1:
             ax.plot(times, self[0])
         else:
 
             for channel, counts in self:
-                if max(counts):
+                if counts.any():
                     ax.plot(times, counts, label=str(channel))
 
             ax.legend()
@@ -202,10 +210,7 @@ class Intensity(object):
 #        return(fig)
         
     def n_channels(self):
-        if isinstance(self.counts[0], collections.Iterable):
-            return(len(self.counts[0]))
-        else:
-            return(1)
+        return(len(self))
 
     def mean(self):
         """
@@ -214,19 +219,11 @@ class Intensity(object):
         return(self.summed()[0]/float(self.channels()))
 
     def summed(self):
-        total = None
-        
-        for channel, counts in self:
-            if total is None:
-                total = numpy.array(counts)
-            else:
-                total += counts
-
-        intensity = Intensity(mode=self.mode)
-        intensity.times = self.times
-        intensity[0] = total
-        
-        return(intensity)
+        """
+        Return the intensity summed over all channels, as a single channel.
+        """
+        return(self._derived(self.times,
+                             self.counts.sum(axis=0)[numpy.newaxis]))
     
     def histogram(self, bins=200, summed=True):
         """
@@ -282,72 +279,263 @@ class Intensity(object):
         Use the repetiion rate to transform the time data into seconds,
         and the counts per pulse into counts per second.
         """
-        times = list(map(lambda x: (x[0]/repetition_rate,
-                                    x[1]/repetition_rate),
-                         self.times))
+        return(self._derived(self.times/repetition_rate,
+                             self.normalized().counts*repetition_rate,
+                             mode="t2"))
+
+    def range(self, start_time, stop_time):
+        """
+        Return the intensity trace between the start and stop times.
+        """
+        start_index, stop_index = numpy.searchsorted(
+            self.times[:, 0], (start_time, stop_time))
+
+        return(self._derived(self.times[start_index:stop_index],
+                             self.counts[:, start_index:stop_index]))
+
+    def zero_origin(self):
+        """
+        Subtract the first time from all times, such that time starts from zero.
+        """
+        return(self._derived(self.times - self.times[0, 0], self.counts))
+
+    def threshold(self, threshold=0.7):
+        """
+        Remove all events below the specified threshold intensity (relative
+        to maximum).
+        """
+        total = self.counts.sum(axis=0)
+        keep = total >= total.max()*threshold
+
+        return(self._derived(self.times[keep], self.counts[:, keep]))
 
+    def correlate(self, max_lag=None, n_log_bins=None, pad=True,
+                  normalize=True):
+        """
+        Return the auto- and cross-correlations of all channels, as the
+        (tau_lower, tau_upper) of each lag bin, in the units of the times,
+        and an array g2 of shape (n_channels, n_channels, n_lags):
+
+            g2[c0, c1](tau) = <I_c0(t) I_c1(t - tau)>/(<I_c0> <I_c1>)
+
+        where the average is over the overlapping bins, as for
+        intensity_correlate. All pairs come from one FFT of the trace, which
+        must have contiguous bins of equal width.
+
+        max_lag: the longest lag, in the units of the times (by default the
+            length of the trace).
+        n_log_bins: if given, the lags are combined into this many
+            log-spaced bins, the products and overlaps of the lags in each
+            bin being added before normalizing. Bins holding no lag are
+            dropped, and the zero lag keeps a bin of its own.
+        pad: add zeros to the trace, such that the lags do not wrap around
+            its end. Without padding the correlation is circular.
+        normalize: if False, return the sums of the products instead.
+        """
+        counts = numpy.asarray(self.counts, dtype=numpy.float64)
+        n_channels, n = counts.shape
+
+        if n < 2:
+            raise(ValueError("Correlation needs at least two time bins."))
+
+        width = self.dt()
+
+        if max_lag is None:
+            n_lags = n
+        else:
+            n_lags = min(int(max_lag // width) + 1, n)
+
+        if pad:
+            size = 1 << int(2*n - 1).bit_length()
+        else:
+            size = n
+
+        spectrum = numpy.fft.rfft(counts, n=size, axis=1)
+        products = numpy.fft.irfft(
+            spectrum[:, numpy.newaxis]*spectrum[numpy.newaxis].conj(),
+            n=size, axis=2)[..., :n_lags]
+
+        lags = numpy.arange(n_lags)
+        if pad:
+            overlaps = (n - lags).astype(numpy.float64)
+        else:
+            overlaps = numpy.full(n_lags, float(n))
+
+        edges = numpy.column_stack((lags, lags + 1))
+
+        if n_log_bins is not None and n_lags > 1:
+            bounds = binning.log_edges(1, n_lags, n_log_bins)
+            groups = numpy.concatenate(
+                ([0], numpy.searchsorted(bounds[:, 1], lags[1:],
+                                         side="right") + 1))
+            starts = numpy.flatnonzero(numpy.concatenate(
+                ([True], groups[1:] != groups[:-1])))
+
+            products = numpy.add.reduceat(products, starts, axis=2)
+            overlaps = numpy.add.reduceat(overlaps, starts)
+            edges = numpy.column_stack(
+                (lags[starts], numpy.append(lags[starts[1:]], n_lags)))
+
+        if normalize:
+            means = counts.mean(axis=1)
+            scale = means[:, numpy.newaxis]*means[numpy.newaxis]
+            normalization = overlaps*scale[..., numpy.newaxis]
+            products = numpy.divide(products, normalization,
+                                    out=numpy.zeros_like(products),
+                                    where=normalization > 0)
+
+        return(edges*width, products)
+
+def intensity_chunks(stream_in, n_bins=CHUNK_BINS, mode=None):
+    """
+    Yield the trace in the stream as Intensity objects of n_bins time bins
+    each (the last may be shorter). Unless given, the mode is determined
+    from the first chunk.
+    """
+    for rows in rechunk(read_chunks(stream_in), n_bins):
         intensity = Intensity(mode="t2")
-        intensity.times = times
+        intensity.times = rows[:, :2].astype(numpy.int64)
+        intensity.counts = rows[:, 2:].T.astype(numpy.int64)
 
-        norm = self.normalized()
+        if mode is None:
+            mode = "t2" if intensity[0].any() else "t3"
 
-        for channel, counts in self:
-            intensity[channel] = list(map(lambda x: x*repetition_rate,
-                                          norm[channel]))
+        intensity.mode = mode
 
-        return(intensity)
+        yield(intensity)
 
-    def range(self, start_time, stop_time):
+class IntensityStream(object):
+    """
+    An intensity trace which is read from its file in chunks of n_bins time
+    bins, rather than all at once, for traces too long to hold in memory.
+    Iterating yields the chunks as Intensity objects, and each pass reads
+    the file again.
+
+    The reductions (sum, max, histogram, downsample) each hold one chunk at
+    a time, and reduce applies any other function in the same way.
+    """
+    def __init__(self, filename, n_bins=CHUNK_BINS, mode=None):
+        self.filename = filename
+        self.n_bins = n_bins
+        self.mode = mode
+
+    def chunks(self, n_bins=None):
+        with open_table(self.filename) as stream_in:
+            for intensity in intensity_chunks(stream_in,
+                                              n_bins or self.n_bins,
+                                              mode=self.mode):
+                self.mode = intensity.mode
+                yield(intensity)
+
+    def __iter__(self):
+        return(self.chunks())
+
+    def reduce(self, function, initial=None):
         """
-        Return the intensity trace between the start and stop times.
+        Return function(...function(function(initial, chunk0), chunk1)...),
+        or function(chunk0, chunk1)... if initial is None.
         """
-        times = list(map(lambda x: x[0], self.times))
-        
-        start_index = bisect.bisect_left(times, start_time)
-        stop_index = bisect.bisect_left(times, stop_time)
+        result = initial
 
-        intensity = Intensity(mode=self.mode)
-        intensity.times = self.times[start_index:stop_index]
-    
-        for channel, counts in self:
-            intensity[channel] = counts[start_index:stop_index]
+        for intensity in self:
+            if result is None:
+                result = intensity
+            else:
+                result = function(result, intensity)
 
-        return(intensity)
+        return(result)
 
-    def zero_origin(self):
+    def sum(self):
         """
-        Subtract the first time from all times, such that time starts from zero.
+        Return the total counts of each channel.
+        """
+        return(self.reduce(lambda total, intensity:
+                           total + intensity.counts.sum(axis=1), 0))
+
+    def max(self):
+        """
+        Return the largest count in any channel and time bin.
+        """
+        return(self.reduce(lambda result, intensity:
+                           max(result, intensity.max()), 0))
+
+    def histogram(self, bins=200, summed=True):
         """
-        intensity = Intensity(mode=self.mode)
-        start = self.times[0][0]
-        intensity.times = list(map(lambda x: (x[0] - start,
-                                              x[1] - start),
-                                   self.times))
+        Return the same histograms as Intensity.histogram. If bins is a
+        number of bins, the range of the intensities is found in a first
+        pass over the file. Raise ValueError if the file holds no time bins.
+        """
+        if summed:
+            values = lambda intensity: intensity.counts.sum(axis=0)[
+                numpy.newaxis]
+        else:
+            values = lambda intensity: intensity.normalized().counts
 
-        for channel, counts in self:
-            intensity[channel] = counts
+        if numpy.ndim(bins) == 0:
+            low = high = None
 
-        return(intensity)
+            for intensity in self:
+                series = values(intensity)
 
-    def threshold(self, threshold=0.7):
+                if low is None:
+                    low = series.min(axis=1)
+                    high = series.max(axis=1)
+                else:
+                    low = numpy.minimum(low, series.min(axis=1))
+                    high = numpy.maximum(high, series.max(axis=1))
+
+            if low is None:
+                raise(ValueError("No time bins in {}.".format(
+                    self.filename)))
+
+            edges = [numpy.histogram_bin_edges((series_low, series_high),
+                                               bins=bins)
+                     for series_low, series_high in zip(low, high)]
+        else:
+            edges = None
+
+        hists = None
+
+        for intensity in self:
+            series = values(intensity)
+
+            if edges is None:
+                edges = [numpy.asarray(bins)]*len(series)
+
+            counts = [numpy.histogram(series_values, bins=series_edges)[0]
+                      for series_values, series_edges in zip(series, edges)]
+
+            if hists is None:
+                hists = counts
+            else:
+                hists = list(map(numpy.add, hists, counts))
+
+        if hists is None:
+            raise(ValueError("No time bins in {}.".format(self.filename)))
+
+        if summed:
+            return(hists[0], edges[0])
+        else:
+            return(list(enumerate(zip(hists, edges))))
+
+    def downsample(self, n):
         """
-        Remove all events below the specified threshold intensity (relative
-        to maximum).
+        Return the trace with every n neighboring time bins combined, as an
+        Intensity. Bins left over at the end are dropped.
         """
-        total = self.summed()
-        min_intensity = max(total[0])*threshold
+        n_bins = max(1, self.n_bins // n) * n
+        times = [numpy.empty((0, 2), dtype=numpy.int64)]
+        counts = list()
 
-        result = Intensity(mode=self.mode)
+        for intensity in self.chunks(n_bins=n_bins):
+            times.append(binning.combine_edges(intensity.times, n).astype(
+                intensity.times.dtype))
+            counts.append(binning.combine(intensity.counts, n, axis=1))
+
+        result = Intensity(mode=self.mode or "t2")
+        result.times = numpy.concatenate(times)
+
+        if counts:
+            result.counts = numpy.concatenate(counts, axis=1)
 
-        result.times = list(map(lambda y: y[0],
-                                filter(
-                                    lambda x: x[1] >= min_intensity,
-                                    zip(self.times, total[0]))))
-        
-        for channel, counts in self:
-            result[channel] = list(map(lambda y: y[0],
-                                       filter(
-                                           lambda x: x[1] >= min_intensity,
-                                           zip(counts, total[0]))))
-            
         return(result)
@@ -5,6 +5,7 @@ import statistics
 import numpy
 import scipy.optimize
 
+from . import binning
 from .util import *
 from .Exponential import *
 
@@ -82,11 +83,22 @@ class Lifetime(object):
         Collect every n bins and add them together. Return the result as a new
         lifetime object.
         """
-        times = list(zip(smooth(map(lambda x: x[0], self.times), n=n),
-                         smooth(map(lambda x: x[1], self.times), n=n)))
-        counts = rebin(self.counts, n=n)
+        counts, times = binning.rebin(self.counts, self.times, n)
 
-        return(Lifetime(counts, times=times))
+        return(Lifetime(counts.tolist(),
+                        times=list(map(tuple, times.tolist()))))
+
+    def rebin_to(self, times):
+        """
+        Redistribute the counts into the given (left, right) time bins, such
+        as from binning.log_edges, splitting the counts of bins which
+        straddle an edge in proportion to the overlap. Return the result as
+        a new lifetime object.
+        """
+        counts, times = binning.rebin(self.counts, self.times, times)
+
+        return(Lifetime(counts.tolist(),
+                        times=list(map(tuple, times.tolist()))))
 
     def range(self, lower, upper):
         """
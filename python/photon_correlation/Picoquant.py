@@ -1,136 +1,439 @@
-try:
-    import configparser
-    import io
-except:
-    import StringIO as io
-    import ConfigParser as configparser
-
-import subprocess
-import csv
-
-class FakeIniSection(object):
-    """
-    Wrapper to enable configparser to parse a file without sections.
-    """
-    def __init__(self, fp):
-        self.fp = fp
-        self.sechead = '[header]\n'
-        
-    def readline(self):
-        if self.sechead:
-            try:
-                return(self.sechead)
-            finally:
-                self.sechead = None
-        else:
-            return(self.fp.readline())
-
-def fake_ini_section(text, section="header"):
-    """
-    Add the fake section "{}" to an ini-like file.
-    """.format(section)
-    return("[{}]".format(section) + text)
-
-class Picoquant(object):
-    """
-    Base class for Picoquant data. This includes:
-    1. Common header
-    2. Hardware header
-    3. Mode header.
-    4. Data
-
-    Additionally, various helper routines are used to decode information
-    about the files, including resolution and mode.
-    """
-    def __init__(self, filename):
-        self._filename = filename
-        self._header = None
-        self._resolution = None
-        self._data = None
-        self._mode = None
-
-    def header(self):
-        if not self._header:
-            header_raw = subprocess.Popen(
-                ["picoquant",
-                 "--file-in", self._filename,
-                 "--header-only"],
-                stdout=subprocess.PIPE).stdout.read().decode()
-
-            self._header = configparser.ConfigParser()
-            self._header.readfp(io.StringIO(fake_ini_section(header_raw)))
-
-        return(self._header)
-
-    def repetition_rate(self):
-        """
-        Use the sync channel (or channel 0, if no sync) to determine
-        the repetition rate of the laser.
-        """
-        sync_rate = None
-        if self.header().has_option("header", "InpRate0"):
-            return(self.header().getfloat("header", "InpRate0"))
-        elif self.header().has_option("header", "syncrate"):
-            return(self.header().getfloat("header", "syncrate"))
-        else:
-            return(self.header().getfloat("header", "inprate[0]"))
-    
-    def channels(self):
-        """
-        Return the number of signal channels present in the device.
-        """
-        # return(self.header().getint("header", "inputchannelspresent"))
-        self._channels = self.header().getint("header", "ExtDevices")
-        if self._channels :
-            return( self._channels + 1 )
-        else:
-            return(2)
-
-    def resolution(self):
-        if not self._resolution:
-            resolution_raw = subprocess.Popen(
-                ["picoquant",
-                 "--file-in", self._filename,
-                 "--resolution-only"],
-                stdout=subprocess.PIPE).stdout.read().decode()
-
-            if "," in resolution_raw:
-                # curves
-                self._resolution = list()
-                for curve, resolution in csv.reader(\
-                    io.StringIO(resolution_raw)):
-                    self._resolution.append((int(curve),
-                                             float(resolution)))
-                self._resolution = tuple(self._resolution)
-            else:
-                # single result
-                self._resolution = float(resolution_raw)
-
-        return(self._resolution)
-
-    def mode(self):
-        if not self._mode:
-            self._mode = subprocess.Popen(
-                ["picoquant",
-                 "--file-in", self._filename,
-                 "--mode-only"],
-                stdout=subprocess.PIPE).communicate()[0].decode().strip()
-
-        return(self._mode)
-
-    def integration_time(self):
-        """
-        Return the integration time, in ms.
-        """
-        return(self.header().getint("header", "stopafter"))
-
-    def __iter__(self):
-        data = subprocess.Popen(
-            ["picoquant", 
-             "--file-in", self._filename],
-            stdout=subprocess.PIPE)
-        return(csv.reader(data.stdout))
-
-##if __name__ == "__main__":
-##    pq = Picoquant("20130116/qdv1295_633nm_1mhz_dot01.ht3")
-##    print(pq.header().get_section("header"))
+try:
+    import configparser
+    import io
+except:
+    import StringIO as io
+    import ConfigParser as configparser
+
+import subprocess
+import csv
+import json
+import logging
+import os
+
+import numpy
+
+from picoquant import PicoquantFile, modes
+from picoquant.picoharp import T2_RESOLUTION
+from picoquant.picoquant import T2_DTYPE, T3_DTYPE
+
+from .archive import PhotonArchive, is_archive, window_dimension
+
+class FakeIniSection(object):
+    """
+    Wrapper to enable configparser to parse a file without sections.
+    """
+    def __init__(self, fp):
+        self.fp = fp
+        self.sechead = '[header]\n'
+        
+    def readline(self):
+        if self.sechead:
+            try:
+                return(self.sechead)
+            finally:
+                self.sechead = None
+        else:
+            return(self.fp.readline())
+
+def fake_ini_section(text, section="header"):
+    """
+    Add the fake section "{}" to an ini-like file.
+    """.format(section)
+    return("[{}]\n".format(section) + text)
+
+def header_metadata(header):
+    """
+    Return the mode and resolution (in ps) of a PicoHarp or HydraHarp TTTR
+    file from its header, as printed by picoquant --header-only, following
+    the same rules as the in-process reader (picoquant.PicoquantFile).
+    Return None for the headers of other boards and modes.
+    """
+    ident = header.get("header", "Ident", fallback=None)
+    mode = {modes.MODE_T2: "t2",
+            modes.MODE_T3: "t3"}.get(
+                header.getint("header", "MeasurementMode", fallback=None))
+
+    if mode is None:
+        return(None)
+    elif ident == "PicoHarp 300":
+        if mode == "t2":
+            return(mode, float(T2_RESOLUTION))
+        elif header.has_option("header", "Brd[0].Resolution"):
+            # Board resolution is stored in ns.
+            return(mode, round(header.getfloat(
+                "header", "Brd[0].Resolution")*1000, 3))
+    elif ident == "HydraHarp" and header.has_option("header", "Resolution"):
+        return(mode, header.getfloat("header", "Resolution"))
+
+    return(None)
+
+class MetadataCache(object):
+    """
+    Process-wide cache of the header, mode and resolution of files, keyed by
+    the absolute path, size and modification time of each file so that a
+    modified file is queried again.
+
+    If sidecar is set, the metadata are also stored next to the data file
+    (with the suffix appended to the name) and reused by later processes,
+    which avoids querying every file again when sweeping parameters over
+    many files:
+
+        Picoquant.metadata_cache.sidecar = True
+    """
+    SIDECAR_SUFFIX = ".meta.json"
+
+    def __init__(self, sidecar=False, suffix=SIDECAR_SUFFIX):
+        self.sidecar = sidecar
+        self.suffix = suffix
+        self._cache = dict()
+
+    def key(self, filename, variant=None):
+        stat = os.stat(filename)
+        return((os.path.abspath(filename), stat.st_size, stat.st_mtime_ns,
+                variant))
+
+    def get(self, filename, query, variant=None):
+        """
+        Return the metadata for the file, calling query() to produce them
+        if they are neither cached nor stored in a valid sidecar. variant
+        distinguishes metadata produced with different settings.
+        """
+        key = self.key(filename, variant)
+
+        if key not in self._cache:
+            metadata = None
+
+            if self.sidecar:
+                metadata = self._read_sidecar(filename, key)
+
+            if metadata is None:
+                metadata = query()
+
+                if self.sidecar:
+                    self._write_sidecar(filename, key, metadata)
+
+            self._cache[key] = metadata
+
+        return(self._cache[key])
+
+    def clear(self):
+        self._cache.clear()
+
+    def _read_sidecar(self, filename, key):
+        try:
+            with open(filename + self.suffix) as stream:
+                stored = json.load(stream)
+        except (EnvironmentError, ValueError):
+            return(None)
+
+        if stored.get("key") != list(key):
+            return(None)
+
+        metadata = stored["metadata"]
+        if isinstance(metadata.get("resolution"), list):
+            metadata["resolution"] = tuple(
+                tuple(curve) for curve in metadata["resolution"])
+
+        return(metadata)
+
+    def _write_sidecar(self, filename, key, metadata):
+        sidecar_filename = filename + self.suffix
+        temporary_filename = "{}.{}".format(sidecar_filename, os.getpid())
+
+        try:
+            with open(temporary_filename, "w") as stream:
+                json.dump({"key": key, "metadata": metadata}, stream)
+            os.replace(temporary_filename, sidecar_filename)
+        except EnvironmentError as error:
+            logging.warning("Could not write metadata for {}: {}".format(
+                filename, error))
+
+class Picoquant(object):
+    """
+    Base class for Picoquant data. This includes:
+    1. Common header
+    2. Hardware header
+    3. Mode header.
+    4. Data
+
+    Additionally, various helper routines are used to decode information
+    about the files, including resolution and mode.
+
+    PicoHarp and HydraHarp TTTR files are read in-process by
+    picoquant.PicoquantFile, and block-compressed photon archives by
+    archive.PhotonArchive; other files (including compressed ones) are
+    handled by the picoquant program.
+    """
+    metadata_cache = MetadataCache()
+    census_cache = MetadataCache(suffix=".census.json")
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._header = None
+        self._metadata = None
+        self._data = None
+        self._native = None
+
+    def native(self):
+        """
+        Return the in-process reader for the file, or None if the file must
+        be decoded by picoquant.
+        """
+        if self._native is None:
+            try:
+                if is_archive(self._filename):
+                    self._native = PhotonArchive(self._filename)
+                else:
+                    self._native = PicoquantFile(self._filename)
+            except (EnvironmentError, ValueError):
+                self._native = False
+
+        return(self._native or None)
+
+    def metadata(self):
+        """
+        Return the header, mode and resolution of the file as a dict. These
+        are looked up once per file and shared by all Picoquant instances in
+        the process (see metadata_cache).
+        """
+        if self._metadata is None:
+            self._metadata = self.metadata_cache.get(self._filename,
+                                                self._query_metadata)
+
+        return(self._metadata)
+
+    def _query_metadata(self):
+        if self.native():
+            return({"header": dict((key, str(value)) for key, value
+                                   in self.native().header().items()),
+                    "mode": self.native().mode(),
+                    "resolution": self.native().resolution()})
+
+        header_raw = subprocess.Popen(
+            ["picoquant",
+             "--file-in", self._filename,
+             "--header-only"],
+            stdout=subprocess.PIPE).stdout.read().decode()
+
+        header = configparser.ConfigParser(interpolation=None)
+        header.read_string(fake_ini_section(header_raw))
+
+        metadata = header_metadata(header)
+
+        if metadata is not None:
+            mode, resolution = metadata
+        else:
+            # Other boards and interactive files need picoquant to find
+            # the mode and the (per-curve) resolution.
+            mode, resolution = self._query_mode_resolution()
+
+        return({"header": dict(header.items("header")),
+                "mode": mode,
+                "resolution": resolution})
+
+    def _query_mode_resolution(self):
+        resolution_raw = subprocess.Popen(
+            ["picoquant",
+             "--file-in", self._filename,
+             "--resolution-only"],
+            stdout=subprocess.PIPE).stdout.read().decode()
+
+        if "," in resolution_raw:
+            # curves
+            resolution = list()
+            for curve, curve_resolution in csv.reader(\
+                io.StringIO(resolution_raw)):
+                resolution.append((int(curve), float(curve_resolution)))
+            resolution = tuple(resolution)
+        else:
+            # single result
+            resolution = float(resolution_raw)
+
+        mode = subprocess.Popen(
+            ["picoquant",
+             "--file-in", self._filename,
+             "--mode-only"],
+            stdout=subprocess.PIPE).communicate()[0].decode().strip()
+
+        return(mode, resolution)
+
+    def header(self):
+        if not self._header:
+            self._header = configparser.ConfigParser(interpolation=None)
+            self._header.read_dict({"header": self.metadata()["header"]})
+
+        return(self._header)
+
+    def repetition_rate(self):
+        """
+        Use the sync channel (or channel 0, if no sync) to determine
+        the repetition rate of the laser.
+        """
+        sync_rate = None
+        if self.header().has_option("header", "InpRate0"):
+            return(self.header().getfloat("header", "InpRate0"))
+        elif self.header().has_option("header", "syncrate"):
+            return(self.header().getfloat("header", "syncrate"))
+        else:
+            return(self.header().getfloat("header", "inprate[0]"))
+    
+    def channels(self):
+        """
+        Return the number of signal channels present in the device.
+        """
+        # return(self.header().getint("header", "inputchannelspresent"))
+        self._channels = self.header().getint("header", "ExtDevices")
+        if self._channels :
+            return( self._channels + 1 )
+        else:
+            return(2)
+
+    def resolution(self):
+        return(self.metadata()["resolution"])
+
+    def mode(self):
+        return(self.metadata()["mode"])
+
+    def integration_time(self):
+        """
+        Return the integration time, in ms.
+        """
+        return(self.header().getint("header", "stopafter"))
+
+    def photons(self, number=None):
+        """
+        Return all photons in the file (or the first number of them) as a
+        numpy structured array, with fields channel and time (t2) or
+        channel, pulse and time (t3).
+        """
+        if self.native():
+            if number is None:
+                return(self.native().photons())
+            else:
+                return(numpy.concatenate(
+                    [numpy.empty(0, dtype=self.native().dtype())] +
+                    list(self.blocks(number))))
+
+        cmd = ["picoquant",
+               "--file-in", self._filename]
+
+        if number is not None:
+            cmd.extend(("--number", str(number)))
+
+        data = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        columns = numpy.loadtxt(data.stdout, delimiter=",",
+                                dtype=numpy.int64, ndmin=2)
+
+        dtype = T2_DTYPE if self.mode() == "t2" else T3_DTYPE
+        photons = numpy.empty(len(columns), dtype=dtype)
+        for index, name in enumerate(dtype.names):
+            photons[name] = columns[:, index]
+
+        return(photons)
+
+    def blocks(self, number=None):
+        """
+        Yield the photons in the file (or the first number of them) as
+        structured arrays, in blocks. Files read in-process are decoded one
+        block at a time; others are decoded by picoquant as a single block.
+        """
+        if not self.native():
+            yield(self.photons(number))
+            return
+
+        remaining = number
+
+        for photons in self.native().blocks():
+            if remaining is not None:
+                photons = photons[:remaining]
+                remaining -= len(photons)
+
+            yield(photons)
+
+            if remaining is not None and remaining <= 0:
+                break
+
+    def census(self, number=None):
+        """
+        Count the photons of each channel, and find the first and last
+        arrival time (t2) or pulse (t3) of each, from the first number of
+        photons (by default all of them). Return a dict with:
+
+        photons: the number of photons examined.
+        complete: False if counting stopped after number photons.
+        records: the number of records given by the header, if any.
+        counts, first, last: lists indexed by channel, with first and last
+            None for channels without photons.
+
+        Results are cached along with the file metadata (see census_cache),
+        so a file is only read again once it changes.
+        """
+        return(self.census_cache.get(self._filename,
+                                     lambda: self._query_census(number),
+                                     variant=number))
+
+    def _query_census(self, number):
+        dimension = window_dimension(self.mode())
+        n_photons = 0
+        counts = numpy.zeros(0, dtype=numpy.int64)
+        first = dict()
+        last = dict()
+
+        for photons in self.blocks(number):
+            if not len(photons):
+                continue
+
+            n_photons += len(photons)
+            channels = photons["channel"]
+            block_counts = numpy.bincount(channels)
+
+            if len(block_counts) > len(counts):
+                counts = numpy.concatenate(
+                    (counts, numpy.zeros(len(block_counts) - len(counts),
+                                         dtype=numpy.int64)))
+            counts[:len(block_counts)] += block_counts
+
+            # Photons are in order, so the first and last of each channel
+            # are those at the first and last of its indices.
+            present = numpy.flatnonzero(block_counts)
+            order = numpy.argsort(channels, kind="stable")
+            starts = numpy.cumsum(block_counts) - block_counts
+            times = photons[dimension][order]
+
+            for channel in present.tolist():
+                first.setdefault(channel,
+                                 int(times[starts[channel]]))
+                last[channel] = int(times[starts[channel] +
+                                          block_counts[channel] - 1])
+
+        if self.header().has_option("header", "NumRecords"):
+            records = self.header().getint("header", "NumRecords")
+        else:
+            records = None
+
+        channels = range(len(counts))
+
+        return({"photons": n_photons,
+                "complete": number is None or n_photons < number,
+                "records": records,
+                "counts": counts.tolist(),
+                "first": [first.get(channel) for channel in channels],
+                "last": [last.get(channel) for channel in channels]})
+
+    def __iter__(self):
+        if self.native():
+            for photons in self.native().blocks():
+                for photon in photons.tolist():
+                    yield(photon)
+        else:
+            data = subprocess.Popen(
+                ["picoquant", 
+                 "--file-in", self._filename],
+                stdout=subprocess.PIPE)
+            for photon in csv.reader(io.TextIOWrapper(data.stdout)):
+                yield(tuple(map(int, photon)))
+
+##if __name__ == "__main__":
+##    pq = Picoquant("20130116/qdv1295_633nm_1mhz_dot01.ht3")
+##    print(pq.header().get_section("header"))
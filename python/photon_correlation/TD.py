@@ -1,35 +1,29 @@
 import csv
 import os
 import logging
-import bisect
-import itertools
 import re
 import datetime
-import bz2
 
-from Intensity import *
+import numpy
+
+from .Intensity import *
+from .table import open_table, read_chunks, read_header
 
 def read_td(filename):
-    if filename.endswith("bz2"):
-        stream_in = bz2.BZ2File(filename)
-    else:
-        stream_in = open(filename)
-    
-    header = list()
-    yielded_header = False
-    for line in csv.reader(stream_in):
-        if not yielded_header:
-            if not line[0]:
-                header.append(line[2:])
-            else:
-                yield(header)
-                yielded_header = True
+    """
+    Yield the header (the bins of the histogram), then the time bin and the
+    counts of each row of the td file. The file is parsed in large chunks.
+    """
+    with open_table(filename) as stream_in:
+        header, pending = read_header(stream_in, lambda line: not line[0])
+        yield([line[2:] for line in header])
 
-        if yielded_header:
-            yield((float(line[0]), float(line[1])),
-                  tuple(map(int, line[2:])))
+        for rows in read_chunks(stream_in, pending=pending):
+            times = rows[:, :2].tolist()
+            counts = rows[:, 2:].astype(numpy.int64).tolist()
 
-    stream_in.close()
+            for time_bin, row_counts in zip(times, counts):
+                yield(tuple(time_bin), tuple(row_counts))
 
 class TD(object):
     def __init__(self, run_dir=None, filename=None, order=None):
@@ -61,13 +55,13 @@ class TD(object):
 
     def intensity(self):
         if not self._intensity:
-            self._intensity = Intensity(os.path.join(self.run_dir,
-                                                     "intensity"))
+            self._intensity = Intensity(
+                filename=os.path.join(self.run_dir, "intensity"))
 
         return(self._intensity)
 
     def max_intensity(self):
-        return(max(self.intensity().summed()[0]))
+        return(self.intensity().summed()[0].max())
 
     def gn_td(self, filename=None):
         if not filename:
@@ -104,36 +98,36 @@ class TD(object):
             intensity_bins = list(map(lambda x: x*max_intensity,
                                       magnitude_bins))
 
-            binned = [None for i in range(len(intensity_bins)-1)]
-
-            # The heavy lifting. Go through each
-            gn = self.gn_td()
-            header = next(gn)
-            
-            for index, vals in enumerate(\
-                itertools.izip(gn, self.intensity().stream())):
-                gn_line, intensity_line = vals
-                
-                gn_window, gn_vals = gn_line
-                intensity_window, intensity_vals = intensity_line
-
-                intensity = sum(intensity_vals)
-
-                bin_index = bisect.bisect_left(intensity_bins, intensity) - 1
-                if bin_index < 0:
-                    bin_index = 0
-
-                if index % 100 == 0:
-                    logging.info("{}: {}: {}, {}".format(
-                        datetime.datetime.now(),
-                        gn_window,
-                        intensity,
-                        bin_index))
-
-                if binned[bin_index] is None:
-                    binned[bin_index] = numpy.array(gn_vals)
-                else:
-                    binned[bin_index] += numpy.array(gn_vals)
+            # The intensity of each window, in the order of the td rows.
+            intensities = self.intensity().summed()[0]
+            n_bins = len(intensity_bins) - 1
+            binned = None
+            start = 0
+
+            # The heavy lifting. Sum the rows of each chunk into the bin of
+            # their intensity.
+            with open_table(self.gn_filename()) as stream_in:
+                header, pending = read_header(stream_in,
+                                              lambda line: not line[0])
+                header = [line[2:] for line in header]
+
+                for rows in read_chunks(stream_in, pending=pending):
+                    rows = rows[:len(intensities) - start]
+                    intensity = intensities[start:start+len(rows)]
+                    start += len(rows)
+
+                    if binned is None:
+                        binned = numpy.zeros((n_bins, rows.shape[1] - 2),
+                                             dtype=numpy.int64)
+
+                    bin_index = numpy.clip(
+                        numpy.searchsorted(intensity_bins, intensity) - 1,
+                        0, n_bins - 1)
+                    numpy.add.at(binned, bin_index,
+                                 rows[:, 2:].astype(numpy.int64))
+
+                    logging.info("{}: {} windows".format(
+                        datetime.datetime.now(), start))
 
             logging.info("Writing to {}".format(dst_filename))
 
@@ -143,13 +137,13 @@ class TD(object):
                 for line in header:
                     writer.writerow(["", ""] + line)
 
-                for i in range(len(intensity_bins)-1):
-                    vals = binned[i]
-
-                    if vals is None:
+                for i in range(n_bins):
+                    if binned is None:
                         vals = [0 for j in range(len(header[0]))]
+                    else:
+                        vals = binned[i].tolist()
 
-                    line = [intensity_bins[i], intensity_bins[i+1]] + list(vals)
+                    line = [intensity_bins[i], intensity_bins[i+1]] + vals
                     
                     writer.writerow(list(map(str, line)))
 
@@ -160,19 +154,22 @@ class TD(object):
         """
         max_intensity = self.max_intensity()
 
-        td = self.gn_td()
-        bins = next(td)
-
         counts = None
-        
-        for window, vals in td:
-            left, right = list(map(lambda x: x/max_intensity, window))
 
-            if min_magnitude <= left and right <= max_magnitude:
+        with open_table(self.gn_filename()) as stream_in:
+            header, pending = read_header(stream_in, lambda line: not line[0])
+            bins = [line[2:] for line in header]
+
+            for rows in read_chunks(stream_in, pending=pending):
+                left = rows[:, 0]/max_intensity
+                right = rows[:, 1]/max_intensity
+                selected = (min_magnitude <= left) & (right <= max_magnitude)
+                total = rows[selected, 2:].astype(numpy.int64).sum(axis=0)
+
                 if counts is None:
-                    counts = numpy.array(vals)
+                    counts = total
                 else:
-                    counts += numpy.array(vals)
+                    counts += total
 
         if counts is None:
             counts = [0 for i in range(len(bins[0]))]
@@ -19,7 +19,7 @@ from .T3 import T3
 
 __all__ = ["Exponential", "MultiExponential",
            "FLID", "G1", "G2_T2", "G2_T3", "G3_T2", "G3_T3", "G4_T3",
-           "Gaussian", "GaussianExponential", "IDGN", "Info"
+           "Gaussian", "GaussianExponential", "IDGN", "Info",
            "Lifetime", "Limits", "Intensity", "Offsets",
            "Picoquant", "T2", "T3",
            "calculate", "util"]
@@ -0,0 +1,217 @@
+import bz2
+import json
+import lzma
+import mmap
+import struct
+import zlib
+
+import numpy
+
+from picoquant.picoquant import T2_DTYPE, T3_DTYPE
+
+from .compression import ordered_map
+
+ARCHIVE_MAGIC = b"PCARCHV1"
+INDEX_MAGIC = b"PCINDEX1"
+FOOTER = struct.Struct("<Q8s")
+BLOCK_PHOTONS = 2**20
+
+CODECS = {"bz2": (bz2.compress, bz2.decompress),
+          "gzip": (zlib.compress, zlib.decompress),
+          "xz": (lzma.compress, lzma.decompress)}
+
+def dtype_for(mode):
+    if mode == "t2":
+        return(T2_DTYPE)
+    elif mode == "t3":
+        return(T3_DTYPE)
+    else:
+        raise(ValueError("Unknown mode: {}".format(mode)))
+
+def window_dimension(mode):
+    """
+    Return the field (time for t2, pulse for t3) by which the archive is
+    indexed.
+    """
+    if mode == "t2":
+        return("time")
+    else:
+        return("pulse")
+
+def is_archive(filename):
+    try:
+        with open(filename, "rb") as stream:
+            return(stream.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC)
+    except EnvironmentError:
+        return(False)
+
+def write_archive(filename, blocks, mode, metadata=None, codec="bz2",
+                  block_photons=BLOCK_PHOTONS, threads=None):
+    """
+    Write photons to a block-compressed archive. The photons are taken from
+    blocks (an iterable of structured arrays, as produced by
+    PicoquantFile.blocks), regrouped into blocks of block_photons and
+    compressed independently on several threads.
+
+    The archive consists of the magic, the compressed blocks, a JSON index
+    and a footer pointing to the index. For each block, the index records
+    the offset and size of the data, the number of photons and the range of
+    the window dimension (time for t2, pulse for t3), so that blocks can be
+    decompressed in parallel and reading can start at any time.
+
+    metadata should hold the header, mode and resolution of the original
+    file (see Picoquant.metadata), so that the archive can stand in for it.
+    """
+    compress = CODECS[codec][0]
+    dtype = dtype_for(mode)
+    dimension = window_dimension(mode)
+
+    def regroup():
+        pending = numpy.empty(0, dtype=dtype)
+
+        for photons in blocks:
+            pending = numpy.concatenate((pending, photons.astype(dtype)))
+
+            while len(pending) >= block_photons:
+                yield(pending[:block_photons])
+                pending = pending[block_photons:]
+
+        if len(pending):
+            yield(pending)
+
+    def encode(photons):
+        return(compress(photons.tobytes()),
+               len(photons),
+               int(photons[dimension].min()),
+               int(photons[dimension].max()))
+
+    index = list()
+
+    with open(filename, "wb") as stream:
+        stream.write(ARCHIVE_MAGIC)
+
+        for data, n_photons, lowest, highest in ordered_map(
+                encode, regroup(), threads):
+            index.append((stream.tell(), len(data), n_photons,
+                          lowest, highest))
+            stream.write(data)
+
+        index_offset = stream.tell()
+        stream.write(json.dumps({"mode": mode,
+                                 "codec": codec,
+                                 "metadata": metadata,
+                                 "blocks": index}).encode())
+        stream.write(FOOTER.pack(index_offset, INDEX_MAGIC))
+
+class PhotonArchive(object):
+    """
+    Reader for block-compressed photon archives (see write_archive). This
+    offers the same interface as picoquant.PicoquantFile, so an archive can
+    be used wherever the original file could be. Blocks are decompressed on
+    several threads, and start/stop select photons by their time (t2) or
+    pulse (t3) without decompressing the blocks outside of the range.
+    """
+    def __init__(self, filename, threads=None):
+        self._filename = filename
+        self._threads = threads
+
+        with open(filename, "rb") as stream:
+            self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._parse()
+        except:
+            self.close()
+            raise
+
+    def _parse(self):
+        if self._map[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC \
+                or len(self._map) < len(ARCHIVE_MAGIC) + FOOTER.size:
+            raise(ValueError("Not a photon archive: {}".format(
+                self._filename)))
+
+        index_offset, magic = FOOTER.unpack(self._map[-FOOTER.size:])
+        if magic != INDEX_MAGIC:
+            raise(ValueError("Truncated photon archive: {}".format(
+                self._filename)))
+
+        index = json.loads(self._map[index_offset:-FOOTER.size].decode())
+
+        self._mode = index["mode"]
+        self._decompress = CODECS[index["codec"]][1]
+        self._metadata = index["metadata"] or dict()
+        self._blocks = index["blocks"]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return(sum(block[2] for block in self._blocks))
+
+    def header(self):
+        return(dict(self._metadata.get("header", dict())))
+
+    def mode(self):
+        return(self._mode)
+
+    def resolution(self):
+        return(self._metadata.get("resolution"))
+
+    def repetition_rate(self):
+        header = dict((key.lower(), value)
+                      for key, value in self.header().items())
+
+        for key in ("inprate0", "syncrate", "inprate[0]"):
+            if key in header:
+                return(float(header[key]))
+
+        return(None)
+
+    def dtype(self):
+        return(dtype_for(self._mode))
+
+    def _decode(self, block):
+        offset, size = block[:2]
+
+        return(numpy.frombuffer(
+            self._decompress(self._map[offset:offset+size]),
+            dtype=self.dtype()))
+
+    def blocks(self, block_size=None, start=None, stop=None):
+        """
+        Yield the photons one archive block at a time (block_size is
+        accepted for compatibility with PicoquantFile, but the blocks are
+        those of the archive). If start or stop are given, only photons with
+        start <= time (or pulse) < stop are returned.
+        """
+        dimension = window_dimension(self._mode)
+        blocks = [block for block in self._blocks
+                  if (start is None or block[4] >= start)
+                  and (stop is None or block[3] < stop)]
+
+        for block, photons in zip(blocks, ordered_map(self._decode, blocks,
+                                                      self._threads)):
+            if start is not None and block[3] < start:
+                photons = photons[photons[dimension] >= start]
+            if stop is not None and block[4] >= stop:
+                photons = photons[photons[dimension] < stop]
+
+            yield(photons)
+
+    def photons(self, start=None, stop=None):
+        blocks = list(self.blocks(start=start, stop=stop))
+
+        if blocks:
+            return(numpy.concatenate(blocks))
+        else:
+            return(numpy.empty(0, dtype=self.dtype()))
+
+    def write_binary(self, stream, block_size=None, start=None, stop=None):
+        for photons in self.blocks(start=start, stop=stop):
+            stream.write(photons.tobytes())
@@ -0,0 +1,110 @@
+import numpy
+
+def linear_edges(lower, upper, n_bins):
+    """
+    Return the (left, right) edges of n_bins equal bins from lower to upper,
+    as an (n_bins, 2) array.
+    """
+    bounds = numpy.linspace(lower, upper, n_bins + 1)
+    return(numpy.column_stack((bounds[:-1], bounds[1:])))
+
+def log_edges(lower, upper, n_bins):
+    """
+    Return the edges of n_bins logarithmically-spaced bins from lower to
+    upper, which must both be positive.
+    """
+    if lower <= 0 or upper <= lower:
+        raise(ValueError("Log-spaced bins need 0 < lower < upper, "
+                         "got {} and {}.".format(lower, upper)))
+
+    bounds = numpy.geomspace(lower, upper, n_bins + 1)
+    return(numpy.column_stack((bounds[:-1], bounds[1:])))
+
+def combine_edges(edges, n):
+    """
+    Return the edges of the bins formed by combining every n neighboring
+    bins. Bins left over at the end are dropped.
+    """
+    edges = numpy.asarray(edges, dtype=numpy.float64).reshape(-1, 2)
+    used = len(edges) // n * n
+
+    return(numpy.column_stack((edges[:used:n, 0], edges[n-1:used:n, 1])))
+
+def combine(counts, n, axis=-1):
+    """
+    Add together every n neighboring bins along the axis, by reshaping the
+    array and summing. Bins left over at the end are dropped.
+    """
+    counts = numpy.asarray(counts)
+    axis = axis % counts.ndim
+    n_bins = counts.shape[axis] // n
+
+    counts = numpy.take(counts, numpy.arange(n_bins*n), axis=axis)
+    return(counts.reshape(counts.shape[:axis] + (n_bins, n) +
+                          counts.shape[axis+1:]).sum(axis=axis+1))
+
+def cumulative(counts, edges, points, axis=-1):
+    """
+    Return the counts below each of the points, along the axis. The counts
+    are taken to be spread evenly across each bin; the bins must be sorted
+    and must not overlap, but may have gaps between them.
+    """
+    counts = numpy.moveaxis(numpy.asarray(counts, dtype=numpy.float64),
+                            axis, -1)
+    edges = numpy.asarray(edges, dtype=numpy.float64).reshape(-1, 2)
+    points = numpy.asarray(points, dtype=numpy.float64)
+
+    # The total rises linearly from the left to the right edge of each bin,
+    # and is flat between bins.
+    x = edges.ravel()
+    total = numpy.concatenate(
+        (numpy.zeros(counts.shape[:-1] + (1,)), counts.cumsum(axis=-1)),
+        axis=-1)
+    y = numpy.stack((total[..., :-1], total[..., 1:]), axis=-1).reshape(
+        counts.shape[:-1] + (len(x),))
+
+    if not len(x):
+        return(numpy.moveaxis(
+            numpy.zeros(counts.shape[:-1] + points.shape), -1, axis))
+
+    position = numpy.clip(numpy.searchsorted(x, points, side="right") - 1,
+                          0, len(x) - 2)
+    width = x[position+1] - x[position]
+    fraction = numpy.clip(numpy.divide(points - x[position], width,
+                                       out=numpy.zeros(len(points)),
+                                       where=width > 0),
+                          0, 1)
+
+    below = points < x[0]
+    fraction[points >= x[-1]] = 1
+
+    result = y[..., position] + fraction*(y[..., position+1] -
+                                          y[..., position])
+    result[..., below] = 0
+
+    return(numpy.moveaxis(result, -1, axis))
+
+def redistribute(counts, edges, target, axis=-1):
+    """
+    Return the counts in the target bins (an (n_bins, 2) array of edges,
+    such as from linear_edges or log_edges), along the axis. Counts in bins
+    which straddle a target edge are split in proportion to the overlap.
+    """
+    target = numpy.asarray(target, dtype=numpy.float64).reshape(-1, 2)
+
+    return(cumulative(counts, edges, target[:, 1], axis=axis) -
+           cumulative(counts, edges, target[:, 0], axis=axis))
+
+def rebin(counts, edges, target, axis=-1):
+    """
+    Rebin counts along the axis, returning the new counts and edges. target
+    is either an integer, to combine every target neighboring bins exactly,
+    or the edges of the new bins, to redistribute the counts in proportion
+    to the overlap.
+    """
+    if isinstance(target, (int, numpy.integer)):
+        return(combine(counts, target, axis=axis),
+               combine_edges(edges, target))
+    else:
+        target = numpy.asarray(target, dtype=numpy.float64).reshape(-1, 2)
+        return(redistribute(counts, edges, target, axis=axis), target)
@@ -0,0 +1,140 @@
+import numpy
+
+from . import resample
+from .GN import counts_dtype
+from .table import open_table, read_chunks, read_header
+
+class Blocks(object):
+    """
+    Histograms of consecutive blocks of a measurement, as written by
+    photon_gn with --window-width (the td table), held as one stacked array:
+
+    windows: the (start, stop) of each block, as an (n_blocks, 2) array, in
+        picoseconds for t2 and pulses for t3.
+    counts: array of shape (n_blocks, n_correlations, n_bins_0, ...).
+    correlations, edges: as for the histogram type gn_type.
+
+    The histograms of the blocks add up to that of the whole measurement,
+    except for the few correlations which span the boundary between two
+    blocks, so statistics such as the center/side ratio can be resampled
+    from the blocks (see bootstrap and jackknife) without correlating the
+    photons again.
+    """
+    def __init__(self, gn_type, stream=None, filename=None, int_counts=None):
+        self.gn_type = gn_type
+        self.windows = numpy.empty((0, 2))
+        self.correlations = list()
+        self.edges = list()
+        self.counts = numpy.zeros((0, 0), dtype=numpy.int64)
+
+        if stream is not None:
+            self.from_stream(stream, int_counts=int_counts)
+        elif filename is not None:
+            with open_table(filename) as stream_in:
+                self.from_stream(stream_in, int_counts=int_counts)
+
+    def __len__(self):
+        return(len(self.windows))
+
+    def from_stream(self, stream_in, int_counts=None):
+        """
+        Read the td table. Its header gives the columns of the histogram
+        (channels and bin edges) for each count in a row, and each row
+        holds the start and stop of a block and its counts.
+        """
+        gn = self.gn_type()
+        n_columns = gn._columns()[2]
+
+        header, pending = read_header(stream_in, lambda line: not line[0])
+
+        if len(header) != n_columns:
+            raise(ValueError("Expected {} header rows for {}, found "
+                             "{}.".format(n_columns, self.gn_type.__name__,
+                                          len(header))))
+
+        columns = numpy.array([line[2:] for line in header],
+                              dtype=numpy.float64).T
+        rows = numpy.column_stack((columns, numpy.zeros(len(columns))))
+
+        correlations, edges, integral = gn._collect([rows])
+        index = gn._positions(rows, correlations, edges)
+
+        chunks = list(read_chunks(stream_in, n_columns=len(columns) + 2,
+                                  pending=pending))
+        if chunks:
+            table = numpy.concatenate(chunks)
+        else:
+            table = numpy.empty((0, len(columns) + 2))
+
+        values = table[:, 2:]
+        dtype = counts_dtype(int_counts,
+                             numpy.array_equal(values, numpy.round(values)))
+
+        self.windows = table[:, :2]
+        self.correlations = list(map(tuple,
+                                     correlations.astype(numpy.int64).tolist()))
+        self.edges = edges
+        self.counts = numpy.zeros(
+            (len(table), len(correlations)) + tuple(map(len, edges)),
+            dtype=dtype)
+        self.counts[(slice(None),) + index] = values
+
+        return(self)
+
+    def _gn(self, counts, exposure):
+        gn = self.gn_type()
+        gn.correlations = list(self.correlations)
+        gn.edges = list(self.edges)
+        gn.counts = counts
+        gn.exposure = exposure
+
+        return(gn)
+
+    def block(self, index):
+        """
+        Return the histogram of one block.
+        """
+        return(self._gn(self.counts[index],
+                        (self.windows[index, 1] -
+                         self.windows[index, 0]).item()))
+
+    def total(self):
+        """
+        Return the histogram of all blocks together.
+        """
+        return(self._gn(self.counts.sum(axis=0),
+                        (self.windows[:, 1] - self.windows[:, 0]).sum().item()))
+
+    def values(self, quantity):
+        """
+        Return quantity(gn) for the histogram of each block, stacked as an
+        array of shape (n_blocks, ...), or a dict of those if quantity
+        returns a dict (such as unique_peaks).
+        """
+        results = [quantity(self.block(index)) for index in range(len(self))]
+
+        if results and isinstance(results[0], dict):
+            return(dict((key, numpy.array([result[key]
+                                           for result in results]))
+                        for key in results[0]))
+        else:
+            return(numpy.array(results))
+
+    def bootstrap(self, quantity, statistic=None, n_resamples=1000,
+                  seed=None):
+        """
+        Resample the blocks with replacement. quantity(gn) must be additive
+        over blocks, such as peak counts; statistic combines the resampled
+        sums (see resample.bootstrap). For example, the center/side ratio:
+
+            blocks.bootstrap(G2_T3.unique_peaks,
+                             lambda peaks: peaks["center"]/peaks["side"])
+        """
+        return(resample.bootstrap(self.values(quantity), statistic,
+                                  n_resamples=n_resamples, seed=seed))
+
+    def jackknife(self, quantity, statistic=None):
+        """
+        Leave out one block at a time; see bootstrap.
+        """
+        return(resample.jackknife(self.values(quantity), statistic))
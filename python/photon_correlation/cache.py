@@ -0,0 +1,270 @@
+import hashlib
+import json
+import logging
+import os
+
+from .Limits import Limits
+
+CACHE_VERSION = 1
+
+def normalize(value):
+    """
+    Convert an argument to a JSON-serializable form which is equal for
+    equivalent arguments, such as Limits with the same bounds or a list and
+    a tuple with the same contents.
+    """
+    if value is None or isinstance(value, (bool, int, str)):
+        return(value)
+    elif isinstance(value, float):
+        if value.is_integer():
+            return(int(value))
+        else:
+            return(value)
+    elif isinstance(value, Limits):
+        return({"lower": normalize(value.lower),
+                "upper": normalize(value.upper),
+                "n_bins": normalize(value.n_bins)})
+    elif isinstance(value, (list, tuple)):
+        return([normalize(item) for item in value])
+    elif isinstance(value, dict):
+        return(dict((str(key), normalize(item))
+                    for key, item in value.items()))
+    elif hasattr(value, "item"):
+        # numpy scalar
+        return(normalize(value.item()))
+    else:
+        raise(TypeError("Cannot cache argument: {!r}".format(value)))
+
+class ResultCache(object):
+    """
+    Size-bounded cache of calculated results (such as the output of
+    calculate.gn), stored as files in directory. An entry is keyed by the
+    contents of the data file and the normalized arguments of the
+    calculation, so that results are found again after the data file is
+    copied or renamed, but not after it changes.
+
+    Entries are evicted in least-recently-used order once the total size
+    exceeds max_size bytes. The cache can be cleared entirely, or for a
+    single data file:
+
+        calculate.result_cache.invalidate(filename)
+
+    The directory defaults to $PHOTON_CORRELATION_CACHE, or
+    ~/.cache/photon_correlation.
+    """
+    SUFFIX = ".result"
+    FINGERPRINTS = "fingerprints.json"
+
+    def __init__(self, directory=None, max_size=2**30, enabled=True):
+        if directory is None:
+            directory = os.environ.get(
+                "PHOTON_CORRELATION_CACHE",
+                os.path.join(os.path.expanduser("~"), ".cache",
+                             "photon_correlation"))
+
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = enabled
+        self._fingerprints = None
+
+    def fingerprint(self, filename):
+        """
+        Return the SHA-256 digest of the contents of the file. Digests are
+        remembered by path, size and modification time, so that each file
+        is read only once.
+        """
+        stat = os.stat(filename)
+        key = "{}:{}:{}".format(os.path.abspath(filename),
+                                stat.st_size, stat.st_mtime_ns)
+        fingerprints = self._load_fingerprints()
+
+        if key not in fingerprints:
+            digest = hashlib.sha256()
+
+            with open(filename, "rb") as stream:
+                for chunk in iter(lambda: stream.read(2**22), b""):
+                    digest.update(chunk)
+
+            fingerprints[key] = digest.hexdigest()
+            self._store_fingerprints()
+
+        return(fingerprints[key])
+
+    def key(self, name, filename, arguments):
+        """
+        Return the key for the result of the calculation name applied to the
+        file with the given arguments. The key starts with the fingerprint
+        of the file, to allow invalidating all results for the file.
+        """
+        description = json.dumps({"version": CACHE_VERSION,
+                                  "name": name,
+                                  "arguments": normalize(arguments)},
+                                 sort_keys=True)
+
+        return("{}-{}".format(
+            self.fingerprint(filename)[:32],
+            hashlib.sha256(description.encode()).hexdigest()[:32]))
+
+    def _path(self, key):
+        return(os.path.join(self.directory, key + self.SUFFIX))
+
+    def lookup(self, key):
+        """
+        Return the stored result for the key, or None.
+        """
+        path = self._path(key)
+
+        try:
+            with open(path) as stream:
+                result = stream.read()
+        except EnvironmentError:
+            return(None)
+
+        # Mark the entry as recently used.
+        try:
+            os.utime(path)
+        except EnvironmentError:
+            pass
+
+        return(result)
+
+    def store(self, key, result):
+        path = self._path(key)
+        temporary_path = "{}.{}".format(path, os.getpid())
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            with open(temporary_path, "w") as stream:
+                stream.write(result)
+            os.replace(temporary_path, path)
+        except EnvironmentError as error:
+            logging.warning("Could not cache result: {}".format(error))
+            return
+
+        self.evict()
+
+    def find(self, name, filename, arguments):
+        """
+        Return the cached result of the calculation, or None.
+        """
+        if not self.enabled:
+            return(None)
+
+        try:
+            return(self.lookup(self.key(name, filename, arguments)))
+        except (TypeError, EnvironmentError):
+            return(None)
+
+    def get(self, name, filename, arguments, calculate):
+        """
+        Return the result of the calculation, calling calculate() to produce
+        it if it is not cached. Results must be strings; an empty result is
+        taken to be a failed calculation, and is not cached.
+        """
+        if not self.enabled:
+            return(calculate())
+
+        try:
+            key = self.key(name, filename, arguments)
+        except (TypeError, EnvironmentError) as error:
+            logging.debug("Not caching {} for {}: {}".format(
+                name, filename, error))
+            return(calculate())
+
+        result = self.lookup(key)
+
+        if result is None:
+            result = calculate()
+
+            if result:
+                self.store(key, result)
+            else:
+                logging.warning("Not caching empty {} for {}".format(
+                    name, filename))
+        else:
+            logging.info("Using cached {} for {}".format(name, filename))
+
+        return(result)
+
+    def _entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except EnvironmentError:
+            return([])
+
+        entries = list()
+        for name in names:
+            if name.endswith(self.SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except EnvironmentError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        return(entries)
+
+    def size(self):
+        return(sum(size for mtime, size, path in self._entries()))
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in
+        max_size.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for mtime, size, path in entries)
+
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+            except EnvironmentError:
+                continue
+
+            total -= size
+
+    def invalidate(self, filename):
+        """
+        Remove all results calculated from the file.
+        """
+        prefix = os.path.join(self.directory,
+                              self.fingerprint(filename)[:32] + "-")
+
+        for mtime, size, path in self._entries():
+            if path.startswith(prefix):
+                os.remove(path)
+
+    def clear(self):
+        for mtime, size, path in self._entries():
+            os.remove(path)
+
+        self._fingerprints = dict()
+        self._store_fingerprints()
+
+    def _load_fingerprints(self):
+        if self._fingerprints is None:
+            try:
+                with open(os.path.join(self.directory,
+                                       self.FINGERPRINTS)) as stream:
+                    self._fingerprints = json.load(stream)
+            except (EnvironmentError, ValueError):
+                self._fingerprints = dict()
+
+        return(self._fingerprints)
+
+    def _store_fingerprints(self):
+        path = os.path.join(self.directory, self.FINGERPRINTS)
+        temporary_path = "{}.{}".format(path, os.getpid())
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            with open(temporary_path, "w") as stream:
+                json.dump(self._fingerprints, stream)
+            os.replace(temporary_path, path)
+        except EnvironmentError as error:
+            logging.warning("Could not store fingerprints: {}".format(error))
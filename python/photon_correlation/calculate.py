@@ -5,24 +5,345 @@ import subprocess
 import re
 import math
 import logging
+import functools
+import inspect
+import signal
+import threading
 from io import StringIO
 
 from .Picoquant import Picoquant
+from .archive import PhotonArchive, write_archive, dtype_for
+from .cache import ResultCache
+from .compression import open_compressed, is_compressed
 from .Limits import Limits
 from .Lifetime import Lifetime
 
 from .util import *
 
-def apply_t3_time_offsets(photons, time_offsets, repetition_rate):
+result_cache = ResultCache()
+
+# Arguments which affect how a result is calculated, but not the result.
+UNCACHED_ARGUMENTS = ("binary", "threads")
+
+# Cache tag for photons which are those of the data file, as decoded by
+# picoquant with the same time offsets.
+DECODED = "decoded"
+
+def cached(function):
+    """
+    Look up the result of function in result_cache before calculating it.
+    The first argument of function must be the data filename, and the
+    result a StringIO. Pass cache=False to force the calculation.
+
+    A result calculated from a photons stream is only cached if cache_tag
+    names that stream: DECODED for the photons of the file itself (as
+    passed by analyze), or any other string, which becomes part of the key.
+    """
+    signature = inspect.signature(function)
+
+    def cache_arguments(*args, cache_tag=None, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        filename = arguments.pop(next(iter(signature.parameters)))
+
+        if arguments.get("photons") is not None and cache_tag != DECODED:
+            arguments["photons"] = cache_tag
+        else:
+            arguments.pop("photons", None)
+
+        for name in UNCACHED_ARGUMENTS:
+            arguments.pop(name, None)
+
+        return(function.__name__, filename, arguments)
+
+    @functools.wraps(function)
+    def wrapper(*args, cache=True, cache_tag=None, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+
+        if not cache or (bound.arguments.get("photons") is not None and
+                         cache_tag is None):
+            return(function(*args, **kwargs))
+
+        return(StringIO(result_cache.get(
+            *cache_arguments(*args, cache_tag=cache_tag, **kwargs),
+            calculate=lambda: function(*args, **kwargs).getvalue())))
+
+    wrapper.cache_arguments = cache_arguments
+
+    return(wrapper)
+
+def lookup(function, *args, **kwargs):
+    """
+    Return the cached result of calling function with the arguments, or
+    None if it has not been calculated (or function is not cached).
+    """
+    if isinstance(function, functools.partial):
+        return(lookup(function.func, *(function.args + args),
+                      **dict(function.keywords, **kwargs)))
+    elif not hasattr(function, "cache_arguments"):
+        return(None)
+
+    result = result_cache.find(*function.cache_arguments(*args, **kwargs))
+
+    if result is None:
+        return(None)
+    else:
+        return(StringIO(result))
+
+def binary_flags(binary, output=True):
+    """
+    Return the options needed for a photon program to read (and, if output is
+    set, write) packed binary photon records instead of ascii text.
+    """
+    if not binary:
+        return([])
+    elif output:
+        return(["--binary-in", "--binary-out"])
+    else:
+        return(["--binary-in"])
+
+def stage(cmd, photons=None, stdout=subprocess.PIPE):
+    """
+    Start a program of a photon pipeline, reading from photons (an earlier
+    stage, or a stand-in such as NativePhotons). The stage remembers the
+    one before it, so that finish can check the whole pipeline. Our copy of
+    the input is closed, so that the earlier stage stops if this one does.
+    """
+    if photons is None:
+        process = subprocess.Popen(cmd, stdout=stdout)
+    else:
+        process = subprocess.Popen(cmd, stdin=photons.stdout, stdout=stdout)
+        photons.stdout.close()
+
+    process.upstream = photons
+
+    return(process)
+
+def finish(process):
+    """
+    Wait for the last stage of a pipeline and all stages before it, and
+    raise CalledProcessError for the earliest which failed. Earlier stages
+    stopped by a closed pipe failed only because a later one did.
+    """
+    error = None
+    last = True
+
+    while process is not None:
+        returncode = process.wait()
+
+        if returncode and (last or returncode != -signal.SIGPIPE):
+            error = subprocess.CalledProcessError(returncode, process.args)
+
+        last = False
+        process = getattr(process, "upstream", None)
+
+    if error is not None:
+        raise(error)
+
+class ThreadStage(object):
+    """
+    Base for the stand-ins of photon programs which run in a thread of
+    this process: target writes to the write end of a pipe, whose read end
+    is exposed as stdout. Like a process, the stage has args and wait(),
+    which returns 1 if target failed.
+    """
+    upstream = None
+
+    def __init__(self, args, target, *target_args):
+        read_fd, write_fd = os.pipe()
+        self.stdout = os.fdopen(read_fd, "rb")
+        self.args = args
+        self.returncode = None
+
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(target, os.fdopen(write_fd, "wb")) + target_args)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, target, stream, *target_args):
+        try:
+            with stream:
+                target(stream, *target_args)
+        except BrokenPipeError:
+            pass
+        except Exception as error:
+            logging.error("{} failed: {}".format(" ".join(self.args), error))
+            self.returncode = 1
+            return
+
+        self.returncode = 0
+
+    def wait(self):
+        self._thread.join()
+        return(self.returncode)
+
+def to_binary(photons, mode):
+    """
+    Pass an ascii photon stream through photons to produce packed binary
+    records for the remainder of the pipeline.
+    """
+    cmd = ["photons", "--mode", mode, "--binary-out"]
+
+    return(stage(cmd, photons))
+
+def to_ascii(photons, mode):
+    """
+    Pass a packed binary photon stream through photons to produce ascii
+    text.
+    """
+    cmd = ["photons", "--mode", mode, "--binary-in"]
+
+    return(stage(cmd, photons))
+
+class NativePhotons(ThreadStage):
+    """
+    Stand-in for the picoquant subprocess when the file can be read
+    in-process: the photons are decoded by a thread and written as packed
+    binary records to a pipe, whose read end is exposed as stdout.
+    """
+    def __init__(self, native):
+        ThreadStage.__init__(self, ["decode"], native.write_binary)
+
+def binary_blocks(photons, mode, block_photons=2**20):
+    """
+    Read packed binary photon records from the stream as structured arrays.
+    """
+    dtype = dtype_for(mode)
+
+    while True:
+        data = photons.stdout.read(dtype.itemsize*block_photons)
+
+        if not data:
+            break
+
+        yield(numpy.frombuffer(data, dtype=dtype))
+
+class Decompressed(ThreadStage):
+    """
+    Stand-in for bunzip2 and friends: the file is decompressed in-process
+    (see compression.open_compressed) by a thread, which writes the data to
+    a pipe whose read end is exposed as stdout.
+    """
+    def __init__(self, filename, threads=None, chunk_size=2**20):
+        ThreadStage.__init__(self, ["decompress", filename], self._write,
+                             filename, threads, chunk_size)
+
+    def _write(self, stream, filename, threads, chunk_size):
+        with open_compressed(filename, threads=threads) as data:
+            while True:
+                chunk = data.read(chunk_size)
+
+                if not chunk:
+                    break
+
+                stream.write(chunk)
+
+class TeeBranch(object):
+    """
+    One output of a Tee, standing in for a photon subprocess. Its upstream
+    is the pipeline copied by the Tee, so that finish checks that as well.
+    """
+    args = ["tee"]
+
+    def __init__(self, stdout, upstream):
+        self.stdout = stdout
+        self.upstream = upstream
+
+    def wait(self):
+        return(0)
+
+class Tee(object):
+    """
+    Copy a photon stream to several consumers, so that the photons need to
+    be decoded only once. Each of the branches exposes the read end of a
+    pipe as stdout, and a thread copies the photons to all of them. A branch
+    whose reader goes away is dropped without disturbing the others.
+    """
+    def __init__(self, photons, n_branches, chunk_size=2**20):
+        self.branches = list()
+        writers = list()
+
+        for branch in range(n_branches):
+            read_fd, write_fd = os.pipe()
+            self.branches.append(TeeBranch(os.fdopen(read_fd, "rb"),
+                                           photons))
+            writers.append(os.fdopen(write_fd, "wb"))
+
+        self._thread = threading.Thread(
+            target=self._copy, args=(photons.stdout, writers, chunk_size))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _copy(self, stream_in, writers, chunk_size):
+        while writers:
+            chunk = stream_in.read(chunk_size)
+
+            if not chunk:
+                break
+
+            for writer in list(writers):
+                try:
+                    writer.write(chunk)
+                except BrokenPipeError:
+                    writers.remove(writer)
+                    self._close(writer)
+
+        for writer in writers:
+            self._close(writer)
+
+        # Let the source stop, even if all branches went away early.
+        stream_in.close()
+
+    def _close(self, writer):
+        try:
+            writer.close()
+        except BrokenPipeError:
+            pass
+
+def convert_to_t2(photons, repetition_rate, binary=False):
+    cmd = ["photons",
+           "--mode", "t3",
+           "--convert", "t2",
+           "--repetition-rate", str(repetition_rate)]
+    cmd.extend(binary_flags(binary))
+
+    return(stage(cmd, photons))
+
+def apply_t3_time_offsets(photons, time_offsets, repetition_rate,
+                          binary=False):
     cmd = ["photon_t3_offsets", 
            "--repetition-rate", str(repetition_rate),
            "--channels", str(len(time_offsets)),
            "--time-offsets", str(time_offsets)]
+    cmd.extend(binary_flags(binary))
 
-    return(subprocess.Popen(cmd, stdin=photons.stdout, stdout=subprocess.PIPE))
+    return(stage(cmd, photons))
 
 def picoquant(filename, print_every=0, time_offsets=None,
-              number=None, convert=False):
+              number=None, convert=False, binary=False,
+              repetition_rate=None):
+    """
+    Decode the photons in the file. If binary is set, the photons are
+    converted to packed binary records once, right after decoding, so that
+    all downstream programs can skip formatting and parsing text. Files
+    which can be read in-process are then decoded directly to binary
+    records, without running picoquant at all.
+
+    Compressed files (bz2, gzip or xz) are decompressed in-process before
+    being passed to picoquant. Photon archives (see archive) are always
+    read in-process; number and print_every do not apply to them.
+
+    The repetition rate used to convert t3 photons or apply time offsets to
+    them defaults to that in the header of the file.
+    """
+    pq = Picoquant(filename)
+
+    if repetition_rate is None and pq.mode() == "t3" and \
+            (convert or time_offsets is not None):
+        repetition_rate = pq.repetition_rate()
+
     cmd = ["picoquant"]
 
     if convert:
@@ -34,29 +355,61 @@ def picoquant(filename, print_every=0, time_offsets=None,
     if print_every > 0:
         cmd.extend(("--print-every", str(print_every)))
 
-    if filename.endswith("bz2"):
-        photons = subprocess.Popen(["bunzip2", filename, "--stdout"],
-                                   stdout=subprocess.PIPE)
-        photons = subprocess.Popen(cmd,
-                                   stdin=photons.stdout,
-                                   stdout=subprocess.PIPE)
+    native = pq.native()
+    from_archive = isinstance(native, PhotonArchive)
+
+    if from_archive or \
+            (binary and number is None and print_every <= 0 and native):
+        photons = NativePhotons(native)
+        mode = pq.mode()
+
+        if convert and mode == "t3":
+            photons = convert_to_t2(photons, repetition_rate,
+                                    binary=True)
+            mode = "t2"
+
+        if not binary:
+            photons = to_ascii(photons, mode)
     else:
-        cmd.extend(["--file-in", filename])
-        photons = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        if is_compressed(filename):
+            photons = stage(cmd, Decompressed(filename))
+        else:
+            cmd.extend(["--file-in", filename])
+            photons = stage(cmd)
+
+        if binary:
+            photons = to_binary(photons, "t2" if convert else pq.mode())
 
     if time_offsets is not None:
-        pq = Picoquant(filename)
         if pq.mode() == "t3":
             photons = apply_t3_time_offsets(
-                photons, time_offsets, pq.repetition_rate())
+                photons, time_offsets, repetition_rate, binary=binary)
         else:
             raise(ValueError("Unsupported mode for time offsets: {}".format(
                 pq.mode())))
-                
+
     return(photons)
 
+def archive(filename, archive_filename, codec="bz2", threads=None):
+    """
+    Decode the photons in the file and store them in a block-compressed
+    archive (see archive.write_archive). The archive can be passed to all
+    other routines in place of the file, and is decompressed in parallel.
+    """
+    pq = Picoquant(filename)
+
+    if pq.native():
+        blocks = pq.native().blocks()
+    else:
+        blocks = binary_blocks(picoquant(filename, binary=True), pq.mode())
+
+    write_archive(archive_filename, blocks, pq.mode(),
+                  metadata=pq.metadata(), codec=codec, threads=threads)
+
+@cached
 def intensity(data_filename, bin_width=50000, mode=None, channels=None,
-              count_all=False, time_offsets=None, repetition_rate=None):
+              count_all=False, time_offsets=None, repetition_rate=None,
+              binary=False, photons=None):
     logging.info("Calculating intensity of {} with bin width of {}".format(
         data_filename, bin_width))
     pq = Picoquant(data_filename)
@@ -67,61 +420,66 @@ def intensity(data_filename, bin_width=50000, mode=None, channels=None,
     if mode is None:
         mode = pq.mode()
 
-    if repetition_rate is None:
-        repetition_rate = pq.repetition_rate()
-
-    photons = picoquant(data_filename, time_offsets=time_offsets)
-    if time_offsets is not None:
-        photons = apply_t3_time_offsets(photons, time_offsets, repetition_rate)
+    if photons is None:
+        photons = picoquant(data_filename, time_offsets=time_offsets,
+                            binary=binary, repetition_rate=repetition_rate)
 
     intensity_cmd = ["photon_intensity",
                      "--bin-width", str(bin_width),
                      "--mode", mode,
                      "--channels", str(channels)]
+    intensity_cmd.extend(binary_flags(binary, output=False))
 
     if count_all:
         intensity_cmd.append("--count-all")
 
-    intensity = StringIO(subprocess.Popen(intensity_cmd, stdin=photons.stdout,
-                         stdout=subprocess.PIPE).stdout.read().decode())
+    process = stage(intensity_cmd, photons)
+    intensity = StringIO(process.stdout.read().decode())
+    finish(process)
 
     return(intensity)
 
-def number_to_channels(photons, correlate=False):
+def number_to_channels(photons, correlate=False, binary=False):
     cmd = ["photon_number_to_channels"]
+    cmd.extend(binary_flags(binary))
 
     if correlate:
         cmd.append("--correlate-successive")
 
-    return(subprocess.Popen(cmd, stdin=photons.stdout, stdout=subprocess.PIPE))
+    return(stage(cmd, photons))
 
-def photon_time_threshold(photons, correlate=False, time_threshold=10000):
+def photon_time_threshold(photons, correlate=False, time_threshold=10000,
+                          binary=False):
     cmd = ["photon_time_threshold",
            "--time-threshold", str(int(time_threshold))]
+    cmd.extend(binary_flags(binary))
 
     if correlate:
         cmd.append("--correlate-successive")
 
-    return(subprocess.Popen(cmd, stdin=photons.stdout, stdout=subprocess.PIPE))
+    return(stage(cmd, photons))
 
 def photon_threshold(photons, window_width=None, mode=None,
-                     threshold_min=None, threshold_max=None):
+                     threshold_min=None, threshold_max=None, binary=False):
     cmd = ["photon_threshold",
            "--mode", mode,
            "--window-width", str(int(window_width)),
            "--threshold_min", str(int(threshold_min)),
            "--threshold_max", str(int(threshold_max))]
+    cmd.extend(binary_flags(binary))
 
-    return(subprocess.Popen(cmd, stdin=photons.stdout, stdout=subprocess.PIPE))
+    return(stage(cmd, photons))
 
+@cached
 def gn(data_filename, photon_mode=None, gn_mode=None,
        order=2, channels=None,
        time_bins=None, pulse_bins=None,
        repetition_rate=None, time_offsets=None,
-       window_width=None, bin_width=None,
+       window_width=None, bin_width=None, block_width=None,
        photon_number=False, number_correlate=False,
        time_bin_width=1024, time_threshold=None,
-       threshold_min=None, threshold_max=None):
+       threshold_min=None, threshold_max=None, binary=False, threads=1,
+       photons=None):
     logging.info("Calculating g{} for {}".format(order, data_filename))
 
     DEFAULT_REPETITION_RATE = 4999990
@@ -212,6 +570,10 @@ def gn(data_filename, photon_mode=None, gn_mode=None,
 
         gn_cmd.extend(("--pulse", str(pulse_bins)))
 
+    if block_width is not None:
+        # Histogram each block of block_width (ps for t2, pulses for t3)
+        # separately, as a td table (see blocks.Blocks).
+        gn_cmd.extend(("--window-width", str(int(block_width))))
 
 #    if not bin_width is None:
 #        gn_cmd.extend(("--bin-width", str(bin_width)))
@@ -223,22 +585,34 @@ def gn(data_filename, photon_mode=None, gn_mode=None,
 #        gn_cmd.extend(("--window-width", str(window_width)))
 
 
-    photons = picoquant(data_filename, time_offsets=time_offsets, convert=convert)
+    if photons is None:
+        photons = picoquant(data_filename, time_offsets=time_offsets,
+                            convert=convert, binary=binary)
+    elif convert:
+        photons = convert_to_t2(photons, pq.repetition_rate(), binary=binary)
 
     if photon_number:
-        photons = number_to_channels(photons, correlate=number_correlate)
+        photons = number_to_channels(photons, correlate=number_correlate,
+                                     binary=binary)
     elif threshold_min or threshold_max:
         photons = photon_threshold(photons, window_width=window_width,
                                    mode=gn_mode, threshold_min=threshold_min,
-                                                 threshold_max=threshold_max)
+                                                 threshold_max=threshold_max,
+                                   binary=binary)
     elif time_threshold:
         photons = photon_time_threshold(photons, correlate=number_correlate,
-                                        time_threshold=time_threshold)
+                                        time_threshold=time_threshold,
+                                        binary=binary)
 
     gn_cmd.extend(("--channels", str(channels)))
+    gn_cmd.extend(binary_flags(binary, output=False))
+
+    if threads > 1:
+        gn_cmd.extend(("--threads", str(threads)))
     
-    gn = StringIO(subprocess.Popen(gn_cmd, stdin=photons.stdout,
-                  stdout=subprocess.PIPE).stdout.read().decode())
+    process = stage(gn_cmd, photons)
+    gn = StringIO(process.stdout.read().decode())
+    finish(process)
 
     # if bin_width is not None:
         # # In case of time-dependent results, bzip2 the files to save space.
@@ -254,7 +628,8 @@ def gn(data_filename, photon_mode=None, gn_mode=None,
     return(gn)
 
 def flid(src_filename, dst_filename, intensity_bins,
-         window_width, time_bins=None, time_offsets=None):
+         window_width, time_bins=None, time_offsets=None, binary=False,
+         photons=None):
     logging.info("Calculating flid for {} with window width {}".format(
         src_filename, window_width))
     
@@ -266,27 +641,26 @@ def flid(src_filename, dst_filename, intensity_bins,
     if time_bins is None:
         time_bins = Limits(0, int(1e12/pq.repetition_rate()), 1000)
         
-    photons = picoquant(src_filename, time_offsets=time_offsets)
+    if photons is None:
+        photons = picoquant(src_filename, time_offsets=time_offsets,
+                            binary=binary)
 
-    if time_offsets is not None:
-        photons = apply_t3_time_offsets(photons,
-                                        time_offsets, pq.repetition_rate())
-    
 
     cmd = ["photon_flid",
            "--window-width", str(window_width),
            "--time", str(time_bins),
            "--intensity", str(intensity_bins),
            "--file-out", dst_filename]
+    cmd.extend(binary_flags(binary, output=False))
 
-    subprocess.Popen(cmd, stdin=photons.stdout).wait()
+    finish(stage(cmd, photons, stdout=None))
 
 def idgn(src_filename, dst_filename, intensity_bins,
          order=2, window_width=50000, repetition_rate=None,
          channels=None,
          time_bins=None, pulse_bins=None, mode=None,
          time_bin_width=1024, photon_number=False, number_correlate=False,
-         time_offsets=None):
+         time_offsets=None, binary=False, photons=None):
     logging.info("Calculating idg{} for {}".format(order, src_filename))
 
     pq = Picoquant(src_filename)
@@ -351,20 +725,58 @@ def idgn(src_filename, dst_filename, intensity_bins,
 
         gn_cmd.extend(("--pulse", str(pulse_bins)))
 
-    photons = picoquant(src_filename, time_offsets=time_offsets)
+    gn_cmd.extend(binary_flags(binary, output=False))
+
+    if photons is None:
+        photons = picoquant(src_filename, time_offsets=time_offsets,
+                            binary=binary)
 
     if photon_number:
-        photons = number_to_channels(photons, correlate=number_correlate)
+        photons = number_to_channels(photons, correlate=number_correlate,
+                                     binary=binary)
+
+    finish(stage(gn_cmd, photons, stdout=None))
+
+@cached
+def max_window(data_filename, window_width, top=1, mode=None,
+               time_offsets=None, binary=False, photons=None):
+    """
+    Find the top windows of width window_width (ps for t2, pulses for t3)
+    which hold the most photons, with photon_max_window. Windows slide
+    across the stream rather than being fixed bins, and the windows
+    reported do not overlap. Each row of the result gives the start, stop
+    and number of photons of a window, in order of decreasing counts.
+    """
+    logging.info("Finding the {} brightest windows of {} with width "
+                 "{}".format(top, data_filename, window_width))
+
+    if mode is None:
+        mode = Picoquant(data_filename).mode()
+
+    if photons is None:
+        photons = picoquant(data_filename, time_offsets=time_offsets,
+                            binary=binary)
 
-    gn = subprocess.Popen(gn_cmd, stdin=photons.stdout).wait()
+    cmd = ["photon_max_window",
+           "--mode", mode,
+           "--window-width", str(int(window_width)),
+           "--top", str(int(top))]
+    cmd.extend(binary_flags(binary, output=False))
+
+    process = stage(cmd, photons)
+    windows = StringIO(process.stdout.read().decode())
+    finish(process)
+
+    return(windows)
 
 def max_counts(data_filename, window_width,
                dst_filename=None, mode=None, channels=None,
-               time_offsets=None):
-    logging.info("Calculating maximum counts of {} with bin width of {}".format(
-        data_filename, window_width))
-    pq = Picoquant(data_filename)
-
+               time_offsets=None, binary=False, photons=None):
+    """
+    Write the start, stop and number of photons of the brightest window of
+    the file to dst_filename (see max_window). Photons of all channels are
+    counted, so channels is no longer needed.
+    """
     if dst_filename is None:    
         dst_filename = os.path.join("{}.max_counts.run".format(data_filename),
                                     "max_counts.{}".format(window_width))
@@ -374,32 +786,99 @@ def max_counts(data_filename, window_width,
     if not os.path.isdir(root_dir):
         os.makedirs(root_dir)
 
-    if channels is None:
-        channels = pq.channels()
+    windows = list(csv.reader(max_window(
+        data_filename, window_width, mode=mode, time_offsets=time_offsets,
+        binary=binary, photons=photons)))
 
-    if mode is None:
-        mode = pq.mode()
+    if not windows:
+        raise(ValueError("No photons found in {}".format(data_filename)))
 
-    photons = picoquant(data_filename, time_offsets=time_offsets)
+    with open(dst_filename, "w") as stream_out:
+        writer = csv.writer(stream_out)
+        writer.writerow(windows[0])
+
+PRODUCTS = {"intensity": intensity,
+            "gn": gn,
+            "g1": functools.partial(gn, order=1),
+            "g2": functools.partial(gn, order=2),
+            "flid": flid,
+            "idgn": idgn,
+            "max_window": max_window,
+            "max_counts": max_counts}
+
+def analyze(filename, products, time_offsets=None, binary=True):
+    """
+    Calculate several products from a single decode of the file: the
+    photons are decoded once and copied to the programs for all products,
+    which run concurrently. Each product is either a name from PRODUCTS or a
+    (name, options) pair, where options are the keyword arguments for the
+    corresponding function:
+
+        intensity, g2, max_counts = analyze(
+            filename,
+            ["intensity",
+             ("g2", {"time_bins": Limits(-1e6, 1e6, 2000)}),
+             ("max_counts", {"window_width": 10**9})])
+
+    The results are returned in the same order as the products.
+    """
+    requests = list()
+
+    for product in products:
+        if isinstance(product, str):
+            name, options = product, dict()
+        else:
+            name, options = product
 
-    intensity_cmd = ["photon_intensity",
-                     "--bin-width", str(window_width),
-                     "--mode", mode,
-                     "--channels", str(channels)]
+        if name not in PRODUCTS:
+            raise(ValueError("Unknown product: {}".format(name)))
 
-    intensity = subprocess.Popen(intensity_cmd,
-                                 stdin=photons.stdout,
-                                 stdout=subprocess.PIPE)
+        # The photons arrive with the offsets applied, but the offsets are
+        # still needed to identify cached results.
+        requests.append((PRODUCTS[name],
+                         dict(options, time_offsets=time_offsets)))
 
-    max_bin = (0, 0)
-    max_counts = 0
+    results = [lookup(function, filename, **options)
+               for function, options in requests]
+    pending = [index for index, result in enumerate(results) if result is None]
 
-    for line in csv.reader(map(lambda x: x.decode(), intensity.stdout)):
-        counts = sum(map(int, line[2:]))
-        if counts > max_counts:
-            max_bin = line[:2]
-            max_counts = counts
+    logging.info("Calculating {} products for {} ({} cached)".format(
+        len(pending), filename, len(requests) - len(pending)))
 
-    with open(dst_filename, "w") as stream_out:
-        writer = csv.writer(stream_out)
-        writer.writerow(max_bin + [str(max_counts)])
+    if not pending:
+        return(results)
+
+    photons = picoquant(filename, time_offsets=time_offsets, binary=binary)
+    tee = Tee(photons, len(pending))
+
+    errors = list()
+
+    def calculate(index, function, options, branch):
+        try:
+            if hasattr(function, "cache_arguments"):
+                # The branches carry the photons of the file itself.
+                options = dict(options, cache_tag=DECODED)
+
+            results[index] = function(filename, binary=binary,
+                                      photons=branch, **options)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            # Let the tee drop this branch if the product stopped early.
+            branch.stdout.close()
+
+    threads = list()
+    for index, branch in zip(pending, tee.branches):
+        function, options = requests[index]
+        thread = threading.Thread(target=calculate,
+                                  args=(index, function, options, branch))
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise(errors[0])
+
+    return(results)
@@ -0,0 +1,181 @@
+import math
+
+import numpy
+
+from .Intensity import Intensity
+from .live import photon_columns
+
+BLOCK_SIZE = 2**22
+
+def log_likelihood_ratios(times, start, stop, min_photons):
+    """
+    Return, for each photon k of the segment from start to stop, the log
+    likelihood ratio of a change of rate at times[k] against a constant
+    rate, for a Poisson process. Splits leaving fewer than min_photons on
+    either side, or falling between photons with the same arrival time, are
+    -inf.
+    """
+    n = len(times)
+    k = numpy.arange(n, dtype=numpy.float64)
+    left = (times - start).astype(numpy.float64)
+    right = (stop - times).astype(numpy.float64)
+
+    ratios = numpy.full(n, -numpy.inf)
+    valid = (k >= min_photons) & (n - k >= min_photons) & \
+            (left > 0) & (right > 0)
+    valid[1:] &= times[1:] != times[:-1]
+
+    k = k[valid]
+    ratios[valid] = k*numpy.log(k/left[valid]) + \
+                    (n - k)*numpy.log((n - k)/right[valid]) - \
+                    n*math.log(n/(stop - start))
+
+    return(ratios)
+
+def split_points(times, start, stop, penalty=3.0, min_photons=10):
+    """
+    Return the indices of the photons at which the rate of the photons
+    (sorted arrival times, from start to stop) changes, each being the
+    first photon after the change. They are found by binary segmentation: a
+    segment of n photons is split where the likelihood ratio is largest,
+    if twice its log exceeds penalty*log(n), and both parts are searched
+    again. Each level of the search takes one vectorized pass over the
+    photons, so the whole search takes O(N log N).
+    """
+    times = numpy.asarray(times)
+    splits = list()
+    pending = [(0, len(times), start, stop)]
+
+    while pending:
+        low, high, segment_start, segment_stop = pending.pop()
+        n = high - low
+
+        if n < 2*min_photons:
+            continue
+
+        ratios = log_likelihood_ratios(times[low:high], segment_start,
+                                       segment_stop, min_photons)
+        best = int(numpy.argmax(ratios))
+
+        if not 2*ratios[best] > penalty*math.log(n):
+            continue
+
+        split = low + best
+        splits.append(split)
+        pending.append((low, split, segment_start, times[split]))
+        pending.append((split, high, times[split], segment_stop))
+
+    return(numpy.sort(numpy.array(splits, dtype=numpy.int64)))
+
+class Segments(object):
+    """
+    Periods of constant photon rate found by change-point detection:
+    starts, stops and counts (the number of photons) of each segment, as
+    arrays. Times are in picoseconds for t2 and pulses for t3.
+
+    intensity() returns the segments as an Intensity with one bin per
+    segment, which can be passed on to Blinking or cut with range:
+
+        segments = segment_photons(pq.blocks(), "t3")
+        segments.intensity().blinking()
+    """
+    def __init__(self, starts, stops, counts, mode):
+        self.starts = numpy.asarray(starts)
+        self.stops = numpy.asarray(stops)
+        self.counts = numpy.asarray(counts, dtype=numpy.int64)
+        self.mode = mode
+
+    def __len__(self):
+        return(len(self.starts))
+
+    def switch_times(self):
+        """
+        Return the times at which the rate changes.
+        """
+        return(self.starts[1:])
+
+    def levels(self):
+        """
+        Return the photon rate of each segment, per picosecond (t2) or per
+        pulse (t3).
+        """
+        return(self.counts/(self.stops - self.starts))
+
+    def intensity(self):
+        intensity = Intensity(mode=self.mode)
+        intensity.times = numpy.column_stack((self.starts, self.stops))
+        intensity.counts = self.counts[numpy.newaxis]
+
+        return(intensity)
+
+def change_points(times, penalty=3.0, min_photons=10, mode="t2"):
+    """
+    Segment the sorted arrival times (t2 times or t3 pulses) held in
+    memory. See segment_photons.
+    """
+    return(segment_photons([times], mode, penalty=penalty,
+                           min_photons=min_photons, arrival_times=True))
+
+def segment_photons(blocks, mode, penalty=3.0, min_photons=10,
+                    max_carry=BLOCK_SIZE, arrival_times=False):
+    """
+    Find the segments of constant rate in a stream of photons, given as
+    blocks of photons (see live.photon_columns) in order, such as those of
+    a picoquant file. The photons of all channels are counted together,
+    by time (t2) or pulse (t3).
+
+    Each block is segmented together with the photons of the last, still
+    open, segment of the previous block. At most max_carry of those are
+    kept, so memory is bounded by the block size even for long segments.
+    """
+    starts = list()
+    stops = list()
+    counts = list()
+
+    carried = numpy.empty(0, dtype=numpy.int64)
+    segment_start = None
+    # Photons of the open segment which are no longer held.
+    dropped = 0
+
+    for block in blocks:
+        if arrival_times:
+            times = numpy.asarray(block, dtype=numpy.int64)
+        else:
+            times = photon_columns(block, mode)[:, 1]
+
+        if not len(times):
+            continue
+
+        times = numpy.concatenate((carried, times))
+
+        if segment_start is None:
+            segment_start = int(times[0])
+
+        analysis_start = segment_start if not dropped else int(times[0])
+        splits = split_points(times, analysis_start, int(times[-1]) + 1,
+                              penalty=penalty, min_photons=min_photons)
+
+        used = 0
+        for split in splits:
+            starts.append(segment_start)
+            stops.append(int(times[split]))
+            counts.append(int(split) - used + dropped)
+
+            used = int(split)
+            segment_start = int(times[split])
+            dropped = 0
+
+        times = times[used:]
+
+        if len(times) > max_carry:
+            dropped += len(times) - max_carry
+            times = times[-max_carry:]
+
+        carried = times
+
+    if segment_start is not None:
+        starts.append(segment_start)
+        stops.append(int(carried[-1]) + 1)
+        counts.append(len(carried) + dropped)
+
+    return(Segments(starts, stops, counts, mode))
@@ -0,0 +1,216 @@
+import bz2
+import collections
+import concurrent.futures
+import gzip
+import io
+import lzma
+import mmap
+import os
+
+import numpy
+
+BZ2_BLOCK_MAGIC = 0x314159265359
+BZ2_STREAM_END_MAGIC = 0x177245385090
+BZ2_SCAN_SIZE = 2**26
+
+def default_threads():
+    return(os.cpu_count() or 1)
+
+def ordered_map(function, items, threads=None):
+    """
+    Apply function to the items using a pool of threads, yielding the
+    results in order. At most a few items per thread are in flight, so that
+    long sequences can be streamed.
+    """
+    if threads is None:
+        threads = default_threads()
+
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        pending = collections.deque()
+
+        for item in items:
+            pending.append(executor.submit(function, item))
+
+            if len(pending) >= 2*threads:
+                yield(pending.popleft().result())
+
+        while pending:
+            yield(pending.popleft().result())
+
+def _find_bits(data, pattern, start, stop):
+    """
+    Find all bit offsets in data[start:stop+6] at which the 48-bit pattern
+    begins. For each of the 8 possible bit alignments, the bytes are shifted
+    so that the search can be done bytewise.
+    """
+    chunk = numpy.frombuffer(data, dtype=numpy.uint8,
+                             count=min(stop + 7, len(data)) - start,
+                             offset=start)
+    target = pattern.to_bytes(6, "big")
+    positions = list()
+
+    for shift in range(8):
+        if shift == 0:
+            shifted = chunk.tobytes()
+        else:
+            shifted = ((chunk[:-1] << shift) |
+                       (chunk[1:] >> (8 - shift))).astype(numpy.uint8).tobytes()
+
+        index = shifted.find(target)
+        while 0 <= index < stop - start:
+            positions.append(8*(start + index) + shift)
+            index = shifted.find(target, index + 1)
+
+    return(positions)
+
+def _bit_range(data, start, stop):
+    """
+    Return the bits [start, stop) of data as an integer.
+    """
+    first = start // 8
+    last = (stop + 7) // 8
+    value = int.from_bytes(data[first:last], "big")
+    value >>= 8*last - stop
+
+    return(value & ((1 << (stop - start)) - 1))
+
+def _bz2_block_stream(data, start, stop):
+    """
+    Wrap the block occupying bits [start, stop) in a stream header and
+    trailer, so that it can be decompressed on its own. For a single block,
+    the combined stream CRC is the CRC of the block.
+    """
+    length = stop - start
+    block = _bit_range(data, start, stop)
+    crc = (block >> (length - 80)) & 0xFFFFFFFF
+
+    stream = (block << 80) | (BZ2_STREAM_END_MAGIC << 32) | crc
+    padding = -(length + 80) % 8
+    stream <<= padding
+
+    return(b"BZh9" + stream.to_bytes((length + 80 + padding)//8, "big"))
+
+def bz2_blocks(data, scan_size=BZ2_SCAN_SIZE):
+    """
+    Find the bit ranges of the compressed blocks in bz2 data, which may
+    consist of several concatenated streams (as written by pbzip2).
+    """
+    markers = list()
+
+    for start in range(0, len(data), scan_size):
+        stop = min(start + scan_size, len(data))
+        markers.extend((position, True) for position in
+                       _find_bits(data, BZ2_BLOCK_MAGIC, start, stop))
+        markers.extend((position, False) for position in
+                       _find_bits(data, BZ2_STREAM_END_MAGIC, start, stop))
+
+    markers.sort()
+
+    for (position, is_block), (next_position, next_is_block) in zip(
+            markers, markers[1:]):
+        if is_block:
+            yield((position, next_position))
+
+def bz2_parallel_chunks(data, threads=None):
+    """
+    Decompress bz2 data, using one thread per block. Each block is
+    decompressed as a stream of its own, and the results are yielded in
+    order. The block magic could, rarely, also occur inside compressed
+    data; a block which fails to decompress is therefore joined with the
+    next one and tried again.
+    """
+    def decompress(block):
+        try:
+            return(bz2.decompress(_bz2_block_stream(data, *block)))
+        except (OSError, ValueError, EOFError):
+            return(None)
+
+    blocks = list(bz2_blocks(data))
+    index = 0
+
+    while index < len(blocks):
+        for result in ordered_map(decompress, blocks[index:], threads):
+            if result is None:
+                break
+
+            yield(result)
+            index += 1
+        else:
+            return
+
+        if index + 1 >= len(blocks):
+            raise(OSError("Invalid bz2 data."))
+
+        blocks[index:index+2] = [(blocks[index][0], blocks[index+1][1])]
+
+class ChunkReader(io.RawIOBase):
+    """
+    Raw binary stream reading from an iterator of byte chunks.
+    """
+    def __init__(self, chunks, close=None):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._close = close
+
+    def readable(self):
+        return(True)
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return(0)
+
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+
+        return(size)
+
+    def close(self):
+        if not self.closed and self._close is not None:
+            self._close()
+
+        super(ChunkReader, self).close()
+
+def open_compressed(filename, mode="rb", threads=None):
+    """
+    Open a bz2, gzip or xz file for reading, like bz2.open. bz2 files are
+    decompressed block by block on several threads; gzip and xz files are
+    streamed.
+    """
+    if filename.endswith("bz2"):
+        stream = open(filename, "rb")
+        try:
+            data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            data = b""
+
+        def close():
+            if isinstance(data, mmap.mmap):
+                try:
+                    data.close()
+                except BufferError:
+                    pass
+            stream.close()
+
+        raw = io.BufferedReader(
+            ChunkReader(bz2_parallel_chunks(data, threads), close=close),
+            buffer_size=2**20)
+    elif filename.endswith("gz"):
+        raw = gzip.open(filename, "rb")
+    elif filename.endswith("xz") or filename.endswith("lzma"):
+        raw = lzma.open(filename, "rb")
+    else:
+        raise(ValueError("Unknown compression for {}".format(filename)))
+
+    if "t" in mode:
+        return(io.TextIOWrapper(raw))
+    else:
+        return(raw)
+
+def is_compressed(filename):
+    return(any(filename.endswith(suffix) for suffix in
+               ("bz2", "gz", "xz", "lzma")))
@@ -0,0 +1,81 @@
+import json
+import struct
+
+import numpy
+
+INDEXED_MAGIC = b"PCGNIDX1"
+HEADER = struct.Struct("<8sQ")
+ALIGNMENT = 4096
+
+def is_indexed(filename):
+    try:
+        with open(filename, "rb") as stream:
+            return(stream.read(len(INDEXED_MAGIC)) == INDEXED_MAGIC)
+    except EnvironmentError:
+        return(False)
+
+def _shape(header):
+    return(tuple([len(header["correlations"])] +
+                 [len(edges) for edges in header["edges"]]))
+
+def _map(filename, header, offset, mode):
+    shape = _shape(header)
+    dtype = numpy.dtype(header["dtype"])
+
+    if not numpy.prod(shape, dtype=numpy.int64):
+        return(numpy.zeros(shape, dtype=dtype))
+
+    return(numpy.memmap(filename, dtype=dtype, mode=mode, offset=offset,
+                        shape=shape))
+
+def create(filename, layout, correlations, edges, dtype, exposure=None):
+    """
+    Create an indexed histogram file and return its counts, as a writable
+    memory-mapped array of zeros.
+
+    The file consists of a fixed header (magic and the length of the
+    description), a JSON description of the histogram (layout,
+    correlations, bin edges, type of the counts and exposure) and the
+    counts as a C-ordered array of shape (n_correlations, n_bins_0,
+    n_bins_1, ...), aligned to a page boundary.
+    """
+    header = {"layout": [list(item) for item in layout],
+              "correlations": [list(correlation)
+                               for correlation in correlations],
+              "edges": [numpy.asarray(bins).tolist() for bins in edges],
+              "dtype": numpy.dtype(dtype).str,
+              "exposure": exposure}
+    description = json.dumps(header).encode()
+
+    offset = HEADER.size + len(description)
+    offset += -offset % ALIGNMENT
+
+    size = offset + numpy.prod(_shape(header), dtype=numpy.int64) * \
+           numpy.dtype(dtype).itemsize
+
+    with open(filename, "wb") as stream:
+        stream.write(HEADER.pack(INDEXED_MAGIC, len(description)))
+        stream.write(description)
+        stream.truncate(size)
+
+    return(_map(filename, header, offset, "r+"))
+
+def load(filename):
+    """
+    Return the description of the indexed histogram and its counts, as a
+    read-only memory-mapped array. Only the parts of the counts which are
+    accessed are read from disk.
+    """
+    with open(filename, "rb") as stream:
+        magic, length = HEADER.unpack(stream.read(HEADER.size))
+
+        if magic != INDEXED_MAGIC:
+            raise(ValueError("Not an indexed histogram: {}".format(
+                filename)))
+
+        header = json.loads(stream.read(length).decode())
+
+    offset = HEADER.size + length
+    offset += -offset % ALIGNMENT
+
+    return(header, _map(filename, header, offset, "r"))
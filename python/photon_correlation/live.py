@@ -0,0 +1,211 @@
+import itertools
+import math
+
+import numpy
+
+from . import binning
+from .G2 import G2_T2, G2_T3
+
+PAIR_BLOCK = 2**22
+
+def photon_columns(photons, mode):
+    """
+    Return the photons as an (n_photons, n_fields) int64 array, with columns
+    channel, time (t2) or channel, pulse, time (t3). photons is a structured
+    array with those fields (such as from picoquant), or an array of rows.
+    """
+    photons = numpy.asarray(photons)
+    fields = {"t2": ("channel", "time"),
+              "t3": ("channel", "pulse", "time")}[mode]
+
+    if photons.dtype.names:
+        return(numpy.column_stack([photons[field].astype(numpy.int64)
+                                   for field in fields]))
+
+    return(photons.astype(numpy.int64).reshape(-1, len(fields)))
+
+def max_distance(limits):
+    return(int(math.ceil(max(abs(limits.lower), abs(limits.upper)))))
+
+def min_distance(limits):
+    return(0 if limits.lower < 0 else int(math.floor(limits.lower)))
+
+def bin_indices(values, limits):
+    """
+    Return the index of the linear bin holding each value, as calculated by
+    the photon programs, or -1 for values outside the limits.
+    """
+    index = numpy.floor((values - limits.lower) /
+                        (limits.upper - limits.lower) *
+                        limits.n_bins).astype(numpy.int64)
+    index[(index < 0) | (index >= limits.n_bins)] = -1
+    return(index)
+
+class LiveG2(object):
+    """
+    g2 histogram which is updated as photons arrive, such as the blocks
+    read during an acquisition. snapshot() returns the histogram of all
+    photons added so far, as a G2_T2 or G2_T3, without ending the
+    accumulation.
+
+    The correlations and bins match those of photon_gn with the same
+    channels and limits (Limits of the time bins, and of the pulse bins for
+    t3): every pair of photons closer than the largest limit, in the time
+    (t2) or pulse (t3) dimension, is counted in both orders.
+
+    Photons must be added in order of time (t2) or pulse (t3). The photons
+    of each block which can still pair with later ones are carried over to
+    the next block, so the histogram does not depend on how the stream is
+    divided.
+    """
+    def __init__(self, mode, channels, time_limits, pulse_limits=None):
+        if mode not in ("t2", "t3"):
+            raise(ValueError("Unknown mode: {}".format(mode)))
+
+        if mode == "t3" and pulse_limits is None:
+            raise(ValueError("t3 correlations need pulse limits."))
+
+        for limits in filter(None, (time_limits, pulse_limits)):
+            if not limits.lower < limits.upper or limits.n_bins < 1:
+                raise(ValueError("Invalid limits: {}".format(limits)))
+
+        self.mode = mode
+        self.channels = channels
+        self.time_limits = time_limits
+        self.pulse_limits = pulse_limits
+
+        if mode == "t2":
+            self.limits = [time_limits]
+            self.gn_type = G2_T2
+        else:
+            self.limits = [pulse_limits, time_limits]
+            self.gn_type = G2_T3
+
+        self.counts = numpy.zeros(
+            (channels, channels) +
+            tuple(limits.n_bins for limits in self.limits),
+            dtype=numpy.int64)
+        self.n_photons = 0
+        self._first = None
+        self._pending = numpy.empty((0, len(self.limits) + 1),
+                                    dtype=numpy.int64)
+
+    @property
+    def window_distance(self):
+        """
+        The distance in the window dimension (time for t2, pulse for t3)
+        below which photons are paired.
+        """
+        return(max_distance(self.limits[0]))
+
+    @property
+    def exposure(self):
+        """
+        The span of the window dimension covered by the photons added so
+        far: picoseconds for t2, pulses for t3.
+        """
+        if self._first is None:
+            return(0)
+
+        return(int(self._pending[-1, 1]) - self._first + 1)
+
+    def add(self, photons):
+        """
+        Add a block of photons (see photon_columns) to the histogram.
+        """
+        photons = photon_columns(photons, self.mode)
+
+        if not len(photons):
+            return(self)
+
+        channels = photons[:, 0]
+        if channels.min() < 0 or channels.max() >= self.channels:
+            raise(ValueError("Channel out of range for {} channels.".format(
+                self.channels)))
+
+        window = photons[:, 1]
+        if numpy.any(numpy.diff(window) < 0) or \
+                (len(self._pending) and window[0] < self._pending[-1, 1]):
+            raise(ValueError("Photons must be added in order."))
+
+        if self._first is None:
+            self._first = int(window[0])
+
+        n_pending = len(self._pending)
+        photons = numpy.concatenate((self._pending, photons))
+        window = photons[:, 1]
+        distance = self.window_distance
+
+        # Each new photon is paired with the earlier ones under the maximum
+        # distance, which start at first[j].
+        first = numpy.searchsorted(window, window - distance, side="right")
+        later = numpy.arange(n_pending, len(photons))
+        n_pairs = numpy.cumsum(later - first[later])
+
+        start = 0
+        while start < len(later):
+            stop = numpy.searchsorted(n_pairs, n_pairs[start] + PAIR_BLOCK,
+                                      side="left")
+            stop = max(stop, start + 1)
+            self._add_pairs(photons, first, later[start:stop])
+            start = stop
+
+        self.n_photons += len(later)
+        self._pending = photons[window > window[-1] - distance]
+
+        return(self)
+
+    def _add_pairs(self, photons, first, later):
+        lengths = later - first[later]
+        right = numpy.repeat(later, lengths)
+        left = numpy.arange(len(right)) - \
+               numpy.repeat(numpy.cumsum(lengths) - lengths, lengths) + \
+               numpy.repeat(first[later], lengths)
+
+        channel_left = photons[left, 0]
+        channel_right = photons[right, 0]
+        distances = photons[right, 1:] - photons[left, 1:]
+
+        valid = numpy.ones(len(right), dtype=bool)
+        for column, limits in zip(distances.T, self.limits):
+            low = min_distance(limits)
+            if low:
+                valid &= numpy.abs(column) >= low
+            valid &= numpy.abs(column) < max_distance(limits)
+
+        channel_left = channel_left[valid]
+        channel_right = channel_right[valid]
+        distances = distances[valid]
+
+        for first_channel, second_channel, sign in (
+                (channel_left, channel_right, 1),
+                (channel_right, channel_left, -1)):
+            index = first_channel*self.channels + second_channel
+            keep = numpy.ones(len(index), dtype=bool)
+
+            for column, limits in zip(distances.T, self.limits):
+                bins = bin_indices(sign*column, limits)
+                keep &= bins >= 0
+                index = index*limits.n_bins + bins
+
+            self.counts += numpy.bincount(
+                index[keep], minlength=self.counts.size).reshape(
+                    self.counts.shape)
+
+    def snapshot(self):
+        """
+        Return the histogram of the photons added so far, as a G2_T2 or
+        G2_T3 holding every pair of channels. Later additions do not change
+        the result.
+        """
+        gn = self.gn_type()
+        gn.correlations = list(itertools.product(range(self.channels),
+                                                 repeat=2))
+        gn.edges = [binning.linear_edges(limits.lower, limits.upper,
+                                         limits.n_bins)
+                    for limits in self.limits]
+        gn.counts = self.counts.reshape(
+            (self.channels**2,) + self.counts.shape[2:]).copy()
+        gn.exposure = self.exposure
+
+        return(gn)
@@ -0,0 +1,156 @@
+import argparse
+import concurrent.futures
+import logging
+
+from .G2 import G2_T2, G2_T3
+from .G3 import G3_T2, G3_T3
+from .G4 import G4_T3
+
+GN_TYPES = {("t2", 2): G2_T2,
+            ("t3", 2): G2_T3,
+            ("t2", 3): G3_T2,
+            ("t3", 3): G3_T3,
+            ("t3", 4): G4_T3}
+
+def gn_type(mode, order):
+    try:
+        return(GN_TYPES[(mode, order)])
+    except KeyError:
+        raise(ValueError("No histogram type for mode {} and order {}.".format(
+            mode, order)))
+
+class Accumulator(object):
+    """
+    Running sum of histograms of one type and with the same bins, such as
+    the g2 of each run of a dot. Only the sum is kept, so any number of
+    histograms can be added in constant memory. The exposure of each
+    histogram (such as its number of windows) is summed alongside, and
+    n_results counts the histograms added.
+    """
+    def __init__(self, gn_type, sparse=False):
+        self.gn_type = gn_type
+        self.gn = gn_type(sparse=sparse)
+        self.n_results = 0
+
+    @property
+    def exposure(self):
+        return(self.gn.exposure)
+
+    def add(self, gn, exposure=None):
+        """
+        Add a histogram, whose bins must match those already added. If
+        exposure is given, it replaces that of the histogram.
+        """
+        if exposure is not None:
+            gn = gn.copy()
+            gn.exposure = exposure
+
+        self.gn += gn
+        self.n_results += 1
+
+        return(self)
+
+    def add_file(self, filename, exposure=None):
+        logging.debug("Adding {}".format(filename))
+        return(self.add(self.gn_type(filename=filename), exposure=exposure))
+
+    def merge(self, other):
+        """
+        Add the sum held by another accumulator.
+        """
+        self.gn += other.gn
+        self.n_results += other.n_results
+
+        return(self)
+
+def _accumulate(gn_type, filenames, exposures, sparse):
+    accumulator = Accumulator(gn_type, sparse=sparse)
+
+    for filename, exposure in zip(filenames, exposures):
+        accumulator.add_file(filename, exposure=exposure)
+
+    return(accumulator)
+
+def merge_files(filenames, gn_type, exposures=None, threads=1, sparse=False):
+    """
+    Sum the histograms in the files, returning an Accumulator. Files are
+    read one at a time, so memory does not grow with the number of files.
+
+    With several threads, the files are divided among as many processes,
+    each of which sums its share; the partial sums are then added pairwise.
+    """
+    filenames = list(filenames)
+
+    if exposures is None:
+        exposures = [None]*len(filenames)
+    else:
+        exposures = list(exposures)
+
+        if len(exposures) != len(filenames):
+            raise(ValueError("Expected one exposure per file."))
+
+    threads = max(1, min(threads, len(filenames)))
+
+    if threads == 1:
+        return(_accumulate(gn_type, filenames, exposures, sparse))
+
+    with concurrent.futures.ProcessPoolExecutor(threads) as executor:
+        partials = list(executor.map(
+            _accumulate,
+            [gn_type]*threads,
+            [filenames[i::threads] for i in range(threads)],
+            [exposures[i::threads] for i in range(threads)],
+            [sparse]*threads))
+
+    while len(partials) > 1:
+        partials = [partials[i].merge(partials[i+1])
+                    if i + 1 < len(partials) else partials[i]
+                    for i in range(0, len(partials), 2)]
+
+    return(partials[0])
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Sum the histograms produced by photon_gn for several "
+                    "runs. The bins of all histograms must match.")
+
+    parser.add_argument("--mode", type=str, required=True,
+                        help="TTTR mode (t2 or t3) of the histograms.")
+    parser.add_argument("--order", type=int, default=2,
+                        help="Order of the histograms.")
+    parser.add_argument("--file-out", "-o", type=str, required=True,
+                        help="Filename for the summed histogram.")
+    parser.add_argument("--exposure", type=float, action="append",
+                        help="Exposure (such as the number of windows) of "
+                             "a histogram. Give once for each file, in the "
+                             "same order.")
+    parser.add_argument("--indexed", action="store_true",
+                        help="Write the result as an indexed file, which "
+                             "can be opened without loading it.")
+    parser.add_argument("--sparse", action="store_true",
+                        help="Hold only the nonzero bins in memory.")
+    parser.add_argument("--threads", "-T", type=int, default=1,
+                        help="Number of processes reading the files.")
+    parser.add_argument("--verbose", "-V", action="store_true",
+                        help="Print debug-level information.")
+    parser.add_argument("files", type=str, nargs="+",
+                        help="Histograms to sum.")
+
+    args = parser.parse_args(args)
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+
+    accumulator = merge_files(args.files, gn_type(args.mode, args.order),
+                              exposures=args.exposure, threads=args.threads,
+                              sparse=args.sparse)
+
+    logging.info("Summed {} histograms".format(accumulator.n_results))
+
+    if args.indexed:
+        accumulator.gn.to_indexed(args.file_out)
+    else:
+        accumulator.gn.to_file(args.file_out)
+
+if __name__ == "__main__":
+    main()
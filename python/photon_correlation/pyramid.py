@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import shutil
+
+import numpy
+
+from . import calculate
+from .cache import normalize
+from .Intensity import Intensity
+from .Picoquant import Picoquant
+
+PYRAMID_VERSION = 2
+
+def group(counts, first_index, n):
+    """
+    Combine the contiguous bins of counts (along the last axis) into groups
+    of n, aligned such that bin first_index + i falls in group
+    (first_index + i) // n. The first and last groups may be partial.
+    Return the counts and the index of the first group.
+    """
+    if not counts.shape[-1]:
+        return(counts, first_index // n)
+
+    groups = (first_index + numpy.arange(counts.shape[-1])) // n
+    starts = numpy.flatnonzero(numpy.concatenate(
+        ([True], groups[1:] != groups[:-1])))
+
+    return(numpy.add.reduceat(counts, starts, axis=-1), first_index // n)
+
+class IntensityPyramid(object):
+    """
+    Intensity trace of a data file at a fine base bin width, and at every
+    power-of-two multiple of it, stored in a directory next to the data
+    (data_filename.intensity.pyramid). photon_intensity runs once, when the
+    pyramid is built; any multiple of the base width is then formed from
+    the closest level:
+
+        pyramid = IntensityPyramid("dot.ht3", base_width=10**7)
+        pyramid.intensity(5*10**9, start=10**12, stop=2*10**12)
+
+    Bins are aligned to multiples of their width, as those of
+    photon_intensity, so the result is the same as running photon_intensity
+    with that width. The levels are memory-mapped, so reading a range of a
+    long trace only reads that part of the file.
+
+    The pyramid is rebuilt if the data file changes, or if it was built
+    with another base width or other arguments (passed on to
+    calculate.intensity).
+    """
+    HEADER = "header.json"
+
+    def __init__(self, data_filename, base_width=50000, directory=None,
+                 **arguments):
+        self.data_filename = data_filename
+        self.base_width = int(base_width)
+        self.directory = directory or "{}.intensity.pyramid".format(
+            data_filename)
+        self.arguments = arguments
+        self._levels = dict()
+
+        if not self._valid():
+            self.build()
+
+    def _description(self):
+        stat = os.stat(self.data_filename)
+
+        return({"version": PYRAMID_VERSION,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "base_width": self.base_width,
+                "arguments": normalize(self.arguments)})
+
+    def _valid(self):
+        try:
+            with open(os.path.join(self.directory, self.HEADER)) as stream:
+                self.header = json.load(stream)
+        except (EnvironmentError, ValueError):
+            return(False)
+
+        return(all(self.header.get(key) == value
+                   for key, value in self._description().items()))
+
+    def _path(self, level):
+        return(os.path.join(self.directory, "counts_{}.npy".format(level)))
+
+    def build(self):
+        """
+        Calculate the intensity at the base width and store every level.
+        """
+        logging.info("Building intensity pyramid for {}".format(
+            self.data_filename))
+
+        mode = self.arguments.get("mode") or \
+            Picoquant(self.data_filename).mode()
+        intensity = Intensity(calculate.intensity(
+            self.data_filename, bin_width=self.base_width, cache=False,
+            **self.arguments), mode=mode)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+
+        header = self._description()
+        header["mode"] = mode
+
+        if len(intensity.times):
+            header["start"] = int(intensity.times[0, 0])
+            header["stop"] = int(intensity.times[-1, 1])
+        else:
+            header["start"] = header["stop"] = 0
+
+        counts = intensity.counts
+        first_index = header["start"] // self.base_width
+        header["first_index"] = [first_index]
+        numpy.save(self._path(0), counts)
+
+        while counts.shape[-1] > 1:
+            counts, first_index = group(counts, first_index, 2)
+            header["first_index"].append(first_index)
+            numpy.save(self._path(len(header["first_index"]) - 1), counts)
+
+        # The header marks the pyramid as complete, so it is written last.
+        with open(os.path.join(self.directory, self.HEADER), "w") as stream:
+            json.dump(header, stream)
+
+        self.header = header
+        self._levels = dict()
+
+    @property
+    def mode(self):
+        return(self.header["mode"])
+
+    def widths(self):
+        """
+        Return the bin width of each level.
+        """
+        return([self.base_width*2**level
+                for level in range(len(self.header["first_index"]))])
+
+    def level(self, level):
+        """
+        Return the counts of the level, as a memory-mapped array of shape
+        (n_channels, n_bins).
+        """
+        if level not in self._levels:
+            self._levels[level] = numpy.load(self._path(level),
+                                             mmap_mode="r")
+
+        return(self._levels[level])
+
+    def intensity(self, bin_width=None, start=None, stop=None):
+        """
+        Return the intensity with the given bin width (a multiple of the
+        base width, by default the base width itself), for the bins which
+        overlap start to stop (by default the whole trace).
+        """
+        if bin_width is None:
+            bin_width = self.base_width
+
+        factor, remainder = divmod(int(bin_width), self.base_width)
+        if remainder or factor < 1:
+            raise(ValueError("Bin width must be a multiple of {}.".format(
+                self.base_width)))
+
+        # The coarsest level whose width divides the bin width.
+        level = min((factor & -factor).bit_length() - 1,
+                    len(self.header["first_index"]) - 1)
+        first_index = self.header["first_index"][level]
+        counts = self.level(level)
+
+        trace_start = self.header["start"]
+        trace_stop = self.header["stop"]
+        start = trace_start if start is None else max(start, trace_start)
+        stop = trace_stop if stop is None else min(stop, trace_stop)
+
+        # Select whole output bins, so that the first and last are complete
+        # unless they are at the ends of the trace.
+        low = max(start // bin_width * (factor >> level) - first_index, 0)
+        high = max(min(-(-stop // bin_width) * (factor >> level) - first_index,
+                       counts.shape[-1]), low)
+
+        counts, index = group(numpy.array(counts[:, low:high]),
+                              first_index + low, factor >> level)
+
+        bounds = (index + numpy.arange(counts.shape[-1] + 1))*bin_width
+        bounds = numpy.clip(bounds, trace_start, trace_stop)
+
+        result = Intensity(mode=self.mode)
+        result.times = numpy.column_stack((bounds[:-1], bounds[1:]))
+        result.counts = counts
+
+        return(result)
@@ -0,0 +1,128 @@
+import statistics
+
+import numpy
+
+def _stack(values):
+    if isinstance(values, dict):
+        return(dict((key, numpy.asarray(value, dtype=numpy.float64))
+                    for key, value in values.items()))
+    else:
+        return(numpy.asarray(values, dtype=numpy.float64))
+
+def _map(function, values):
+    if isinstance(values, dict):
+        return(dict((key, function(value)) for key, value in values.items()))
+    else:
+        return(function(values))
+
+def _n_blocks(values):
+    if isinstance(values, dict):
+        return(len(next(iter(values.values()))))
+    else:
+        return(len(values))
+
+def bootstrap_weights(n_blocks, n_resamples, seed=None):
+    """
+    Return the number of times each block is drawn in each resample, as an
+    array of shape (n_resamples, n_blocks). Each resample draws n_blocks
+    blocks with replacement.
+    """
+    rng = numpy.random.default_rng(seed)
+    draws = rng.integers(0, n_blocks, size=(n_resamples, n_blocks))
+    draws += numpy.arange(n_resamples)[:, numpy.newaxis]*n_blocks
+
+    return(numpy.bincount(draws.ravel(), minlength=n_resamples*n_blocks)\
+           .reshape(n_resamples, n_blocks))
+
+class Estimate(object):
+    """
+    A statistic of the whole measurement, and its values for each resample
+    of the blocks.
+    """
+    def __init__(self, value, samples, method):
+        self.value = value
+        self.samples = samples
+        self.method = method
+
+    def __repr__(self):
+        return("{}({} +/- {})".format(type(self).__name__, self.value,
+                                      self.standard_error))
+
+    @property
+    def standard_error(self):
+        if self.method == "jackknife":
+            n = len(self.samples)
+            return(numpy.sqrt((n - 1)/n *
+                              ((self.samples -
+                                self.samples.mean(axis=0))**2).sum(axis=0)))
+        else:
+            return(self.samples.std(axis=0, ddof=1))
+
+    def interval(self, confidence=0.95):
+        """
+        Return the (lower, upper) bounds of the confidence interval: the
+        percentiles of the resamples for the bootstrap, or the normal
+        interval from the standard error for the jackknife.
+        """
+        if self.method == "jackknife":
+            z = statistics.NormalDist().inv_cdf(0.5 + confidence/2)
+            return(self.value - z*self.standard_error,
+                   self.value + z*self.standard_error)
+        else:
+            return(tuple(numpy.percentile(
+                self.samples, [50*(1 - confidence), 50*(1 + confidence)],
+                axis=0)))
+
+def _identity(sums):
+    return(sums)
+
+def _estimate(value, samples, method):
+    if isinstance(value, dict):
+        return(dict((key, Estimate(value[key], numpy.asarray(samples[key]),
+                                   method))
+                    for key in value))
+    else:
+        return(Estimate(value, numpy.asarray(samples), method))
+
+def bootstrap(values, statistic=None, n_resamples=1000, seed=None):
+    """
+    Estimate the spread of statistic(sums) by resampling the blocks with
+    replacement. values holds the additive quantities (such as peak counts)
+    of each block, as an array of shape (n_blocks, ...) or a dict of them.
+
+    The sums of all resamples are formed in a single product with the
+    weights of the blocks, and statistic is called once, with arrays of
+    shape (n_resamples, ...). It must therefore work elementwise. If it
+    returns a dict, so does bootstrap, with an Estimate for each item.
+    """
+    statistic = statistic or _identity
+    values = _stack(values)
+    n_blocks = _n_blocks(values)
+
+    if n_blocks < 2:
+        raise(ValueError("Resampling needs at least two blocks."))
+
+    weights = bootstrap_weights(n_blocks, n_resamples, seed).astype(
+        numpy.float64)
+
+    sums = _map(lambda value: numpy.tensordot(weights, value, axes=1),
+                values)
+    total = _map(lambda value: value.sum(axis=0), values)
+
+    return(_estimate(statistic(total), statistic(sums), "bootstrap"))
+
+def jackknife(values, statistic=None):
+    """
+    Estimate the spread of statistic(sums) by leaving out one block at a
+    time. values is as for bootstrap.
+    """
+    statistic = statistic or _identity
+    values = _stack(values)
+
+    if _n_blocks(values) < 2:
+        raise(ValueError("Resampling needs at least two blocks."))
+
+    total = _map(lambda value: value.sum(axis=0), values)
+    sums = _map(lambda value: value.sum(axis=0) - value, values)
+
+    return(_estimate(statistic(total), statistic(sums), "jackknife"))
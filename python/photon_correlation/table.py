@@ -0,0 +1,201 @@
+import csv
+import io
+import itertools
+import os
+
+import numpy
+
+from .compression import is_compressed, open_compressed
+
+CHUNK_SIZE = 2**24
+
+def resolve(filename):
+    """
+    Return the filename, or the name of its bz2-compressed version if only
+    that exists.
+    """
+    if not os.path.exists(filename):
+        bz2_name = "{}.bz2".format(filename)
+        if os.path.exists(bz2_name):
+            return(bz2_name)
+
+    return(filename)
+
+def open_table(filename, threads=None):
+    """
+    Open a table written by the photon programs for reading as bytes,
+    falling back to the bz2-compressed version of the file. Compressed
+    files are decompressed in-process (bz2 on several threads).
+    """
+    filename = resolve(filename)
+
+    if is_compressed(filename):
+        return(open_compressed(filename, "rb", threads=threads))
+    else:
+        return(open(filename, "rb"))
+
+def parse(text, n_columns=None):
+    """
+    Parse comma-separated numeric lines (bytes, str or a list of lines) to
+    a float array with one row per line.
+    """
+    if isinstance(text, bytes):
+        source = io.BytesIO(text)
+    elif isinstance(text, str):
+        source = text.splitlines()
+    else:
+        source = text
+
+    rows = numpy.loadtxt(source, delimiter=",", ndmin=2, dtype=numpy.float64)
+
+    if n_columns is not None and rows.shape[1] != n_columns:
+        raise(ValueError("Expected {} columns, found {}.".format(
+            n_columns, rows.shape[1])))
+
+    return(rows)
+
+def read_header(stream_in, is_header=None, n_lines=None):
+    """
+    Read the header lines at the start of a table, either n_lines of them
+    or as long as is_header(row) holds. Return the header rows (as lists of
+    strings) and the first line of data, which must be passed on to
+    read_chunks.
+    """
+    header = list()
+
+    while n_lines is None or len(header) < n_lines:
+        line = stream_in.readline()
+
+        if not line:
+            return(header, line)
+
+        if isinstance(line, bytes):
+            row = next(csv.reader([line.decode()]))
+        else:
+            row = next(csv.reader([line]))
+
+        if n_lines is None and not is_header(row):
+            return(header, line)
+
+        header.append(row)
+
+    return(header, stream_in.read(0))
+
+def read_chunks(stream_in, n_columns=None, chunk_size=CHUNK_SIZE, pending=None):
+    """
+    Read a comma-separated numeric table as float arrays, each holding the
+    rows from about chunk_size bytes of the stream. The stream is split
+    into chunks at line boundaries and each chunk is parsed in a single
+    call, rather than line by line.
+
+    stream_in is a binary or text stream, or an iterable of rows (lists of
+    fields). pending is prepended to the data read from the stream, such as
+    the first line returned by read_header.
+    """
+    if not hasattr(stream_in, "read"):
+        rows = iter(stream_in)
+
+        while True:
+            lines = list(itertools.islice(rows, 2**20))
+
+            if not lines:
+                break
+
+            if isinstance(lines[0], (str, bytes)):
+                yield(parse(lines, n_columns))
+            else:
+                yield(parse([",".join(map(str, line)) for line in lines],
+                            n_columns))
+
+        return
+
+    while True:
+        text = stream_in.read(chunk_size)
+
+        if pending:
+            text = pending + text
+            pending = None
+
+        if not text:
+            break
+
+        if isinstance(text, bytes):
+            newline = b"\n"
+        else:
+            newline = "\n"
+
+        if not text.endswith(newline):
+            text += stream_in.readline()
+
+        if text.strip():
+            yield(parse(text, n_columns))
+
+def rechunk(chunks, n_rows):
+    """
+    Regroup arrays of rows (such as from read_chunks) into arrays of n_rows
+    rows each. The last may be shorter.
+    """
+    pending = list()
+    n_pending = 0
+
+    for chunk in chunks:
+        pending.append(chunk)
+        n_pending += len(chunk)
+
+        if n_pending < n_rows:
+            continue
+
+        rows = numpy.concatenate(pending)
+        n_full = len(rows) // n_rows * n_rows
+
+        for start in range(0, n_full, n_rows):
+            yield(rows[start:start+n_rows])
+
+        pending = [rows[n_full:]]
+        n_pending = len(rows) - n_full
+
+    if n_pending:
+        yield(numpy.concatenate(pending))
+
+def read_table(stream_in, n_columns=None, pending=None):
+    """
+    Read a comma-separated numeric table as a single float array.
+    """
+    chunks = list(read_chunks(stream_in, n_columns, pending=pending))
+
+    if chunks:
+        return(numpy.concatenate(chunks))
+    else:
+        return(numpy.empty((0, n_columns or 0)))
+
+def write_lines(stream_out, lines, newline="\n", chunk_size=2**16):
+    """
+    Write the lines (strings without line endings) to the stream, joining
+    them into large blocks rather than writing each separately.
+    """
+    lines = iter(lines)
+
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+
+        if not chunk:
+            break
+
+        chunk.append("")
+        stream_out.write(newline.join(chunk))
+
+def write_table(stream_out, columns, line_format=None, newline="\n"):
+    """
+    Write the columns (arrays or sequences of equal length) as
+    comma-separated lines. Each line is formatted with line_format (a
+    %-format for the whole line), or by default with str() of each value.
+    """
+    columns = [column.tolist() if hasattr(column, "tolist") else column
+               for column in columns]
+
+    if line_format is None:
+        lines = map(",".join, zip(*[map(str, column) for column in columns]))
+    else:
+        lines = map(line_format.__mod__, zip(*columns))
+
+    write_lines(stream_out, lines, newline=newline)
@@ -11,6 +11,8 @@ import matplotlib.colors
 import matplotlib.cm as cm
 import numpy
 
+from . import binning
+
 si_prefixes = {-9: r"\nano",
                -6: r"\micro",
                -3: r"\milli",
@@ -141,19 +143,14 @@ def rebin(L, n=2):
     Group every n elements, and add them together. Division by n creates
     the boxcar average.
     """
-    result = list()
-    
-    for i in range(len(L)//n):
-        result.append(sum(L[(i*n):((i+1)*n)]))
-
-    return(result)
+    return(binning.combine(list(L), n).tolist())
 
 def smooth(L, n=2):
     """
     Perform a boxcar average with width n. Return the result as a new
     lifetime object.
     """
-    return(list(map(lambda x: float(x)/n, rebin(list(L), n=n))))
+    return((binning.combine(list(L), n) / n).tolist())
 
 def final_nonzero(L):
     """
@@ -1 +1,2 @@
-from . import picoharp, picoquant
+from . import modes, picoquant, picoharp, hydraharp, tttr
+from .tttr import PicoquantFile
@@ -0,0 +1,151 @@
+from ctypes import *
+
+import numpy
+
+from . import picoquant
+
+class hh_v20_display_curve_t(Structure):
+    _fields_ = [("MapTo", c_int32),
+                ("Show", c_int32)]
+
+class hh_v20_param_t(Structure):
+    _fields_ = [("Start", c_float),
+                ("Step", c_float),
+                ("Stop", c_float)]
+
+class hh_v20_module_t(Structure):
+    _fields_ = [("ModelCode", c_int32),
+                ("VersionCode", c_int32)]
+
+class hh_v20_input_channel_t(Structure):
+    _fields_ = [("ModuleIdx", c_int32),
+                ("CFDLevel", c_int32),
+                ("CFDZeroCross", c_int32),
+                ("Offset", c_int32)]
+
+# The 1.0 and 2.0 file formats share their header layout; they differ only
+# in how overflow records are counted.
+class hh_v20_header_t(Structure):
+    _pack_ = 1
+    _fields_ = [("CreatorName", c_char*18),
+                ("CreatorVersion", c_char*12),
+                ("FileTime", c_char*18),
+                ("CRLF", c_char*2),
+                ("Comment", c_char*256),
+                ("NumberOfCurves", c_int32),
+                ("BitsPerRecord", c_int32),
+                ("ActiveCurve", c_int32),
+                ("MeasurementMode", c_int32),
+                ("SubMode", c_int32),
+                ("Binning", c_int32),
+                ("Resolution", c_double),
+                ("Offset", c_int32),
+                ("Tacq", c_int32),
+                ("StopAt", c_uint32),
+                ("StopOnOvfl", c_int32),
+                ("Restart", c_int32),
+                ("DisplayLinLog", c_int32),
+                ("DisplayTimeAxisFrom", c_uint32),
+                ("DisplayTimeAxisTo", c_uint32),
+                ("DisplayCountAxisFrom", c_uint32),
+                ("DisplayCountAxisTo", c_uint32),
+                ("DisplayCurve", hh_v20_display_curve_t*8),
+                ("Param", hh_v20_param_t*3),
+                ("RepeatMode", c_int32),
+                ("RepeatsPerCurve", c_int32),
+                ("RepeatTime", c_int32),
+                ("RepeatWaitTime", c_int32),
+                ("ScriptName", c_char*20),
+                ("HardwareIdent", c_char*16),
+                ("HardwarePartNo", c_char*8),
+                ("HardwareSerial", c_int32),
+                ("ModulesPresent", c_int32),
+                ("Module", hh_v20_module_t*10),
+                ("BaseResolution", c_double),
+                ("InputsEnabled", c_uint64),
+                ("InputChannelsPresent", c_int32),
+                ("RefClockSource", c_int32),
+                ("ExtDevices", c_int32),
+                ("MarkerSettings", c_int32),
+                ("SyncDivider", c_int32),
+                ("SyncCFDLevel", c_int32),
+                ("SyncCFDZeroCross", c_int32),
+                ("SyncOffset", c_int32)]
+
+class hh_v20_tttr_header_t(Structure):
+    _pack_ = 1
+    _fields_ = [("SyncRate", c_int32),
+                ("StopAfter", c_int32),
+                ("StopReason", c_int32),
+                ("ImgHdrSize", c_int32),
+                ("NumRecords", c_uint64)]
+
+T2_WRAPAROUND_V1 = 33552000
+T2_WRAPAROUND_V2 = 33554432
+T3_WRAPAROUND = 1024
+
+def _increments(special, channel, count, version):
+    """
+    Overflow records have the special bit set and channel 63. Version 1.0
+    files count a single overflow per record, while version 2.0 files store
+    the number of overflows in the low bits (0 meaning 1, for old firmware).
+    """
+    overflows = special & (channel == 63)
+
+    if version < 2:
+        return(overflows)
+    else:
+        return(numpy.where(overflows, numpy.maximum(count, 1), 0))
+
+def decode_t2(records, resolution, version=2, overflow=0):
+    """
+    Decode HydraHarp t2 records (special:1, channel:6, timetag:25) into
+    photons. Sync events are reported as channel 0 and signal channel n as
+    n+1; overflows and markers are dropped. Return the photons, with time in
+    ps, and the overflow to carry into the next block of records.
+    """
+    special = (records >> 31).astype(bool)
+    channel = (records >> 25) & 0x3F
+    timetag = records & 0x01FFFFFF
+
+    increments = _increments(special, channel, timetag, version)
+    offsets, overflow = picoquant.accumulate_overflows(increments, overflow)
+
+    sync = special & (channel == 0)
+    keep = ~special | sync
+    photons = numpy.empty(numpy.count_nonzero(keep), dtype=picoquant.T2_DTYPE)
+    photons["channel"] = numpy.where(sync[keep], 0, channel[keep] + 1)
+    photons["time"] = timetag[keep]
+    photons["time"] += offsets[keep] * \
+        (T2_WRAPAROUND_V1 if version < 2 else T2_WRAPAROUND_V2)
+
+    if resolution == int(resolution):
+        photons["time"] *= int(resolution)
+    else:
+        photons["time"] = numpy.rint(photons["time"] * resolution)
+
+    return(photons, overflow)
+
+def decode_t3(records, resolution, version=2, overflow=0):
+    """
+    Decode HydraHarp t3 records (special:1, channel:6, dtime:15, nsync:10)
+    into photons. Overflows and markers are dropped. Return the photons,
+    with time in ps, and the overflow to carry into the next block of
+    records.
+    """
+    special = (records >> 31).astype(bool)
+    channel = (records >> 25) & 0x3F
+    dtime = (records >> 10) & 0x7FFF
+    nsync = records & 0x03FF
+
+    increments = _increments(special, channel, nsync, version)
+    offsets, overflow = picoquant.accumulate_overflows(increments, overflow)
+
+    keep = ~special
+    photons = numpy.empty(numpy.count_nonzero(keep), dtype=picoquant.T3_DTYPE)
+    photons["channel"] = channel[keep]
+    photons["pulse"] = nsync[keep]
+    photons["pulse"] += offsets[keep] * T3_WRAPAROUND
+    photons["time"] = numpy.rint(dtime[keep] * resolution)
+
+    return(photons, overflow)
@@ -0,0 +1,4 @@
+# Measurement modes, as stored in the MeasurementMode field of the headers.
+MODE_INTERACTIVE = 0
+MODE_T2 = 2
+MODE_T3 = 3
@@ -1,8 +1,10 @@
 from ctypes import *
 import datetime
 
-import photon_correlation.modes as modes
-import photon_correlation.picoquant.picoquant as picoquant
+import numpy
+
+from . import modes
+from . import picoquant
 
 class ph_v20_display_curve_t(Structure):
     _fields_ = [("MapTo", c_int32),
@@ -87,6 +89,73 @@ class ph_v20_tttr_header_t(Structure):
                 ("ImgHdrSize", c_int32),
                 ("ImgHdr", POINTER(c_uint32))]
 
+# On-disk layouts: the variable-length parts referenced by pointers above
+# are stored inline (boards, router channels) or read separately (ImgHdr).
+class ph_v20_file_header_t(Structure):
+    _pack_ = 1
+    _fields_ = ph_v20_header_t._fields_[:-1]
+
+class ph_v20_file_board_t(Structure):
+    _pack_ = 1
+    _fields_ = ph_v20_board_t._fields_[:-1] \
+               + [("RtCh", ph_v20_router_channel_t*4)]
+
+class ph_v20_file_tttr_header_t(Structure):
+    _pack_ = 1
+    _fields_ = ph_v20_tttr_header_t._fields_[:-1]
+
+T2_WRAPAROUND = 210698240
+T2_RESOLUTION = 4 # ps
+T3_WRAPAROUND = 65536
+
+def decode_t2(records, overflow=0, resolution=T2_RESOLUTION):
+    """
+    Decode PicoHarp t2 records (channel:4, time:28) into photons. Channel 15
+    marks special records: overflows (no marker bits set) and external
+    markers, which are dropped. Return the photons, with time in ps, and
+    the overflow to carry into the next block of records.
+    """
+    channel = records >> 28
+    time = records & 0x0FFFFFFF
+
+    special = channel == 15
+    increments = special & ((time & 0xF) == 0)
+    offsets, overflow = picoquant.accumulate_overflows(increments, overflow)
+
+    keep = ~special
+    photons = numpy.empty(numpy.count_nonzero(keep), dtype=picoquant.T2_DTYPE)
+    photons["channel"] = channel[keep]
+    photons["time"] = time[keep]
+    photons["time"] += offsets[keep] * T2_WRAPAROUND
+    photons["time"] *= resolution
+
+    return(photons, overflow)
+
+def decode_t3(records, resolution, overflow=0):
+    """
+    Decode PicoHarp t3 records (channel:4, dtime:12, nsync:16) into photons.
+    Channels 1-4 are signal channels, reported as 0-3; channel 15 marks
+    overflows (dtime of 0) and external markers, which are dropped.
+    Return the photons, with time in ps, and the overflow to carry into the
+    next block of records.
+    """
+    channel = records >> 28
+    dtime = (records >> 16) & 0x0FFF
+    nsync = records & 0xFFFF
+
+    special = channel == 15
+    increments = special & (dtime == 0)
+    offsets, overflow = picoquant.accumulate_overflows(increments, overflow)
+
+    keep = (channel >= 1) & (channel <= 4)
+    photons = numpy.empty(numpy.count_nonzero(keep), dtype=picoquant.T3_DTYPE)
+    photons["channel"] = channel[keep] - 1
+    photons["pulse"] = nsync[keep]
+    photons["pulse"] += offsets[keep] * T3_WRAPAROUND
+    photons["time"] = numpy.rint(dtime[keep] * resolution)
+
+    return(photons, overflow)
+
 class ph_v20_header:
     def __init__(self):
         self.pq_header = picoquant.pq_header_t()
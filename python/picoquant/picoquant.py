@@ -1,9 +1,74 @@
 import ctypes
 
+import numpy
+
+# Decoded photons use the same layout as the packed binary records read and
+# written by the photon programs (--binary-in/--binary-out), so an array can
+# be handed to them with tobytes().
+T2_DTYPE = numpy.dtype([("channel", numpy.int64),
+                        ("time", numpy.int64)])
+T3_DTYPE = numpy.dtype([("channel", numpy.int64),
+                        ("pulse", numpy.int64),
+                        ("time", numpy.int64)])
+
 class pq_header_t(ctypes.Structure):
     _fields_ = [("Ident", ctypes.c_char*16),
                 ("FormatVersion", ctypes.c_char*6)]
 
+def read_structure(structure, buffer, offset=0):
+    """
+    Read a ctypes structure (or array) from the buffer, starting at offset.
+    Return the structure and the offset of the first byte after it.
+    """
+    size = ctypes.sizeof(structure)
+    if offset + size > len(buffer):
+        raise(ValueError("Truncated header: need {} bytes at {}, "
+                         "found {}.".format(size, offset, len(buffer))))
+
+    return(structure.from_buffer_copy(buffer[offset:offset+size]),
+           offset + size)
+
+def header_items(structure, prefix=""):
+    """
+    Flatten a header structure into (name, value) pairs, using the same
+    naming as the header printed by picoquant: arrays are indexed as
+    name[i], and nested structures as name[i].field.
+    """
+    for name, field_type in structure._fields_:
+        value = getattr(structure, name)
+        name = prefix + name
+
+        if isinstance(value, bytes):
+            yield(name, value.decode(errors="replace").strip("\x00 \r\n"))
+        elif isinstance(value, ctypes.Structure):
+            for item in header_items(value, prefix=name + "."):
+                yield(item)
+        elif isinstance(value, ctypes.Array):
+            for index, element in enumerate(value):
+                element_name = "{}[{}]".format(name, index)
+                if isinstance(element, ctypes.Structure):
+                    for item in header_items(element,
+                                             prefix=element_name + "."):
+                        yield(item)
+                else:
+                    yield(element_name, element)
+        elif not isinstance(value, ctypes._Pointer):
+            yield(name, value)
+
+def accumulate_overflows(increments, overflow=0):
+    """
+    Turn the per-record overflow increments into the running offset to add
+    to each record, starting from the given overflow. Return the offsets
+    and the overflow to carry into the next block of records.
+    """
+    offsets = numpy.cumsum(increments, dtype=numpy.int64)
+    offsets += overflow
+
+    if len(offsets):
+        overflow = int(offsets[-1])
+
+    return(offsets, overflow)
+
 if __name__ == "__main__":
     pq_header = pq_header_t()
     pq_header.Ident = "blargh".encode()
@@ -0,0 +1,215 @@
+import ctypes
+import functools
+import mmap
+
+import numpy
+
+from . import modes
+from . import picoquant
+from . import picoharp
+from . import hydraharp
+
+class PicoquantFile(object):
+    """
+    Native reader for PicoHarp (.pt2/.pt3) and HydraHarp (.ht2/.ht3) TTTR
+    files. The headers are parsed using the ctypes structures, and the
+    record area is memory-mapped and decoded into numpy structured arrays
+    (see picoquant.T2_DTYPE and picoquant.T3_DTYPE), with time in ps.
+    """
+    def __init__(self, filename):
+        self._filename = filename
+
+        with open(filename, "rb") as stream:
+            self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._header = list()
+        self._mode = None
+        self._resolution = None
+        self._repetition_rate = None
+        self._decode = None
+
+        try:
+            self._parse()
+        except:
+            self.close()
+            raise
+
+    def _parse(self):
+        pq_header, offset = picoquant.read_structure(picoquant.pq_header_t,
+                                                     self._map)
+        self._header.extend(picoquant.header_items(pq_header))
+        ident = dict(self._header)["Ident"]
+        version = dict(self._header)["FormatVersion"]
+
+        if ident == "PicoHarp 300" and version == "2.0":
+            offset, n_records = self._parse_picoharp(offset)
+        elif ident == "HydraHarp" and version in ("1.0", "2.0"):
+            offset, n_records = self._parse_hydraharp(offset,
+                                                      int(float(version)))
+        else:
+            raise(ValueError("Unsupported file: {} version {}".format(
+                ident, version)))
+
+        self._offset = offset
+        available = (len(self._map) - offset) // 4
+        self._n_records = min(n_records, available)
+
+    def _parse_picoharp(self, offset):
+        header, offset = picoquant.read_structure(
+            picoharp.ph_v20_file_header_t, self._map, offset)
+        self._header.extend(picoquant.header_items(header))
+        self._check_header(header)
+
+        boards = list()
+        for board in range(header.NumberOfBoards):
+            board_header, offset = picoquant.read_structure(
+                picoharp.ph_v20_file_board_t, self._map, offset)
+            self._header.extend(picoquant.header_items(
+                board_header, prefix="Brd[{}].".format(board)))
+            boards.append(board_header)
+
+        tttr, offset = picoquant.read_structure(
+            picoharp.ph_v20_file_tttr_header_t, self._map, offset)
+        self._header.extend(picoquant.header_items(tttr))
+        offset += 4*tttr.ImgHdrSize
+
+        self._repetition_rate = float(tttr.InpRate0)
+
+        if self._mode == "t2":
+            self._resolution = float(picoharp.T2_RESOLUTION)
+            self._decode = picoharp.decode_t2
+        else:
+            # Board resolution is stored in ns, as a single-precision float.
+            self._resolution = round(boards[0].Resolution*1000, 3)
+            self._decode = functools.partial(picoharp.decode_t3,
+                                             resolution=self._resolution)
+
+        return(offset, tttr.NumRecords)
+
+    def _parse_hydraharp(self, offset, version):
+        header, offset = picoquant.read_structure(
+            hydraharp.hh_v20_header_t, self._map, offset)
+        self._header.extend(picoquant.header_items(header))
+        self._check_header(header)
+
+        channels = header.InputChannelsPresent
+        inputs, offset = picoquant.read_structure(
+            hydraharp.hh_v20_input_channel_t*channels, self._map, offset)
+        for channel, settings in enumerate(inputs):
+            self._header.extend(picoquant.header_items(
+                settings, prefix="InputChannel[{}].".format(channel)))
+
+        rates, offset = picoquant.read_structure(
+            ctypes.c_int32*channels, self._map, offset)
+        for channel, rate in enumerate(rates):
+            self._header.append(("InpRate[{}]".format(channel), rate))
+
+        tttr, offset = picoquant.read_structure(
+            hydraharp.hh_v20_tttr_header_t, self._map, offset)
+        self._header.extend(picoquant.header_items(tttr))
+        offset += 4*tttr.ImgHdrSize
+
+        self._repetition_rate = float(tttr.SyncRate)
+        self._resolution = float(header.Resolution)
+
+        if self._mode == "t2":
+            decode = hydraharp.decode_t2
+        else:
+            decode = hydraharp.decode_t3
+
+        self._decode = functools.partial(decode,
+                                         resolution=self._resolution,
+                                         version=version)
+
+        return(offset, tttr.NumRecords)
+
+    def _check_header(self, header):
+        if header.MeasurementMode == modes.MODE_T2:
+            self._mode = "t2"
+        elif header.MeasurementMode == modes.MODE_T3:
+            self._mode = "t3"
+        else:
+            raise(ValueError("Unsupported measurement mode: {}".format(
+                header.MeasurementMode)))
+
+        if header.BitsPerRecord != 32:
+            raise(ValueError("Unsupported record size: {} bits".format(
+                header.BitsPerRecord)))
+
+    def close(self):
+        try:
+            self._map.close()
+        except BufferError:
+            # Arrays returned by records() still refer to the map, which is
+            # then released along with them.
+            pass
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return(self._n_records)
+
+    def header(self):
+        """
+        Return the header as a dict, with the names used by picoquant.
+        """
+        return(dict(self._header))
+
+    def mode(self):
+        return(self._mode)
+
+    def resolution(self):
+        """
+        Return the time resolution of the records, in ps.
+        """
+        return(self._resolution)
+
+    def repetition_rate(self):
+        return(self._repetition_rate)
+
+    def dtype(self):
+        if self._mode == "t2":
+            return(picoquant.T2_DTYPE)
+        else:
+            return(picoquant.T3_DTYPE)
+
+    def records(self, start=0, stop=None):
+        """
+        Return the raw records as a read-only view of the memory map.
+        """
+        start, stop, step = slice(start, stop).indices(self._n_records)
+
+        return(numpy.frombuffer(self._map, dtype="<u4",
+                                count=max(stop - start, 0),
+                                offset=self._offset + 4*start))
+
+    def blocks(self, block_size=2**22):
+        """
+        Decode the photons in blocks of block_size records, carrying the
+        overflow count from one block to the next.
+        """
+        overflow = 0
+
+        for start in range(0, self._n_records, block_size):
+            photons, overflow = self._decode(
+                self.records(start, start + block_size), overflow=overflow)
+            yield(photons)
+
+    def photons(self):
+        """
+        Decode all photons in the file into a single array.
+        """
+        photons, overflow = self._decode(self.records())
+        return(photons)
+
+    def write_binary(self, stream, block_size=2**22):
+        """
+        Write the photons to the stream as packed binary records, as read by
+        the photon programs with --binary-in.
+        """
+        for photons in self.blocks(block_size):
+            stream.write(photons.tobytes())
@@ -48,7 +48,9 @@ int main(int argc, char *argv[]) {
 			OPT_QUEUE_SIZE,
 			OPT_TIME, OPT_PULSE,
 			OPT_START, OPT_STOP,
-			OPT_TIME_SCALE, OPT_PULSE_SCALE, OPT_EOF}};
+			OPT_TIME_SCALE, OPT_PULSE_SCALE,
+			OPT_BINARY_IN,
+			OPT_EOF}};
 
 	return(run(&program_options, bin_intensity, argc, argv));
 }
@@ -68,7 +68,9 @@ int main(int argc, char *argv[]) {
 			OPT_QUEUE_SIZE,
 			OPT_MAX_TIME_DISTANCE, OPT_MIN_TIME_DISTANCE,
 			OPT_MAX_PULSE_DISTANCE, OPT_MIN_PULSE_DISTANCE, 
-			OPT_TIME_SCALE, OPT_EOF}};
+			OPT_TIME_SCALE,
+			OPT_BINARY_IN,
+			OPT_EOF}};
 
 	return(run(&program_options, correlate_dispatch, argc, argv));
 }
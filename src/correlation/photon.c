@@ -64,6 +64,8 @@ int correlate_photon(FILE *stream_in, FILE *stream_out,
 	if ( result == PC_SUCCESS ) {
 		debug("Initializing correlator, photon stream.\n");
 		photon_stream_init(photon_stream, stream_in);
+		photon_stream_set_binary(photon_stream, options->binary_in,
+				options->binary_out);
 		photon_stream_set_unwindowed(photon_stream);
 		correlator_init(correlator);
 
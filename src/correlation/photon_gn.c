@@ -32,6 +32,9 @@
 #include "photon_gn.h"
 #include <math.h>
 #include "../error.h"
+#include "../modes.h"
+#include "../photon/t2.h"
+#include "../photon/t3.h"
 /* 
  * For correlation we typically need to join several operations together.
  * At minimum, we must send the photons to the correlator and the correlations
@@ -82,6 +85,15 @@ photon_gn_t *photon_gn_alloc(int const mode, int const order,
 		return(gn);
 	}
 
+	gn->bounded = false;
+	gn->upper = 0;
+
+	if ( mode == MODE_T2 ) {
+		gn->window_dim = t2_window_dimension;
+	} else {
+		gn->window_dim = t3_window_dimension;
+	}
+
 	return(gn);
 }
 
@@ -90,13 +102,43 @@ void photon_gn_init(photon_gn_t *gn) {
 	histogram_gn_init(gn->histogram);
 }
 
+void photon_gn_set_bounds(photon_gn_t *gn, int const bounded,
+		long long const upper) {
+	gn->bounded = bounded;
+	gn->upper = upper;
+}
+
+long long photon_gn_max_distance(photon_gn_t const *gn) {
+/* The largest separation, in the window dimension, between photons of a 
+ * single correlation. 0 means there is no limit.
+ */
+	if ( gn->correlator->order == 1 ) {
+		return(0);
+	} else if ( gn->correlator->mode == MODE_T2 ) {
+		return(gn->correlator->max_time_distance);
+	} else {
+		return(gn->correlator->max_pulse_distance);
+	}
+}
+
+int photon_gn_in_bounds(photon_gn_t const *gn) {
+/* For first-order correlations, left is the photon itself. For higher 
+ * orders, left is the front of the queue, which is the first photon of 
+ * every correlation in the current block.
+ */
+	return( ! gn->bounded ||
+			gn->window_dim(gn->correlator->left) < gn->upper );
+}
+
 int photon_gn_push(photon_gn_t *gn, photon_t const *photon) {
 	int result = correlator_push(gn->correlator, photon);
 
 	while ( result == PC_SUCCESS &&
 				correlator_next(gn->correlator) == PC_SUCCESS ) {
-		histogram_gn_increment(gn->histogram,
-				gn->correlator->correlation);
+		if ( photon_gn_in_bounds(gn) ) {
+			histogram_gn_increment(gn->histogram,
+					gn->correlator->correlation);
+		}
 	}
 
 	return(result);
@@ -109,8 +151,10 @@ int photon_gn_flush(photon_gn_t *gn) {
 
 	while ( result == PC_SUCCESS && 
 			correlator_next(gn->correlator) == PC_SUCCESS ) {
-		histogram_gn_increment(gn->histogram,
-				gn->correlator->correlation);
+		if ( photon_gn_in_bounds(gn) ) {
+			histogram_gn_increment(gn->histogram,
+					gn->correlator->correlation);
+		}
 	}
 
 	return(result);
@@ -40,12 +40,24 @@
 typedef struct {
 	correlator_t *correlator;
 	histogram_gn_t *histogram;
+
+	/* When bounded, only correlations whose first photon lies below upper
+	 * (in the window dimension) are histogrammed. This lets a stream be
+	 * split into overlapping shards without counting a correlation twice.
+	 */
+	int bounded;
+	long long upper;
+	photon_window_dimension_t window_dim;
 } photon_gn_t;
 
 photon_gn_t *photon_gn_alloc(int const mode, int const order, 
 		int const channels, size_t const queue_size,
 		limits_t const *time_limits, limits_t const *pulse_limits);
 void photon_gn_init(photon_gn_t *gn);
+void photon_gn_set_bounds(photon_gn_t *gn, int const bounded,
+		long long const upper);
+long long photon_gn_max_distance(photon_gn_t const *gn);
+int photon_gn_in_bounds(photon_gn_t const *gn);
 int photon_gn_push(photon_gn_t *gn, photon_t const *photon);
 int photon_gn_flush(photon_gn_t *gn);
 int photon_gn_fprintf(FILE *stream_out, photon_gn_t const *gn);
@@ -45,6 +45,8 @@ int correlate_start_stop(FILE *stream_in, FILE *stream_out,
 		pc_options_t const *options) {
 	int valid = 0;
 	photon_t photon;
+	photon_next_t photon_next = photon_next_select(MODE_T2, 
+			options->binary_in);
 
 	unsigned long long record_number = 0;
 
@@ -65,7 +67,7 @@ int correlate_start_stop(FILE *stream_in, FILE *stream_out,
 
 	debug("Correlating in start-stop mode.\n");
 
-	while ( t2_fscanf(stream_in, &photon) == PC_SUCCESS ) {
+	while ( photon_next(stream_in, &photon) == PC_SUCCESS ) {
 		if ( photon.t2.channel == 0 ) {
 			valid = 1;
 			correlation_set_index(correlation, 0, &photon);
@@ -52,6 +52,8 @@ int waiting_time(FILE *stream_in, FILE *stream_out,
 
 	if ( result == PC_SUCCESS ) {
 		photon_stream_init(photons, stream_in);
+		photon_stream_set_binary(photons, options->binary_in,
+				options->binary_out);
 		photon_stream_set_unwindowed(photons);
 
 		waiting_time_init(wt);
@@ -59,6 +59,8 @@ int flid(FILE *stream_in, FILE *stream_out, pc_options_t const *options) {
 
 	if ( status == PC_SUCCESS ) {
 		photon_stream_init(photon_stream, stream_in);
+		photon_stream_set_binary(photon_stream, options->binary_in,
+				options->binary_out);
 		photon_stream_set_unwindowed(photon_stream);
 
 		flid_init(flid, options->window_width);
@@ -35,6 +35,7 @@
 #include <unistd.h>
 
 #include "gn.h"
+#include "gn_sharded.h"
 #include "types.h"
 #include "error.h"
 #include "modes.h"
@@ -91,7 +92,15 @@ int gn_run(program_options_t *program_options, int const argc,
 
 	if ( result == PC_SUCCESS ) {
 		debug("Dispatching.\n");
-		gn(stream_in, stream_out, options);
+		if ( options->threads > 1 && options->window_width == 0 ) {
+			result = gn_sharded(stream_in, stream_out, options);
+		} else {
+			if ( options->threads > 1 ) {
+				warn("Time-dependent correlations use a single thread.\n");
+			}
+
+			result = gn(stream_in, stream_out, options);
+		}
 	}
 
 	debug("Cleaning up.\n");
@@ -182,6 +191,8 @@ int gn(FILE *stream_in, FILE *stream_out, pc_options_t const *options) {
 				false, 0);
 
 		photon_stream_init(photon_stream, stream_in);
+		photon_stream_set_binary(photon_stream, options->binary_in,
+				options->binary_out);
 
 		if ( options->window_width == 0 ) {
 			/* Perform a single calculation */
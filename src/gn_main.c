@@ -59,6 +59,8 @@ int main(int argc, char *argv[]) {
 			OPT_TIME, OPT_PULSE,
 			OPT_BIN_WIDTH,
 			OPT_PRINT_EVERY,
+			OPT_BINARY_IN,
+			OPT_THREADS,
 			OPT_EOF}};
 
 	return(gn_run(&program_options, argc, argv));
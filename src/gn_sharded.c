@@ -0,0 +1,301 @@
+/*
+ * Copyright (c) 2011-2015, Thomas Bischof
+ * All rights reserved.
+ * 
+ * Redistribution and use in source and binary forms, with or without 
+ * modification, are permitted provided that the following conditions are met:
+ * 
+ * 1. Redistributions of source code must retain the above copyright notice, 
+ *    this list of conditions and the following disclaimer.
+ * 
+ * 2. Redistributions in binary form must reproduce the above copyright notice, 
+ *    this list of conditions and the following disclaimer in the documentation 
+ *    and/or other materials provided with the distribution.
+ * 
+ * 3. Neither the name of the Massachusetts Institute of Technology nor the 
+ *    names of its contributors may be used to endorse or promote products 
+ *    derived from this software without specific prior written permission.
+ * 
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+ * POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#include <stdlib.h>
+#include <string.h>
+
+#include "gn_sharded.h"
+#include "gn.h"
+#include "error.h"
+#include "modes.h"
+#include "photon/t2.h"
+#include "photon/t3.h"
+
+/*
+ * To correlate a single stream on several cores, the photons are read in
+ * passes of up to threads*GN_SHARD_SIZE photons. Each pass is split into
+ * contiguous shards, which are correlated by separate threads, and the 
+ * histograms of all threads are summed at the end.
+ *
+ * A correlation is counted by the shard which owns its first photon. Each
+ * shard is given the photons owned by the following shards up to (and 
+ * including) the first photon beyond the maximum correlation distance of its
+ * last photon, so every correlation it owns is built exactly as it would be
+ * for the whole stream. Photons whose correlations cannot yet be completed 
+ * are carried over to the next pass.
+ */
+
+static size_t first_at_least(photon_t const *photons, 
+		size_t lower, size_t upper, long long const value,
+		photon_window_dimension_t window_dim) {
+/* Index of the first photon in [lower, upper) whose window dimension is at 
+ * least value, or upper if there is none.
+ */
+	size_t middle;
+
+	while ( lower < upper ) {
+		middle = lower + (upper - lower)/2;
+
+		if ( window_dim(&photons[middle]) < value ) {
+			lower = middle + 1;
+		} else {
+			upper = middle;
+		}
+	}
+
+	return(lower);
+}
+
+void *gn_shard_run(void *shard_ptr) {
+	size_t i;
+	gn_shard_t *shard = (gn_shard_t *)shard_ptr;
+
+	correlator_init(shard->gn->correlator);
+	photon_gn_set_bounds(shard->gn, shard->bounded, shard->upper);
+
+	shard->result = PC_SUCCESS;
+	for ( i = 0; shard->result == PC_SUCCESS && i < shard->n_photons; i++ ) {
+		shard->result = photon_gn_push(shard->gn, &(shard->photons[i]));
+	}
+
+	if ( shard->result == PC_SUCCESS ) {
+		shard->result = photon_gn_flush(shard->gn);
+	}
+
+	return(NULL);
+}
+
+int gn_sharded(FILE *stream_in, FILE *stream_out, 
+		pc_options_t const *options) {
+	int result = PC_SUCCESS;
+	int eof = false;
+	int i;
+	int n_shards;
+
+	photon_next_t photon_next = photon_next_select(options->mode, 
+			options->binary_in);
+	photon_window_dimension_t window_dim;
+
+	photon_t *photons = NULL;
+	photon_t *new_photons = NULL;
+	size_t capacity = options->threads * GN_SHARD_SIZE;
+	size_t n_photons = 0;
+	size_t n_owned;
+	size_t start, stop, end;
+	long long upper;
+	long long max_distance;
+	uint64_t photon_number = 0;
+
+	photon_gn_t *combined = NULL;
+	gn_shard_t *shards = NULL;
+
+	if ( options->mode == MODE_T2 ) {
+		window_dim = t2_window_dimension;
+	} else {
+		window_dim = t3_window_dimension;
+	}
+
+	combined = photon_gn_alloc(options->mode, options->order,
+			options->channels, options->queue_size,
+			&(options->time_limits), &(options->pulse_limits));
+	photons = (photon_t *)malloc(sizeof(photon_t)*capacity);
+	shards = (gn_shard_t *)malloc(sizeof(gn_shard_t)*options->threads);
+
+	if ( combined == NULL || photons == NULL || shards == NULL ) {
+		error("Could not allocate memory for sharded correlation.\n");
+		free(photons);
+		free(shards);
+		photon_gn_free(&combined);
+		return(PC_ERROR_MEM);
+	}
+
+	for ( i = 0; i < options->threads; i++ ) {
+		shards[i].gn = photon_gn_alloc(options->mode, options->order,
+				options->channels, options->queue_size,
+				&(options->time_limits), &(options->pulse_limits));
+
+		if ( shards[i].gn == NULL ) {
+			error("Could not allocate correlator for thread %d.\n", i);
+			result = PC_ERROR_MEM;
+		} else {
+			photon_gn_init(shards[i].gn);
+		}
+	}
+
+	max_distance = photon_gn_max_distance(combined);
+
+	if ( result == PC_SUCCESS && 
+			options->order > 1 && max_distance == 0 ) {
+		warn("Correlation distance is unbounded, so the stream cannot be "
+				"split into shards. Using a single thread.\n");
+		result = gn(stream_in, stream_out, options);
+		eof = true;
+	}
+
+	while ( result == PC_SUCCESS && ! (eof && n_photons == 0) ) {
+		while ( ! eof && n_photons < capacity ) {
+			result = photon_next(stream_in, &photons[n_photons]);
+
+			if ( result == PC_SUCCESS ) {
+				pc_status_print("gn", photon_number++, options);
+				n_photons++;
+			} else if ( result == EOF ) {
+				result = PC_SUCCESS;
+				eof = true;
+			} else {
+				break;
+			}
+		}
+
+		if ( result != PC_SUCCESS || n_photons == 0 ) {
+			break;
+		}
+
+		/* Find the photons whose correlations are complete in this pass. */
+		if ( eof ) {
+			n_owned = n_photons;
+			upper = 0;
+		} else {
+			upper = window_dim(&photons[n_photons-1]) - max_distance + 1;
+			n_owned = first_at_least(photons, 0, n_photons, upper, 
+					window_dim);
+		}
+
+		if ( n_owned == 0 ) {
+			debug("Growing photon buffer to %zu.\n", 2*capacity);
+			new_photons = (photon_t *)realloc(photons, 
+					sizeof(photon_t)*2*capacity);
+
+			if ( new_photons == NULL ) {
+				error("Could not grow photon buffer.\n");
+				result = PC_ERROR_MEM;
+			} else {
+				photons = new_photons;
+				capacity *= 2;
+			}
+
+			continue;
+		}
+
+		/* Split the owned photons into shards, keeping photons with the same 
+		 * window dimension together.
+		 */
+		n_shards = 0;
+		start = 0;
+		for ( i = 0; i < options->threads && start < n_owned; i++ ) {
+			stop = (i+1 == options->threads) ? n_owned :
+					n_owned*(i+1)/options->threads;
+
+			while ( stop < n_owned && stop > start &&
+					window_dim(&photons[stop]) == 
+					window_dim(&photons[stop-1]) ) {
+				stop++;
+			}
+
+			if ( stop <= start ) {
+				continue;
+			}
+
+			if ( stop == n_owned ) {
+				shards[n_shards].bounded = ! eof;
+				shards[n_shards].upper = upper;
+			} else {
+				shards[n_shards].bounded = true;
+				shards[n_shards].upper = window_dim(&photons[stop]);
+			}
+
+			if ( max_distance == 0 ) {
+				end = stop;
+			} else {
+				end = first_at_least(photons, stop, n_photons,
+						window_dim(&photons[stop-1]) + max_distance,
+						window_dim);
+				end = (end < n_photons) ? end + 1 : n_photons;
+			}
+
+			shards[n_shards].photons = &photons[start];
+			shards[n_shards].n_photons = end - start;
+
+			debug("Shard %d: photons %zu to %zu (%zu owned).\n",
+					n_shards, start, end, stop - start);
+
+			n_shards++;
+			start = stop;
+		}
+
+		for ( i = 0; i < n_shards; i++ ) {
+			if ( pthread_create(&(shards[i].thread), NULL, 
+					gn_shard_run, &shards[i]) ) {
+				error("Could not start thread %d.\n", i);
+				gn_shard_run(&shards[i]);
+				shards[i].thread = pthread_self();
+			}
+		}
+
+		for ( i = 0; i < n_shards; i++ ) {
+			if ( ! pthread_equal(shards[i].thread, pthread_self()) ) {
+				pthread_join(shards[i].thread, NULL);
+			}
+
+			if ( shards[i].result != PC_SUCCESS ) {
+				error("Correlation failed in shard %d.\n", i);
+				result = shards[i].result;
+			}
+		}
+
+		memmove(photons, &photons[n_owned], 
+				sizeof(photon_t)*(n_photons - n_owned));
+		n_photons -= n_owned;
+	}
+
+	if ( result == PC_SUCCESS && photon_number > 0 ) {
+		photon_gn_init(combined);
+
+		for ( i = 0; result == PC_SUCCESS && i < options->threads; i++ ) {
+			result = histogram_gn_update(combined->histogram,
+					shards[i].gn->histogram);
+		}
+	}
+
+	if ( result == PC_SUCCESS ) {
+		photon_gn_fprintf(stream_out, combined);
+	}
+
+	for ( i = 0; i < options->threads; i++ ) {
+		photon_gn_free(&(shards[i].gn));
+	}
+
+	free(shards);
+	free(photons);
+	photon_gn_free(&combined);
+
+	return(result);
+}
@@ -59,6 +59,8 @@ int intensity_dependent_gn(FILE *stream_in, FILE *stream_out,
 	} else {
 		debug("Initializing\n");
 		photon_stream_init(photons, stream_in);
+		photon_stream_set_binary(photons, options->binary_in,
+				options->binary_out);
 		photon_stream_set_unwindowed(photons);
 		idgn_init(idgn, options->window_width);
 	}
@@ -58,6 +58,7 @@ int main(int argc, char *argv[]) {
 			OPT_START, OPT_STOP,
 			OPT_MODE, OPT_CHANNELS,
 			OPT_BIN_WIDTH, OPT_COUNT_ALL,
+			OPT_BINARY_IN,
 			OPT_EOF}};
 
 	return(run(&program_options, intensity_photon, argc, argv));
@@ -64,6 +64,7 @@ int main(int argc, char *argv[]) {
 			OPT_FILE_IN, OPT_FILE_OUT,
 			OPT_QUEUE_SIZE, 
 			OPT_CORRELATE_SUCCESSIVE,
+			OPT_BINARY_IN, OPT_BINARY_OUT,
 			OPT_EOF}};
 
 	return(run(&program_options, number_to_channels, argc, argv));
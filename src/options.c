@@ -55,9 +55,9 @@
 
 /*
 Currently used:
-aAbBcCdDeEfFgGhHiIjJkKmMnNoOpPRsSqQuUvVwWxXyYzZ
+aAbBcCdDeEfFgGhHiIjJkKlLmMnNoOpPqQrRsStTuUvVwWxXyYzZ
 Remaining:
-lLqQrtT
+
 */
 
 static pc_option_t pc_options_all[] = {
@@ -245,8 +245,24 @@ static pc_option_t pc_options_all[] = {
 			"considered for calculation."},
 	{'t', "t:", "time-threshold",
 			"The time dividing early and late arrivals, in ps."},
+	{'l', "l", "binary-in",
+			"Read photons as packed binary records (native-endian\n"
+			"int64 channel,time for t2 or channel,pulse,time\n"
+			"for t3) instead of ascii text."},
+	{'L', "L", "binary-out",
+			"Write photons as packed binary records (native-endian\n"
+			"int64 channel,time for t2 or channel,pulse,time\n"
+			"for t3) instead of ascii text."},
+	{'T', "T:", "threads",
+			"The number of threads used to correlate the stream.\n"
+			"With more than one thread, the stream is split into\n"
+			"shards which are correlated in parallel. By default,\n"
+			"a single thread is used."},
+	{'r', "r:", "top",
+			"The number of windows to report, in order of\n"
+			"decreasing counts. Reported windows do not overlap.\n"
+			"By default, only the brightest window is reported."},
 	};
-	// L, r, t, T: idle options
 
 
 static struct option pc_options_long[] = {
@@ -329,6 +345,16 @@ static struct option pc_options_long[] = {
 /* time threshold */
 	{"time-threshold", required_argument, 0, 't'},
 
+/* binary photons */
+	{"binary-in", no_argument, 0, 'l'},
+	{"binary-out", no_argument, 0, 'L'},
+
+/* parallel correlation */
+	{"threads", required_argument, 0, 'T'},
+
+/* max window */
+	{"top", required_argument, 0, 'r'},
+
 	{0, 0, 0, 0}};
 
 
@@ -382,6 +408,11 @@ void pc_options_default(pc_options_t *options) {
 	options->use_void = false;
 	options->seed = 0xDEADBEEF;
 
+	options->binary_in = false;
+	options->binary_out = false;
+
+	options->threads = 1;
+
 	options->window_width = 0;
 
 	options->queue_size = QUEUE_SIZE;
@@ -448,6 +479,8 @@ void pc_options_default(pc_options_t *options) {
 	options->threshold_min = 0;
 	options->threshold_max = 1000000;
 	options->time_threshold = 0;
+
+	options->top = 1;
 }
 
 int pc_options_valid(pc_options_t const *options) {
@@ -462,6 +495,18 @@ int pc_options_valid(pc_options_t const *options) {
 		return(false);
 	}
 
+	if ( pc_options_has_option(options, OPT_THREADS) && options->threads < 1 ) {
+		error("Must use at least 1 thread (%d specified).\n",
+				options->threads);
+		return(false);
+	}
+
+	if ( pc_options_has_option(options, OPT_TOP) && options->top < 1 ) {
+		error("Must report at least 1 window (%u specified).\n",
+				options->top);
+		return(false);
+	}
+
 	if ( pc_options_has_option(options, OPT_ORDER) && options->order < 1 ) {
 		error("Order of correlation/histogram must be at least 1 (%d "
 				"specified).", options->order);
@@ -700,6 +745,18 @@ int pc_options_parse(pc_options_t *options,
 			case 't':
 				options->time_threshold = strtoull(optarg, NULL, 10);
 				break;
+			case 'l':
+				options->binary_in = true;
+				break;
+			case 'L':
+				options->binary_out = true;
+				break;
+			case 'T':
+				options->threads = strtol(optarg, NULL, 10);
+				break;
+			case 'r':
+				options->top = strtoul(optarg, NULL, 10);
+				break;
 			case '?':
 			default:
 				options->usage = true;
@@ -919,6 +976,9 @@ int pc_options_fprintf(FILE *stream_out, pc_options_t const *options) {
 	fprintf(stream_out, "order = %d\n", options->order);
 	fprintf(stream_out, "print_every = %d\n", options->print_every);
 	fprintf(stream_out, "seed = 0x%x\n", options->seed);
+	fprintf(stream_out, "binary_in = %d\n", options->binary_in);
+	fprintf(stream_out, "binary_out = %d\n", options->binary_out);
+	fprintf(stream_out, "threads = %d\n", options->threads);
 	fprintf(stream_out, "queue_size = %zu\n", options->queue_size);
 	fprintf(stream_out, "window_width = %llu\n", options->window_width);
 
@@ -1017,6 +1077,8 @@ int pc_options_fprintf(FILE *stream_out, pc_options_t const *options) {
 
 	fprintf(stream_out, "time_threshold = %llu\n", options->time_threshold);
 
+	fprintf(stream_out, "top = %u\n", options->top);
+
 	return( ferror(stream_out) ? PC_ERROR_IO : PC_SUCCESS );
 }
 
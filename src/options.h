@@ -73,6 +73,11 @@ typedef struct {
 	int use_void;
 	unsigned int seed;
 
+	int binary_in;
+	int binary_out;
+
+	int threads;
+
 	unsigned long long window_width;
 
 /* Correlate */
@@ -154,6 +159,9 @@ typedef struct {
 
 /* time threshold */
 	unsigned long long time_threshold;
+
+/* max window */
+	unsigned int top;
 } pc_options_t;
 
 enum { OPT_HELP, OPT_VERSION,
@@ -184,6 +192,9 @@ enum { OPT_HELP, OPT_VERSION,
 		OPT_THRESHOLD_MIN,
 		OPT_THRESHOLD_MAX,
 		OPT_TIME_THRESHOLD,
+		OPT_BINARY_IN, OPT_BINARY_OUT,
+		OPT_THREADS,
+		OPT_TOP,
 		OPT_EOF };
 
 pc_options_t *pc_options_alloc(void);
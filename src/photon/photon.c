@@ -30,3 +30,30 @@
  */
 
 #include "photon.h"
+#include "../modes.h"
+#include "../types.h"
+
+/*
+ * Photons can be passed between programs either as ascii text (the default)
+ * or as packed binary records. These return the appropriate read/write
+ * routine for the mode and format, or NULL if the mode is not known.
+ */
+photon_next_t photon_next_select(int const mode, int const binary) {
+	if ( mode == MODE_T2 ) {
+		return( binary ? t2_fread : t2_fscanf );
+	} else if ( mode == MODE_T3 ) {
+		return( binary ? t3_fread : t3_fscanf );
+	} else {
+		return(NULL);
+	}
+}
+
+photon_print_t photon_print_select(int const mode, int const binary) {
+	if ( mode == MODE_T2 || mode == MODE_AS_T2 ) {
+		return( binary ? t2_fwrite : t2_fprintf );
+	} else if ( mode == MODE_T3 ) {
+		return( binary ? t3_fwrite : t3_fprintf );
+	} else {
+		return(NULL);
+	}
+}
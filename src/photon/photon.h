@@ -59,4 +59,7 @@ typedef int (*photon_print_t)(FILE *, photon_t const *);
 typedef long long (*photon_window_dimension_t)(photon_t const *);
 typedef long long (*photon_channel_dimension_t)(photon_t const *);
 
+photon_next_t photon_next_select(int const mode, int const binary);
+photon_print_t photon_print_select(int const mode, int const binary);
+
 #endif
@@ -47,6 +47,8 @@ int photons_echo(FILE *stream_in, FILE *stream_out,
 
 	if ( result == PC_SUCCESS ) {
 		photon_stream_init(photon_stream, stream_in);
+		photon_stream_set_binary(photon_stream, options->binary_in,
+				options->binary_out);
 
 		while ( photon_stream_next_photon(photon_stream) == PC_SUCCESS) {
 			photon_stream->photon_print(stream_out, &photon_stream->photon);
@@ -62,15 +64,17 @@ int _copy_to_channel(FILE *stream_out, photon_t *photon, int mode,
 		pc_options_t const *options) {
 	int result = PC_SUCCESS;
 
+	photon_print_t print = photon_print_select(mode, options->binary_out);
+
 	if ( options->copy_to_channel ) {
 		if ( mode == MODE_T2 || mode == MODE_AS_T2 ) {
 			photon->t2.channel = options->copy_to_this_channel;
 
-			t2_fprintf(stream_out, photon);
+			print(stream_out, photon);
 		} else if ( mode == MODE_T3 ) {
 			photon->t3.channel = options->copy_to_this_channel;
 
-			t3_fprintf(stream_out, photon);
+			print(stream_out, photon);
 		} else {
 			error("Unknown mode: %d\n", options->mode);
 			result = PC_ERROR_MODE;
@@ -85,6 +89,8 @@ int photons(FILE *stream_in, FILE *stream_out,
 	photon_t photon;
 	int result = PC_SUCCESS;
 	photon_stream_t *photons;
+	photon_print_t print_converted = photon_print_select(options->convert,
+			options->binary_out);
 
 	photons = photon_stream_alloc(options->mode);
 
@@ -103,6 +109,8 @@ int photons(FILE *stream_in, FILE *stream_out,
 
 	if ( result == PC_SUCCESS ) {
 		photon_stream_init(photons, stream_in);
+		photon_stream_set_binary(photons, options->binary_in,
+				options->binary_out);
 		photon_stream_set_unwindowed(photons);
 
 		if ( options->convert == options->mode ||
@@ -119,7 +127,7 @@ int photons(FILE *stream_in, FILE *stream_out,
 			while ( photon_stream_next_photon(photons) == PC_SUCCESS ) {
 				t2_to_t3(&photons->photon, &photon, options->repetition_rate, 
 						options->time_origin);
-				t3_fprintf(stream_out, &photon);
+				print_converted(stream_out, &photon);
 
 				_copy_to_channel(stream_out, &photon, 
 						options->convert, options);
@@ -129,7 +137,7 @@ int photons(FILE *stream_in, FILE *stream_out,
 			while ( photon_stream_next_photon(photons) == PC_SUCCESS ) {
 				t3_to_t2(&photons->photon, &photon, options->repetition_rate, 
 						options->time_origin);
-				t2_fprintf(stream_out, &photon);
+				print_converted(stream_out, &photon);
 
 				_copy_to_channel(stream_out, &photon, 
 						options->convert, options);
@@ -139,7 +147,7 @@ int photons(FILE *stream_in, FILE *stream_out,
 			debug("t3 as t2\n");
 			while ( photon_stream_next_photon(photons) == PC_SUCCESS ) {
 				t3_as_t2(&photons->photon, &photon);
-				t2_fprintf(stream_out, &photon);
+				print_converted(stream_out, &photon);
 
 				_copy_to_channel(stream_out, &photon, 
 						options->convert, options);
@@ -96,14 +96,13 @@ photon_stream_t *photon_stream_alloc(int const mode) {
 	}
 
 	photons->mode = mode;
+	photons->photon_next = photon_next_select(mode, false);
+	photons->photon_print = photon_print_select(mode, false);
+
 	if ( mode == MODE_T2 ) {
-		photons->photon_next = t2_fscanf;
-		photons->photon_print = t2_fprintf;
 		photons->window_dim = t2_window_dimension;
 		photons->channel_dim = t2_channel_dimension;
 	} else if ( mode == MODE_T3 ) {
-		photons->photon_next = t3_fscanf;
-		photons->photon_print = t3_fprintf;
 		photons->window_dim = t3_window_dimension;
 		photons->channel_dim = t3_channel_dimension;
 	} else {
@@ -132,6 +131,15 @@ void photon_stream_free(photon_stream_t **photons) {
 	}
 }
 
+void photon_stream_set_binary(photon_stream_t *photons,
+		int const binary_in, int const binary_out) {
+	/* Switch between ascii and packed binary records for reading and 
+	 * writing photons. 
+	 */
+	photons->photon_next = photon_next_select(photons->mode, binary_in);
+	photons->photon_print = photon_print_select(photons->mode, binary_out);
+}
+
 void photon_stream_set_unwindowed(photon_stream_t *photons) {
 	photons->photon_stream_next = photon_stream_next_unwindowed;
 
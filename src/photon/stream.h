@@ -57,6 +57,8 @@ photon_stream_t *photon_stream_alloc(int const mode);
 void photon_stream_init(photon_stream_t *photon_stream, FILE *stream_in);
 void photon_stream_free(photon_stream_t **photons);
 
+void photon_stream_set_binary(photon_stream_t *photons,
+		int const binary_in, int const binary_out);
 void photon_stream_set_unwindowed(photon_stream_t *photons);
 void photon_stream_set_windowed(photon_stream_t *photons,
 		long long const bin_width,
@@ -78,6 +78,7 @@ int synced_t2(FILE *stream_in, FILE *stream_out, pc_options_t const *options) {
 	int result = PC_SUCCESS;
 	synced_t2_t *synced_t2 = NULL;
 	photon_stream_t *photon_stream = NULL;
+	photon_print_t print = photon_print_select(MODE_T3, options->binary_out);
 
 	synced_t2 = synced_t2_alloc(options->queue_size);
 	photon_stream = photon_stream_alloc(MODE_T2);
@@ -89,19 +90,21 @@ int synced_t2(FILE *stream_in, FILE *stream_out, pc_options_t const *options) {
 
 	if ( result == PC_SUCCESS ) {
 		photon_stream_init(photon_stream, stream_in);
+		photon_stream_set_binary(photon_stream, options->binary_in,
+				options->binary_out);
 		synced_t2_init(synced_t2, options->sync_channel, options->sync_divider);
 
 		while ( photon_stream_next_photon(photon_stream) == PC_SUCCESS ) {
 			synced_t2_push(synced_t2, &(photon_stream->photon));
 
 			while ( synced_t2_next(synced_t2) == PC_SUCCESS )  {
-				t3_fprintf(stream_out, &(synced_t2->photon));
+				print(stream_out, &(synced_t2->photon));
 			}
 		}
 
 		synced_t2_flush(synced_t2);
 		while ( synced_t2_next(synced_t2) == PC_SUCCESS ) { 
-			t3_fprintf(stream_out, &(synced_t2->photon));
+			print(stream_out, &(synced_t2->photon));
 		}
 	}
 
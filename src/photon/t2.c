@@ -58,6 +58,35 @@ int t2_fprintf(FILE *stream_out, photon_t const *photon) {
 	return( ! ferror(stream_out) ? PC_SUCCESS : PC_ERROR_IO );
 }
 
+/*
+ * Binary photon records are packed, fixed-width native-endian int64 fields
+ * (channel, time), which avoids the cost of formatting and parsing text when
+ * photons are passed between programs.
+ */
+int t2_fread(FILE *stream_in, photon_t *photon) {
+	int64_t record[2];
+	size_t n_read = fread(record, sizeof(int64_t), 2, stream_in);
+
+	if ( n_read == 2 ) {
+		photon->t2.channel = (unsigned int)record[0];
+		photon->t2.time = record[1];
+		return(PC_SUCCESS);
+	} else {
+		return( (n_read == 0 && feof(stream_in)) ? EOF : PC_ERROR_IO );
+	}
+}
+
+int t2_fwrite(FILE *stream_out, photon_t const *photon) {
+	int64_t record[2];
+
+	record[0] = photon->t2.channel;
+	record[1] = photon->t2.time;
+
+	fwrite(record, sizeof(int64_t), 2, stream_out);
+
+	return( ! ferror(stream_out) ? PC_SUCCESS : PC_ERROR_IO );
+}
+
 int t2_compare(void const *a, void const *b) {
 	/* Comparator to be used with standard sorting algorithms (qsort) to sort
 	 * t2 photons. 
@@ -38,6 +38,8 @@
 
 int t2_fscanf(FILE *stream_in, photon_t *photon);
 int t2_fprintf(FILE *stream_out, photon_t const *photon);
+int t2_fread(FILE *stream_in, photon_t *photon);
+int t2_fwrite(FILE *stream_out, photon_t const *photon);
 
 int t2_compare(void const *a, void const *b);
 int t2_echo(FILE *stream_in, FILE *stream_out);
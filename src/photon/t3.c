@@ -63,6 +63,36 @@ int t3_fprintf(FILE *stream_out, photon_t const *photon) {
 	return( ! ferror(stream_out) ? PC_SUCCESS : PC_ERROR_IO );
 }
 
+/*
+ * Binary photon records are packed, fixed-width native-endian int64 fields
+ * (channel, pulse, time).
+ */
+int t3_fread(FILE *stream_in, photon_t *photon) {
+	int64_t record[3];
+	size_t n_read = fread(record, sizeof(int64_t), 3, stream_in);
+
+	if ( n_read == 3 ) {
+		photon->t3.channel = (unsigned int)record[0];
+		photon->t3.pulse = record[1];
+		photon->t3.time = record[2];
+		return(PC_SUCCESS);
+	} else {
+		return( (n_read == 0 && feof(stream_in)) ? EOF : PC_ERROR_IO );
+	}
+}
+
+int t3_fwrite(FILE *stream_out, photon_t const *photon) {
+	int64_t record[3];
+
+	record[0] = photon->t3.channel;
+	record[1] = photon->t3.pulse;
+	record[2] = photon->t3.time;
+
+	fwrite(record, sizeof(int64_t), 3, stream_out);
+
+	return( ! ferror(stream_out) ? PC_SUCCESS : PC_ERROR_IO );
+}
+
 int t3_compare(void const *a, void const *b) {
 	/* Comparator to be used with standard sorting algorithms (qsort) to sort
 	 * t3 photons. 
@@ -38,6 +38,8 @@
 
 int t3_fscanf(FILE *stream_out, photon_t *photon);
 int t3_fprintf(FILE *stream_out, photon_t const *photon);
+int t3_fread(FILE *stream_in, photon_t *photon);
+int t3_fwrite(FILE *stream_out, photon_t const *photon);
 
 int t3_compare(void const *a, void const *b);
 int t3_echo(FILE *stream_in, FILE *stream_out);
@@ -179,6 +179,8 @@ int t3_offsets(FILE *stream_in, FILE *stream_out, pc_options_t const *options) {
 	}
 
 	photon_stream_init(photons, stream_in);
+	photon_stream_set_binary(photons, options->binary_in,
+			options->binary_out);
 	t3_offsetter_init(offsetter, options->offset_time, options->time_offsets,
 			options->repetition_rate);
 
@@ -187,14 +189,14 @@ int t3_offsets(FILE *stream_in, FILE *stream_out, pc_options_t const *options) {
 		t3_offsetter_push(offsetter, &(photons->photon));
 
 		while ( t3_offsetter_next(offsetter) == PC_SUCCESS ) {
-			t3_fprintf(stream_out, &(offsetter->photon));
+			photons->photon_print(stream_out, &(offsetter->photon));
 		}
 	}
 
 	if ( result == PC_SUCCESS ) {
 		t3_offsetter_flush(offsetter);
 		while ( t3_offsetter_next(offsetter) == PC_SUCCESS ) {
-			t3_fprintf(stream_out, &(offsetter->photon));
+			photons->photon_print(stream_out, &(offsetter->photon));
 		}
 	}
 
@@ -50,18 +50,16 @@ photon_stream_temper_t *photon_stream_temper_alloc(int const mode,
 
 	pst->mode = mode;
 	pst->channels = channels;
+	pst->photon_next = photon_next_select(mode, false);
+	pst->photon_print = photon_print_select(mode, false);
 	
 	if ( pst->mode == MODE_T2 ) {
 		debug("Mode t2\n");
-		pst->photon_next = t2_fscanf;
-		pst->photon_print = t2_fprintf;
 		pst->photon_offset = t2_offset;
 		pst->channel_dim = t2_channel_dimension;
 		pst->window_dim = t2_window_dimension;
 	} else if ( pst->mode == MODE_T3 ) {
 		debug("Mode t3.\n");
-		pst->photon_next = t3_fscanf;
-		pst->photon_print = t3_fprintf;
 		pst->photon_offset = t3_offset;
 		pst->channel_dim = t3_channel_dimension;
 		pst->window_dim = t3_window_dimension;
@@ -315,6 +313,10 @@ int photon_temper(FILE *stream_in, FILE *stream_out,
 				options->offset_time, options->time_offsets,
 				options->offset_pulse, options->pulse_offsets,
 				options->time_gating, options->gate_time);
+		pst->photon_next = photon_next_select(options->mode,
+				options->binary_in);
+		pst->photon_print = photon_print_select(options->mode,
+				options->binary_out);
 
 		while ( photon_stream_temper_next(pst) == PC_SUCCESS ) {
 			pst->photon_print(stream_out, &(pst->current_photon));
@@ -81,6 +81,7 @@ int main(int argc, char *argv[]) {
 		{OPT_VERBOSE, OPT_HELP, OPT_VERSION, 
 			OPT_FILE_IN, OPT_FILE_OUT, 
 			OPT_WINDOW_WIDTH, OPT_TIME, OPT_INTENSITY,
+			OPT_BINARY_IN,
 			OPT_EOF}};
 
 	return(run(&program_options, flid, argc, argv));
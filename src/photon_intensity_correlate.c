@@ -75,6 +75,8 @@ int photon_intensity_correlate_g2_log(FILE *stream_in, FILE *stream_out,
 				options->set_stop, options->stop);
 
 		photon_stream_init(photon_stream, stream_in);
+		photon_stream_set_binary(photon_stream, options->binary_in,
+				options->binary_out);
 		multi_tau_g2cn_init(mt);
 
 		while ( photon_stream_next_photon(photon_stream) == PC_SUCCESS ) {
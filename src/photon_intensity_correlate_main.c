@@ -59,6 +59,7 @@ int main(int argc, char *argv[]) {
 			OPT_BIN_WIDTH,
 			OPT_TIME_SCALE,
 			OPT_BINNING, OPT_REGISTERS, OPT_DEPTH,
+			OPT_BINARY_IN,
 			OPT_EOF}};
 
 	return(run(&program_options, photon_intensity_correlate_dispatch, 
@@ -69,6 +69,7 @@ int main(int argc, char *argv[]) {
 			OPT_QUEUE_SIZE,
 			OPT_WINDOW_WIDTH, 
 			OPT_TIME, OPT_PULSE, OPT_INTENSITY,
+			OPT_BINARY_IN,
 			OPT_EOF}};
 
 	return(run(&program_options, intensity_dependent_gn, argc, argv));
@@ -0,0 +1,49 @@
+/*
+ * Copyright (c) 2011-2015, Thomas Bischof
+ * All rights reserved.
+ * 
+ * Redistribution and use in source and binary forms, with or without 
+ * modification, are permitted provided that the following conditions are met:
+ * 
+ * 1. Redistributions of source code must retain the above copyright notice, 
+ *    this list of conditions and the following disclaimer.
+ * 
+ * 2. Redistributions in binary form must reproduce the above copyright notice, 
+ *    this list of conditions and the following disclaimer in the documentation 
+ *    and/or other materials provided with the distribution.
+ * 
+ * 3. Neither the name of the Massachusetts Institute of Technology nor the 
+ *    names of its contributors may be used to endorse or promote products 
+ *    derived from this software without specific prior written permission.
+ * 
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+ * POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#include "statistics/max_window.h"
+#include "run.h"
+#include "options.h"
+
+int main(int argc, char *argv[]) {
+	program_options_t program_options = {
+"Find the windows of the given width which hold the most photons. Windows\n"
+"slide across the stream, starting at any time (or pulse), and reported\n"
+"windows do not overlap. Each line of the output gives the start and stop\n"
+"of a window and its number of photons, in order of decreasing counts.\n",
+		{OPT_VERBOSE, OPT_HELP, OPT_VERSION,
+			OPT_FILE_IN, OPT_FILE_OUT, OPT_MODE,
+			OPT_WINDOW_WIDTH, OPT_TOP, OPT_QUEUE_SIZE,
+			OPT_BINARY_IN,
+			OPT_EOF}};
+
+	return(run(&program_options, photon_max_window, argc, argv));
+}
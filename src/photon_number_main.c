@@ -47,6 +47,7 @@ int main(int argc, char *argv[]) {
 			OPT_FILE_IN, OPT_FILE_OUT,
 			OPT_CHANNELS, 
 			OPT_START, OPT_STOP,
+			OPT_BINARY_IN,
 			OPT_EOF}};
 
 	return(run(&program_options, photon_number, argc, argv));
@@ -44,6 +44,7 @@ int main(int argc, char *argv[]) {
 			OPT_TIME_OFFSETS, OPT_PULSE_OFFSETS,
 			OPT_SUPPRESS, OPT_QUEUE_SIZE, 
 			OPT_FILTER_AFTERPULSING, OPT_TIME_GATING,
+			OPT_BINARY_IN, OPT_BINARY_OUT,
 			OPT_EOF}};
 
 	return(run(&program_options, photon_temper, argc, argv));
@@ -40,6 +40,7 @@ int main(int argc, char *argv[]) {
 		{OPT_VERBOSE, OPT_HELP, OPT_VERSION,
 			OPT_FILE_IN, OPT_FILE_OUT, OPT_MODE,
 			OPT_THRESHOLD_MIN, OPT_THRESHOLD_MAX, OPT_WINDOW_WIDTH,
+			OPT_BINARY_IN, OPT_BINARY_OUT,
 			OPT_EOF}};
 
 	return(run(&program_options, photon_threshold, argc, argv));
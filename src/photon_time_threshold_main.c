@@ -47,6 +47,7 @@ int main(int argc, char *argv[]) {
 		{OPT_VERBOSE, OPT_HELP, OPT_VERSION,
 			OPT_FILE_IN, OPT_FILE_OUT,
 			OPT_TIME_THRESHOLD, OPT_CORRELATE_SUCCESSIVE, OPT_QUEUE_SIZE,
+			OPT_BINARY_IN, OPT_BINARY_OUT,
 			OPT_EOF}};
 
 	return(run(&program_options, photon_time_threshold, argc, argv));
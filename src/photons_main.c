@@ -50,6 +50,7 @@ int main(int argc, char *argv[]) {
 			OPT_FILE_IN, OPT_FILE_OUT,
 			OPT_MODE, OPT_CONVERT, OPT_TIME_ORIGIN,
 			OPT_REPETITION_TIME, OPT_COPY_TO_CHANNEL,
+			OPT_BINARY_IN, OPT_BINARY_OUT,
 			OPT_EOF}};
 
 	return(run(&program_options, photons, argc, argv));
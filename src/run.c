@@ -79,7 +79,7 @@ int run(program_options_t *program_options, dispatch_t const dispatch,
 
 	if ( result == PC_SUCCESS ) {
 		debug("Dispatching.\n");
-		dispatch(stream_in, stream_out, options);
+		result = dispatch(stream_in, stream_out, options);
 	}
 
 	debug("Cleaning up.\n");
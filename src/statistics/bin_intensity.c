@@ -399,6 +399,8 @@ int bin_intensity(FILE *stream_in, FILE *stream_out,
 
 	if ( result == PC_SUCCESS ) {
 		photon_stream_init(photons, stream_in);
+		photon_stream_set_binary(photons, options->binary_in,
+				options->binary_out);
 		photon_stream_set_unwindowed(photons);
 
 		bin_intensity_init(bin_intensity,
@@ -400,6 +400,8 @@ int intensity_photon(FILE *stream_in, FILE *stream_out,
 	}
 
 	photon_stream_init(photon_stream, stream_in);
+	photon_stream_set_binary(photon_stream, options->binary_in,
+			options->binary_out);
 
 	if ( result == PC_SUCCESS ) {
 		while ( photon_stream_next_photon(photon_stream) == PC_SUCCESS ) {
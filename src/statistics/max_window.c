@@ -0,0 +1,243 @@
+/*
+ * Copyright (c) 2011-2015, Thomas Bischof
+ * All rights reserved.
+ * 
+ * Redistribution and use in source and binary forms, with or without 
+ * modification, are permitted provided that the following conditions are met:
+ * 
+ * 1. Redistributions of source code must retain the above copyright notice, 
+ *    this list of conditions and the following disclaimer.
+ * 
+ * 2. Redistributions in binary form must reproduce the above copyright notice, 
+ *    this list of conditions and the following disclaimer in the documentation 
+ *    and/or other materials provided with the distribution.
+ * 
+ * 3. Neither the name of the Massachusetts Institute of Technology nor the 
+ *    names of its contributors may be used to endorse or promote products 
+ *    derived from this software without specific prior written permission.
+ * 
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+ * POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#include <stdlib.h>
+
+#include "max_window.h"
+#include "../photon/stream.h"
+#include "../photon/t2.h"
+#include "../photon/t3.h"
+#include "../error.h"
+#include "../modes.h"
+
+/*
+ * Find the windows of fixed width holding the most photons, where a window
+ * may start at any time (or pulse), not only at multiples of its width. The 
+ * count of a window only changes when its start passes a photon, so it is 
+ * enough to consider the windows [t, t+width) starting at each photon. These
+ * are formed with two pointers: the queue holds the start of every window 
+ * which is still open, and a window is complete once a photon arrives at or 
+ * after its end, at which point it holds every photon left in the queue.
+ *
+ * Of the complete windows, the best top are kept, such that no two of them 
+ * overlap: a window which overlaps a kept one replaces it only if it holds 
+ * more photons, so each burst is reported once, at its brightest position.
+ * Ties go to the earlier window.
+ */
+
+photon_max_window_t *photon_max_window_alloc(int const mode,
+		size_t const top, size_t const queue_size) {
+	photon_max_window_t *pmw = NULL;
+
+	pmw = (photon_max_window_t *)malloc(sizeof(photon_max_window_t));
+
+	if ( pmw == NULL ) {
+		return(pmw);
+	}
+
+	pmw->top = top;
+	pmw->windows = (max_window_t *)malloc(sizeof(max_window_t)*top);
+	pmw->starts = queue_alloc(sizeof(long long), queue_size);
+
+	if ( pmw->windows == NULL || pmw->starts == NULL ) {
+		photon_max_window_free(&pmw);
+		return(pmw);
+	}
+
+	if ( mode == MODE_T2 ) {
+		pmw->window_dim = t2_window_dimension;
+	} else if ( mode == MODE_T3 ) {
+		pmw->window_dim = t3_window_dimension;
+	} else {
+		error("Unknown mode: %d\n", mode);
+		photon_max_window_free(&pmw);
+	}
+
+	return(pmw);
+}
+
+void photon_max_window_init(photon_max_window_t *pmw,
+		long long const window_width) {
+	pmw->window_width = window_width;
+	pmw->n_windows = 0;
+	queue_init(pmw->starts);
+}
+
+static void photon_max_window_offer(photon_max_window_t *pmw,
+		long long const start, unsigned long long const counts) {
+	size_t i;
+	size_t lowest = 0;
+
+	/* Kept windows do not overlap and start no later than this one, so at
+	 * most one of them overlaps it.
+	 */
+	for ( i = 0; i < pmw->n_windows; i++ ) {
+		if ( start < pmw->windows[i].start + pmw->window_width ) {
+			if ( counts > pmw->windows[i].counts ) {
+				pmw->windows[i].start = start;
+				pmw->windows[i].counts = counts;
+			}
+			return;
+		}
+	}
+
+	if ( pmw->n_windows < pmw->top ) {
+		pmw->windows[pmw->n_windows].start = start;
+		pmw->windows[pmw->n_windows].counts = counts;
+		pmw->n_windows++;
+		return;
+	}
+
+	for ( i = 1; i < pmw->n_windows; i++ ) {
+		if ( pmw->windows[i].counts < pmw->windows[lowest].counts ||
+				( pmw->windows[i].counts == pmw->windows[lowest].counts &&
+				  pmw->windows[i].start > pmw->windows[lowest].start ) ) {
+			lowest = i;
+		}
+	}
+
+	if ( pmw->n_windows > 0 && counts > pmw->windows[lowest].counts ) {
+		pmw->windows[lowest].start = start;
+		pmw->windows[lowest].counts = counts;
+	}
+}
+
+static void photon_max_window_complete(photon_max_window_t *pmw,
+		int const flushing, long long const time) {
+	long long *front;
+
+	while ( ! queue_empty(pmw->starts) ) {
+		queue_front(pmw->starts, (void **)&front);
+
+		if ( ! flushing && *front + pmw->window_width > time ) {
+			break;
+		}
+
+		photon_max_window_offer(pmw, *front, queue_size(pmw->starts));
+		queue_pop(pmw->starts, NULL);
+	}
+}
+
+int photon_max_window_push(photon_max_window_t *pmw, photon_t const *photon) {
+	long long time = pmw->window_dim(photon);
+
+	photon_max_window_complete(pmw, false, time);
+
+	return(queue_push(pmw->starts, &time));
+}
+
+static int max_window_compare(void const *a, void const *b) {
+	max_window_t const *first = (max_window_t const *)a;
+	max_window_t const *second = (max_window_t const *)b;
+
+	if ( first->counts != second->counts ) {
+		return( first->counts > second->counts ? -1 : 1 );
+	} else if ( first->start != second->start ) {
+		return( first->start < second->start ? -1 : 1 );
+	} else {
+		return(0);
+	}
+}
+
+void photon_max_window_flush(photon_max_window_t *pmw) {
+	photon_max_window_complete(pmw, true, 0);
+
+	qsort(pmw->windows, pmw->n_windows, sizeof(max_window_t), 
+			max_window_compare);
+}
+
+int photon_max_window_fprintf(FILE *stream_out, 
+		photon_max_window_t const *pmw) {
+	size_t i;
+
+	for ( i = 0; i < pmw->n_windows; i++ ) {
+		fprintf(stream_out, "%lld,%lld,%llu\n",
+				pmw->windows[i].start,
+				pmw->windows[i].start + pmw->window_width,
+				pmw->windows[i].counts);
+	}
+
+	return( ferror(stream_out) ? PC_ERROR_IO : PC_SUCCESS );
+}
+
+void photon_max_window_free(photon_max_window_t **pmw) {
+	if ( *pmw != NULL ) {
+		free((*pmw)->windows);
+		queue_free(&((*pmw)->starts));
+		free(*pmw);
+		*pmw = NULL;
+	}
+}
+
+int photon_max_window(FILE *stream_in, FILE *stream_out,
+		pc_options_t const *options) {
+	int result = PC_SUCCESS;
+	photon_stream_t *photons;
+	photon_max_window_t *pmw;
+
+	if ( options->window_width == 0 ) {
+		error("A window width is required.\n");
+		return(PC_ERROR_OPTIONS);
+	}
+
+	photons = photon_stream_alloc(options->mode);
+	pmw = photon_max_window_alloc(options->mode, options->top, 
+			options->queue_size);
+
+	if ( photons == NULL || pmw == NULL ) {
+		error("Could not allocate memory.\n");
+		result = PC_ERROR_MEM;
+	} else {
+		photon_stream_init(photons, stream_in);
+		photon_stream_set_binary(photons, options->binary_in,
+				options->binary_out);
+		photon_stream_set_unwindowed(photons);
+		photon_max_window_init(pmw, options->window_width);
+	}
+
+	if ( result == PC_SUCCESS ) {
+		while ( result == PC_SUCCESS &&
+				photon_stream_next_photon(photons) == PC_SUCCESS ) {
+			result = photon_max_window_push(pmw, &(photons->photon));
+		}
+
+		photon_max_window_flush(pmw);
+
+		if ( result == PC_SUCCESS ) {
+			result = photon_max_window_fprintf(stream_out, pmw);
+		}
+	}
+
+	photon_stream_free(&photons);
+	photon_max_window_free(&pmw);
+
+	return(result);
+}
@@ -0,0 +1,68 @@
+/*
+ * Copyright (c) 2011-2015, Thomas Bischof
+ * All rights reserved.
+ * 
+ * Redistribution and use in source and binary forms, with or without 
+ * modification, are permitted provided that the following conditions are met:
+ * 
+ * 1. Redistributions of source code must retain the above copyright notice, 
+ *    this list of conditions and the following disclaimer.
+ * 
+ * 2. Redistributions in binary form must reproduce the above copyright notice, 
+ *    this list of conditions and the following disclaimer in the documentation 
+ *    and/or other materials provided with the distribution.
+ * 
+ * 3. Neither the name of the Massachusetts Institute of Technology nor the 
+ *    names of its contributors may be used to endorse or promote products 
+ *    derived from this software without specific prior written permission.
+ * 
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" 
+ * AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE 
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE 
+ * ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE 
+ * LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR 
+ * CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF 
+ * SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS 
+ * INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN 
+ * CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) 
+ * ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+ * POSSIBILITY OF SUCH DAMAGE.
+ */
+
+#ifndef MAX_WINDOW_H_
+#define MAX_WINDOW_H_
+
+#include <stdio.h>
+#include "../options.h"
+#include "../queue.h"
+#include "../photon/photon.h"
+
+typedef struct {
+	long long start;
+	unsigned long long counts;
+} max_window_t;
+
+typedef struct {
+	long long window_width;
+	size_t top;
+	size_t n_windows;
+	max_window_t *windows;
+
+	photon_window_dimension_t window_dim;
+	queue_t *starts;
+} photon_max_window_t;
+
+photon_max_window_t *photon_max_window_alloc(int const mode,
+		size_t const top, size_t const queue_size);
+void photon_max_window_init(photon_max_window_t *pmw,
+		long long const window_width);
+int photon_max_window_push(photon_max_window_t *pmw, photon_t const *photon);
+void photon_max_window_flush(photon_max_window_t *pmw);
+int photon_max_window_fprintf(FILE *stream_out, 
+		photon_max_window_t const *pmw);
+void photon_max_window_free(photon_max_window_t **pmw);
+
+int photon_max_window(FILE *stream_in, FILE *stream_out,
+		pc_options_t const *options);
+
+#endif
@@ -237,6 +237,8 @@ int photon_number(FILE *stream_in, FILE *stream_out,
 			options->set_start, options->start,
 			options->set_stop, options->stop);
 	photon_stream_init(photons, stream_in);
+	photon_stream_set_binary(photons, options->binary_in,
+			options->binary_out);
 	photon_stream_set_unwindowed(photons);
 
 	debug("Max photons per pulse: %u\n", number->max_number);
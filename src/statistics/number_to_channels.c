@@ -188,6 +188,8 @@ int number_to_channels(FILE *stream_in, FILE *stream_out,
 	if ( result == PC_SUCCESS ) {
 		debug("Init.\n");
 		photon_stream_init(photons, stream_in);
+		photon_stream_set_binary(photons, options->binary_in,
+				options->binary_out);
 		photon_stream_set_unwindowed(photons);
 
 		number_to_channels_init(number, options->correlate_successive);
@@ -199,7 +201,7 @@ int number_to_channels(FILE *stream_in, FILE *stream_out,
 
 			while ( number_to_channels_next(number) == PC_SUCCESS ) {
 				debug("Yielding.\n");
-				t3_fprintf(stream_out, &(number->photon));
+				photons->photon_print(stream_out, &(number->photon));
 			}
 		}
 
@@ -207,7 +209,7 @@ int number_to_channels(FILE *stream_in, FILE *stream_out,
 		number_to_channels_flush(number);
 		while ( number_to_channels_next(number) == PC_SUCCESS ) {
 			debug("Yielding.\n");
-			t3_fprintf(stream_out, &(number->photon));
+			photons->photon_print(stream_out, &(number->photon));
 		}
 	}
 
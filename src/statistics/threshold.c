@@ -288,6 +288,8 @@ int photon_threshold(FILE *stream_in, FILE *stream_out,
 		result = PC_ERROR_MEM;
 	} else {
 		photon_stream_init(photons, stream_in);
+		photon_stream_set_binary(photons, options->binary_in,
+				options->binary_out);
 		photon_threshold_init(pt, options->window_width,
 					options->threshold_min, options->threshold_max,
 					options->set_start, options->start,
@@ -141,12 +141,14 @@ int photon_time_threshold(FILE *stream_in, FILE *stream_out,
 	} else {
 		photon_time_threshold_init(ptt, stream_in, 
 				options->time_threshold, options->correlate_successive);
+		photon_stream_set_binary(ptt->photons, options->binary_in,
+				options->binary_out);
 	}
 
 	if ( result == PC_SUCCESS ) {
 		debug("Starting stream\n");
 		while ( photon_time_threshold_next(ptt, &photon) == PC_SUCCESS ) {
-			t3_fprintf(stream_out, &photon);
+			ptt->photons->photon_print(stream_out, &photon);
 		}
 	}
 
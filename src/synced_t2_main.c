@@ -48,6 +48,7 @@ int main(int argc, char *argv[]) {
 			OPT_SYNC_CHANNEL, 
 /*			OPT_SYNC_DIVIDER, */
 			OPT_QUEUE_SIZE, 
+			OPT_BINARY_IN, OPT_BINARY_OUT,
 			OPT_EOF}};
 
 	return(run(&program_options, synced_t2_dispatch, argc, argv));
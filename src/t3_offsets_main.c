@@ -43,6 +43,7 @@ int main(int argc, char *argv[]) {
 			OPT_FILE_IN, OPT_FILE_OUT,
 			OPT_CHANNELS,
 			OPT_TIME_OFFSETS, OPT_REPETITION_TIME,
+			OPT_BINARY_IN, OPT_BINARY_OUT,
 			OPT_EOF}};
 
 	return(run(&program_options, t3_offsets, argc, argv));